@@ -0,0 +1,9 @@
+from .protocol import ColorimeterError
+from .protocol import CommandFailed
+from .client import ColorimeterClient
+from .fleet import Fleet
+from .fleet import Frame
+from .emulator import EmulatedColorimeter
+from .recording import read_recording
+
+__version__ = '0.1.0'
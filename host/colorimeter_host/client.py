@@ -0,0 +1,163 @@
+import time
+import asyncio
+import itertools
+
+from .protocol import COMMAND_QUEUE_SIZE
+from .protocol import STATUS_PENDING
+from .protocol import ColorimeterError
+from .protocol import CommandFailed
+from .protocol import encode_message
+from .protocol import decode_line
+from .transport import open_serial
+from .transport import DEFAULT_BAUDRATE
+
+
+class ColorimeterClient:
+
+    """ Asyncio client for one colorimeter.
+
+    The serial connection is opened once and reused for all requests. A reader
+    task matches responses to requests by id so that up to max_in_flight
+    requests can be pipelined to the device. Messages which do not answer a
+    request are delivered through events().
+    """
+
+    DEFAULT_TIMEOUT = 10.0
+    READ_TIMEOUT_PER_SAMPLE = 0.5
+    EVENT_QUEUE_SIZE = 100
+
+    def __init__(self, port, name=None, baudrate=DEFAULT_BAUDRATE,
+            timeout=DEFAULT_TIMEOUT, max_in_flight=COMMAND_QUEUE_SIZE):
+        self.port = port
+        self.name = name if name is not None else port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._in_flight = None
+        self._events = None
+        self._closed_error = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def is_open(self):
+        return self._reader_task is not None and not self._reader_task.done()
+
+    async def open(self):
+        if self.is_open:
+            return
+        self._reader, self._writer = await open_serial(self.port, self.baudrate)
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._events = asyncio.Queue(self.EVENT_QUEUE_SIZE)
+        self._closed_error = None
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._fail_pending(ColorimeterError(f'{self.name} closed'))
+
+    async def command(self, command, timeout=None, **params):
+        """ Send command and return its response, waiting for the final
+        response of commands which the device runs as background jobs. """
+        if not self.is_open:
+            raise ColorimeterError(f'{self.name} not open')
+        if timeout is None:
+            timeout = self.timeout
+        async with self._in_flight:
+            msg_id = next(self._ids)
+            msg = {'command': command, 'id': msg_id}
+            msg.update(params)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[msg_id] = future
+            try:
+                self._writer.write(encode_message(msg))
+                await self._writer.drain()
+                rsp = await asyncio.wait_for(future, timeout)
+            finally:
+                self._pending.pop(msg_id, None)
+        response = rsp.get('response', {})
+        if 'error' in response:
+            raise CommandFailed(command, response['error'])
+        return response
+
+    async def read(self, samples=1, interval=0.0, reduce='none', timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+            timeout += samples*(interval + self.READ_TIMEOUT_PER_SAMPLE)
+        return await self.command(
+                'read',
+                timeout = timeout,
+                samples = samples,
+                interval = interval,
+                reduce = reduce,
+                )
+
+    async def stream(self, period, count=None, **read_params):
+        """ Async iterator yielding (timestamp, response) for reads issued on a
+        fixed schedule of one every period seconds. """
+        t_start = time.monotonic()
+        for num in itertools.count():
+            if count is not None and num >= count:
+                break
+            delay = t_start + num*period - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            t_send = time.time()
+            rsp = await self.read(**read_params)
+            yield 0.5*(t_send + time.time()), rsp
+
+    async def events(self):
+        """ Async iterator over unsolicited device messages. """
+        while True:
+            yield await self._events.get()
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    raise ColorimeterError(f'{self.name} disconnected')
+                msg = decode_line(line)
+                if msg is not None:
+                    self._dispatch(msg)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            self._closed_error = error
+            self._fail_pending(error)
+
+    def _dispatch(self, msg):
+        future = self._pending.get(msg.get('id', None), None)
+        if future is None:
+            if self._events.full():
+                self._events.get_nowait()
+            self._events.put_nowait(msg)
+        elif msg.get('status', None) == STATUS_PENDING:
+            # Job acknowledged, the final response follows with the same id
+            pass
+        elif not future.done():
+            future.set_result(msg)
+
+    def _fail_pending(self, error):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,375 @@
+import os
+import sys
+import json
+import time
+import queue
+import select
+import random
+import argparse
+import threading
+import statistics
+
+from .protocol import CHANNEL_NAMES
+from .protocol import COMMAND_QUEUE_SIZE
+from .protocol import STATUS_PENDING
+from .protocol import STATUS_DONE
+
+
+GAIN_NAMES = [
+        '0.5x', '1x', '2x', '4x', '8x', '16x',
+        '32x', '64x', '128x', '256x', '512x',
+        ]
+
+INTEGRATION_TIMES = {
+        '25ms'  : 0.025,
+        '50ms'  : 0.050,
+        '100ms' : 0.100,
+        '200ms' : 0.200,
+        '280ms' : 0.280,
+        }
+
+DEFAULT_MEASUREMENTS = ['Absorbance', 'Transmittance', 'Raw Sensor']
+
+
+class EmulatorCommandError(Exception):
+    pass
+
+
+class EmulatedColorimeter:
+
+    """ Emulates the colorimeter serial protocol on a local pty for testing
+    host software on Linux without hardware. Sensor counts are generated from
+    a fixed lamp spectrum scaled by gain and integration time and attenuated
+    by the settable sample transmittance. """
+
+    NUM_BLANK_SAMPLES = 5
+    BLANK_DT = 0.05
+    MAX_READ_SAMPLES = 50
+    MAX_READ_INTERVAL = 5.0
+    LAMP_SPECTRUM = [150, 420, 800, 1200, 1500, 1300, 1100, 700, 300, 2500]
+    NOISE_FRACTION = 0.002
+    MAX_COUNT = 2**16-1
+    HEAP_SIZE = 192*1024
+    MEM_LOW_FREE = 16*1024
+    MEM_REGIONS = {
+            'fonts'          : 9200,
+            'configuration'  : 1500,
+            'calibrations'   : 2600,
+            'screen_measure' : 21800,
+            }
+    MEM_LOOP_GARBAGE = 3100
+    POLL_DT = 0.05
+
+    def __init__(self, name='emulator', read_dt=0.0, seed=None):
+        self.name = name
+        self.read_dt = read_dt
+        self.random = random.Random(seed)
+        self.transmittance = [1.0]*len(CHANNEL_NAMES)
+        self.gain = '16x'
+        self.integration_time = '280ms'
+        self.measurement = DEFAULT_MEASUREMENTS[0]
+        self.blank_values = None
+        self.port = None
+        self._master_fd = None
+        self._slave_fd = None
+        self._write_lock = threading.Lock()
+        self._commands = queue.Queue(COMMAND_QUEUE_SIZE)
+        self._threads = []
+        self._running = False
+        self.mem_alloc = sum(self.MEM_REGIONS.values())
+        self.mem_min_free = None
+        self.commands = {
+                'read'                 : self.read_command,
+                'blank'                : self.blank_command,
+                'reset_blank'          : self.reset_blank_command,
+                'set_gain'             : self.set_gain_command,
+                'set_integration_time' : self.set_integration_time_command,
+                'select_measurement'   : self.select_measurement_command,
+                'list_measurements'    : self.list_measurements_command,
+                'get_config'           : self.get_config_command,
+                'memory'               : self.memory_command,
+                }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        import tty
+        self._master_fd, self._slave_fd = os.openpty()
+        tty.setraw(self._slave_fd)
+        self.port = os.ttyname(self._slave_fd)
+        self._running = True
+        for target in (self._receive_loop, self._command_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._running = False
+        self._commands.put(None)
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+        for fd in (self._master_fd, self._slave_fd):
+            if fd is not None:
+                os.close(fd)
+        self._master_fd = None
+        self._slave_fd = None
+
+    # Sensor model
+    # -------------------------------------------------------------------------
+
+    @property
+    def is_blanked(self):
+        return self.blank_values is not None
+
+    def raw_values(self):
+        gain = float(self.gain[:-1])/16.0
+        itime = INTEGRATION_TIMES[self.integration_time]/0.280
+        values = []
+        for lamp, trans in zip(self.LAMP_SPECTRUM, self.transmittance):
+            mean = lamp*gain*itime*trans
+            value = self.random.gauss(mean, self.NOISE_FRACTION*mean + 1.0)
+            values.append(int(min(max(value, 0), self.MAX_COUNT)))
+        if self.read_dt:
+            time.sleep(self.read_dt)
+        return values
+
+    def acquire(self, num_samp, interval):
+        block = []
+        for i in range(num_samp):
+            block.append(self.raw_values())
+            if i < num_samp-1:
+                time.sleep(interval)
+        return block
+
+    # Commands
+    # -------------------------------------------------------------------------
+
+    def read_command(self, msg):
+        try:
+            num_samp = int(msg.get('samples', 1))
+            interval = float(msg.get('interval', 0.0))
+        except (ValueError, TypeError):
+            raise EmulatorCommandError('samples and interval must be numbers')
+        if not 1 <= num_samp <= self.MAX_READ_SAMPLES:
+            raise EmulatorCommandError(f'samples must be in 1 to {self.MAX_READ_SAMPLES}')
+        if not 0.0 <= interval <= self.MAX_READ_INTERVAL:
+            raise EmulatorCommandError(f'interval must be in 0 to {self.MAX_READ_INTERVAL}')
+        reduce_type = msg.get('reduce', 'none')
+        if not reduce_type in ('none', 'mean', 'median', 'stats'):
+            raise EmulatorCommandError(f'unknown reduce {reduce_type}')
+        if num_samp == 1:
+            return self.read_response(self.acquire(1, interval), reduce_type)
+        else:
+            return lambda: self.read_response(self.acquire(num_samp, interval), reduce_type)
+
+    def read_response(self, block, reduce_type):
+        columns = list(zip(*block))
+
+        def reduce_columns(func):
+            return {n: float(func(c)) for n, c in zip(CHANNEL_NAMES, columns)}
+
+        rsp = {}
+        if reduce_type == 'none':
+            if len(block) == 1:
+                rsp['values'] = dict(zip(CHANNEL_NAMES, block[0]))
+            else:
+                rsp['values'] = {n: list(c) for n, c in zip(CHANNEL_NAMES, columns)}
+        elif reduce_type == 'mean':
+            rsp['values'] = reduce_columns(statistics.fmean)
+        elif reduce_type == 'median':
+            rsp['values'] = reduce_columns(statistics.median)
+        else:
+            rsp['values'] = {
+                    'mean' : reduce_columns(statistics.fmean),
+                    'std'  : reduce_columns(statistics.pstdev),
+                    'min'  : reduce_columns(min),
+                    'max'  : reduce_columns(max),
+                    }
+        rsp['samples'] = len(block)
+        rsp['reduce'] = reduce_type
+        if self.is_blanked:
+            rsp['blanks'] = dict(zip(CHANNEL_NAMES, self.blank_values))
+        return rsp
+
+    def blank_command(self, msg):
+        def job():
+            block = self.acquire(self.NUM_BLANK_SAMPLES, self.BLANK_DT)
+            columns = zip(*block)
+            self.blank_values = [max(float(statistics.median(c)), 1.0) for c in columns]
+            return {'blanks': dict(zip(CHANNEL_NAMES, self.blank_values))}
+        return job
+
+    def reset_blank_command(self, msg):
+        self.blank_values = None
+        return {'is_blanked': self.is_blanked}
+
+    def set_gain_command(self, msg):
+        gain = msg.get('gain', None)
+        if not gain in GAIN_NAMES:
+            raise EmulatorCommandError(f'unknown gain {gain}')
+        self.gain = gain
+        self.blank_values = None
+        return {'gain': gain, 'is_blanked': self.is_blanked}
+
+    def set_integration_time_command(self, msg):
+        itime = msg.get('integration_time', None)
+        if not itime in INTEGRATION_TIMES:
+            raise EmulatorCommandError(f'unknown integration time {itime}')
+        self.integration_time = itime
+        self.blank_values = None
+        return {'integration_time': itime, 'is_blanked': self.is_blanked}
+
+    def select_measurement_command(self, msg):
+        name = msg.get('name', None)
+        if not name in DEFAULT_MEASUREMENTS:
+            raise EmulatorCommandError(f'unknown measurement {name}')
+        self.measurement = name
+        return {'measurement': name, 'units': None}
+
+    def list_measurements_command(self, msg):
+        measurements = [
+                {'name': name, 'units': None, 'led': None, 'channel': None}
+                for name in DEFAULT_MEASUREMENTS
+                ]
+        return {'measurements': measurements, 'current': self.measurement}
+
+    def get_config_command(self, msg):
+        return {
+                'version'          : f'emulator ({self.name})',
+                'measurement'      : self.measurement,
+                'precision'        : 2,
+                'startup'          : None,
+                'is_blanked'       : self.is_blanked,
+                'gain'             : self.gain,
+                'integration_time' : self.integration_time,
+                }
+
+    def memory_command(self, msg):
+        # Static memory model, set mem_alloc to emulate memory pressure
+        action = msg.get('action', 'status')
+        if action == 'reset':
+            self.mem_min_free = None
+        elif action != 'status':
+            raise EmulatorCommandError(f'unknown action {action}')
+        free = self.HEAP_SIZE - self.mem_alloc
+        if self.mem_min_free is None or free < self.mem_min_free:
+            self.mem_min_free = free
+        return {
+                'free'             : free,
+                'alloc'            : self.mem_alloc,
+                'min_free'         : self.mem_min_free,
+                'low'              : free < self.MEM_LOW_FREE,
+                'low_count'        : int(self.mem_min_free < self.MEM_LOW_FREE),
+                'loop_garbage'     : self.MEM_LOOP_GARBAGE,
+                'loop_garbage_max' : self.MEM_LOOP_GARBAGE,
+                'regions'          : dict(self.MEM_REGIONS),
+                'high_water'       : {'measure': self.mem_alloc + self.MEM_LOOP_GARBAGE},
+                }
+
+    # Serial handling
+    # -------------------------------------------------------------------------
+
+    def send_message(self, msg):
+        data = (json.dumps(msg) + '\r\n').encode()
+        with self._write_lock:
+            try:
+                os.write(self._master_fd, data)
+            except (OSError, TypeError):
+                pass
+
+    def new_response(self, msg):
+        rsp = {'command': msg.get('command', None)}
+        if 'id' in msg:
+            rsp['id'] = msg['id']
+        return rsp
+
+    def _receive_loop(self):
+        buffer = b''
+        while self._running:
+            # Poll so that stop() doesn't wait on a blocked read
+            try:
+                readable, _, _ = select.select([self._master_fd], [], [], self.POLL_DT)
+                if not readable:
+                    continue
+                data = os.read(self._master_fd, 4096)
+            except (OSError, TypeError):
+                break
+            if not data:
+                break
+            buffer += data
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                if type(msg) != dict:
+                    self.send_message({'command': 'missing'})
+                    continue
+                try:
+                    self._commands.put_nowait(msg)
+                except queue.Full:
+                    rsp = self.new_response(msg)
+                    rsp['response'] = {'error': 'command queue full'}
+                    self.send_message(rsp)
+
+    def _command_loop(self):
+        while self._running:
+            msg = self._commands.get()
+            if msg is None:
+                break
+            self.process_command(msg)
+
+    def process_command(self, msg):
+        rsp = self.new_response(msg)
+        if rsp['command'] is None:
+            self.send_message({'command': 'missing'})
+            return
+        try:
+            handler = self.commands[rsp['command']]
+        except (KeyError, TypeError):
+            rsp['response'] = {'error': 'unknown command'}
+            self.send_message(rsp)
+            return
+        try:
+            result = handler(msg)
+            if callable(result):
+                # Long running command, acknowledge now and respond when done
+                self.send_message(dict(rsp, status=STATUS_PENDING))
+                rsp['status'] = STATUS_DONE
+                result = result()
+        except EmulatorCommandError as error:
+            result = {'error': str(error)}
+        rsp['response'] = result
+        self.send_message(rsp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='emulate colorimeters on local ptys')
+    parser.add_argument('-n', '--number', type=int, default=1, help='number of devices')
+    parser.add_argument('--read-dt', type=float, default=0.0, help='seconds per reading')
+    args = parser.parse_args(argv)
+    devices = []
+    for i in range(args.number):
+        device = EmulatedColorimeter(name=f'emulator{i}', read_dt=args.read_dt)
+        device.start()
+        devices.append(device)
+        print(device.port, flush=True)
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for device in devices:
+            device.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
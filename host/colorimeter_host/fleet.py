@@ -0,0 +1,139 @@
+import sys
+import time
+import json
+import asyncio
+import argparse
+from dataclasses import dataclass
+from dataclasses import field
+
+from .client import ColorimeterClient
+from .protocol import ColorimeterError
+
+
+@dataclass
+class Frame:
+    timestamp: float
+    device: str
+    seq: int
+    values: dict = field(default_factory=dict)
+    blanks: dict = None
+    error: str = None
+
+
+class Fleet:
+
+    """ Drives several colorimeters concurrently and merges their readings
+    into a single stream of timestamped frames. """
+
+    FRAME_QUEUE_SIZE = 1000
+
+    def __init__(self, clients):
+        self.clients = list(clients)
+
+    @classmethod
+    def from_ports(cls, ports, **client_kwargs):
+        return cls(ColorimeterClient(port, **client_kwargs) for port in ports)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        await asyncio.gather(*(client.open() for client in self.clients))
+
+    async def close(self):
+        await asyncio.gather(
+                *(client.close() for client in self.clients),
+                return_exceptions=True,
+                )
+
+    async def command(self, command, **params):
+        # Send the same command to every device, returns {device: response}
+        # with exceptions in place of the responses of failed devices.
+        results = await asyncio.gather(
+                *(client.command(command, **params) for client in self.clients),
+                return_exceptions=True,
+                )
+        return {c.name: r for c, r in zip(self.clients, results)}
+
+    async def poll(self, period, count=None, **read_params):
+        """ Async iterator over the merged frames of all devices. Each device is
+        read once every period seconds on its own drift free schedule. A
+        device which fails produces frames with error set and is retried on
+        its next scheduled read. """
+        queue = asyncio.Queue(self.FRAME_QUEUE_SIZE)
+        tasks = [
+                asyncio.create_task(self._poll_client(c, queue, period, count, read_params))
+                for c in self.clients
+                ]
+        num_running = len(tasks)
+        try:
+            while num_running > 0:
+                frame = await queue.get()
+                if frame is None:
+                    num_running -= 1
+                else:
+                    yield frame
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _poll_client(self, client, queue, period, count, read_params):
+        t_start = time.monotonic()
+        seq = 0
+        try:
+            while count is None or seq < count:
+                delay = t_start + seq*period - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                t_send = time.time()
+                try:
+                    rsp = await client.read(**read_params)
+                except (ColorimeterError, asyncio.TimeoutError, OSError) as error:
+                    frame = Frame(time.time(), client.name, seq, error=str(error))
+                else:
+                    frame = Frame(
+                            0.5*(t_send + time.time()),
+                            client.name,
+                            seq,
+                            values = rsp.get('values', {}),
+                            blanks = rsp.get('blanks', None),
+                            )
+                await queue.put(frame)
+                seq += 1
+        finally:
+            await queue.put(None)
+
+
+async def poll_main(args):
+    read_params = {
+            'samples'  : args.samples,
+            'interval' : args.interval,
+            'reduce'   : args.reduce,
+            }
+    async with Fleet.from_ports(args.ports) as fleet:
+        async for frame in fleet.poll(args.period, args.count, **read_params):
+            print(json.dumps(frame.__dict__), flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='poll a fleet of colorimeters')
+    parser.add_argument('ports', nargs='+', help='serial ports of the devices')
+    parser.add_argument('--period', type=float, default=1.0)
+    parser.add_argument('--count', type=int, default=None)
+    parser.add_argument('--samples', type=int, default=1)
+    parser.add_argument('--interval', type=float, default=0.0)
+    parser.add_argument('--reduce', default='none')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(poll_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import json
+
+# Number of commands the firmware will queue (constants.COMMAND_QUEUE_SIZE)
+COMMAND_QUEUE_SIZE = 8
+
+CHANNEL_NAMES = [
+        '415nm', '445nm', '480nm', '515nm', '555nm',
+        '590nm', '630nm', '680nm', '910nm', 'clear',
+        ]
+
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+
+
+class ColorimeterError(Exception):
+    pass
+
+
+class CommandFailed(ColorimeterError):
+
+    def __init__(self, command, error):
+        super().__init__(f'{command}: {error}')
+        self.command = command
+        self.error = error
+
+
+def encode_message(msg):
+    return (json.dumps(msg) + '\n').encode()
+
+
+def decode_line(line):
+    # The device console may also carry non-protocol text (e.g. tracebacks
+    # or the soft reboot banner) which is ignored by returning None.
+    try:
+        text = line.decode().strip()
+    except UnicodeDecodeError:
+        return None
+    if not text.startswith('{'):
+        return None
+    try:
+        msg = json.loads(text)
+    except ValueError:
+        return None
+    if type(msg) != dict:
+        return None
+    return msg
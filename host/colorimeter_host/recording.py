@@ -0,0 +1,122 @@
+import sys
+import json
+import struct
+import base64
+import asyncio
+import argparse
+
+from .protocol import CHANNEL_NAMES
+from .protocol import ColorimeterError
+
+# Recording file format written by the firmware's record command, see
+# src/recorder.py. All little endian, times in ms since the recording started.
+RECORD_MAGIC = b'CREC'
+RECORD_VERSION = 2
+RECORD_FRAME = 1
+RECORD_BUTTON = 2
+RECORD_SERIAL = 3
+RECORD_STATE = 4
+RECORD_HEADER = struct.Struct('<4sBB')
+RECORD_FRAME_BODY = struct.Struct(f'<IBBH{len(CHANNEL_NAMES)}H')
+RECORD_BUTTON_BODY = struct.Struct('<IB')
+RECORD_SERIAL_BODY = struct.Struct('<IH')
+RECORD_STATE_BODY = struct.Struct('<IH')
+
+RECORD_TYPE_NAMES = {
+        RECORD_FRAME  : 'frame',
+        RECORD_BUTTON : 'button',
+        RECORD_SERIAL : 'serial',
+        RECORD_STATE  : 'state',
+        }
+
+
+def read_recording(data):
+    """ Yields the records of a recording as dicts with type, time (s) and
+    gain, atime, astep and counts for frames, mask for button presses,
+    message for serial messages or state for the state the recording
+    started from. """
+    try:
+        magic, version, num_channel = RECORD_HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise ColorimeterError('recording too short')
+    if magic != RECORD_MAGIC or version != RECORD_VERSION:
+        raise ColorimeterError('not a recording')
+    if num_channel != len(CHANNEL_NAMES):
+        raise ColorimeterError(f'recording has {num_channel} channels')
+    pos = RECORD_HEADER.size
+    while pos < len(data):
+        record_type = data[pos]
+        pos += 1
+        record = {'type': RECORD_TYPE_NAMES.get(record_type, record_type)}
+        try:
+            if record_type == RECORD_FRAME:
+                fields = RECORD_FRAME_BODY.unpack_from(data, pos)
+                pos += RECORD_FRAME_BODY.size
+                t_ms, record['gain'], record['atime'], record['astep'] = fields[:4]
+                record['counts'] = list(fields[4:])
+            elif record_type == RECORD_BUTTON:
+                t_ms, record['mask'] = RECORD_BUTTON_BODY.unpack_from(data, pos)
+                pos += RECORD_BUTTON_BODY.size
+            elif record_type == RECORD_SERIAL:
+                t_ms, length = RECORD_SERIAL_BODY.unpack_from(data, pos)
+                pos += RECORD_SERIAL_BODY.size
+                record['message'] = json.loads(data[pos:pos+length])
+                pos += length
+            elif record_type == RECORD_STATE:
+                t_ms, length = RECORD_STATE_BODY.unpack_from(data, pos)
+                pos += RECORD_STATE_BODY.size
+                record['state'] = json.loads(data[pos:pos+length])
+                pos += length
+            else:
+                raise ColorimeterError(f'unknown record type {record_type} at {pos-1}')
+        except (struct.error, ValueError):
+            # Recording cut short part way through a record or its json
+            return
+        record['time'] = 1.0e-3*t_ms
+        yield record
+
+
+async def fetch_recording(client, name='record.bin', chunk_size=1024):
+    """ Downloads a recording from the device using the record command. """
+    data = bytearray()
+    while True:
+        rsp = await client.command('record', action='fetch', file=name,
+                offset=len(data), size=chunk_size)
+        data.extend(base64.b64decode(rsp['data']))
+        if rsp['eof']:
+            return bytes(data)
+
+
+async def fetch_main(args):
+    from .client import ColorimeterClient
+    async with ColorimeterClient(args.port) as client:
+        data = await fetch_recording(client, args.file)
+    with open(args.output, 'wb') as f:
+        f.write(data)
+
+
+def dump(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    for record in read_recording(data):
+        print(json.dumps(record))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='fetch or dump colorimeter recordings')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    fetch_parser = subparsers.add_parser('fetch', help='download a recording')
+    fetch_parser.add_argument('port', help='serial port of the device')
+    fetch_parser.add_argument('output', help='file to write')
+    fetch_parser.add_argument('--file', default='record.bin')
+    dump_parser = subparsers.add_parser('dump', help='print records as json lines')
+    dump_parser.add_argument('path')
+    args = parser.parse_args(argv)
+    if args.action == 'fetch':
+        asyncio.run(fetch_main(args))
+    else:
+        dump(args.path)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import os
+import asyncio
+
+DEFAULT_BAUDRATE = 115200
+STREAM_LIMIT = 2**20
+
+
+async def open_serial(port, baudrate=DEFAULT_BAUDRATE):
+    # Returns an asyncio (reader, writer) pair for the serial port. Uses
+    # pyserial-asyncio when installed and otherwise falls back to a raw posix
+    # tty, which also works for the pty of the local emulator.
+    try:
+        import serial_asyncio
+    except ImportError:
+        return await open_posix_tty(port, baudrate)
+    return await serial_asyncio.open_serial_connection(
+            url = port,
+            baudrate = baudrate,
+            limit = STREAM_LIMIT,
+            )
+
+
+async def open_posix_tty(port, baudrate=DEFAULT_BAUDRATE):
+    import tty
+    import termios
+
+    fd = os.open(port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        tty.setraw(fd)
+        attrs = termios.tcgetattr(fd)
+        speed = getattr(termios, f'B{baudrate}', termios.B115200)
+        attrs[4] = attrs[5] = speed
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        write_fd = os.dup(fd)
+    except BaseException:
+        os.close(fd)
+        raise
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=STREAM_LIMIT, loop=loop)
+    read_protocol = asyncio.StreamReaderProtocol(reader, loop=loop)
+    await loop.connect_read_pipe(
+            lambda: read_protocol,
+            os.fdopen(fd, 'rb', buffering=0),
+            )
+    write_transport, write_protocol = await loop.connect_write_pipe(
+            asyncio.streams.FlowControlMixin,
+            os.fdopen(write_fd, 'wb', buffering=0),
+            )
+    writer = asyncio.StreamWriter(write_transport, write_protocol, reader, loop)
+    return reader, writer
@@ -0,0 +1,19 @@
+import pytest
+
+from colorimeter_host import EmulatedColorimeter
+
+
+@pytest.fixture
+def emulator():
+    with EmulatedColorimeter(seed=0) as device:
+        yield device
+
+
+@pytest.fixture
+def emulators():
+    devices = [EmulatedColorimeter(name=f'emulator{i}', seed=i) for i in range(2)]
+    for device in devices:
+        device.start()
+    yield devices
+    for device in devices:
+        device.stop()
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+
+from colorimeter_host import ColorimeterClient
+from colorimeter_host import ColorimeterError
+from colorimeter_host import CommandFailed
+from colorimeter_host.protocol import CHANNEL_NAMES
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10.0))
+
+
+def test_get_config(emulator):
+    async def main():
+        async with ColorimeterClient(emulator.port) as client:
+            return await client.command('get_config')
+    rsp = run(main())
+    assert rsp['version'] == 'emulator (emulator)'
+    assert rsp['gain'] == '16x'
+    assert rsp['is_blanked'] is False
+
+
+def test_blank_job_then_read(emulator):
+    async def main():
+        async with ColorimeterClient(emulator.port) as client:
+            blank = await client.command('blank')
+            read = await client.read(samples=4, reduce='mean')
+            return blank, read
+    blank, read = run(main())
+    assert list(blank['blanks']) == CHANNEL_NAMES
+    assert read['samples'] == 4
+    assert read['reduce'] == 'mean'
+    assert list(read['values']) == CHANNEL_NAMES
+    assert read['blanks'] == blank['blanks']
+    for name, lamp in zip(CHANNEL_NAMES, emulator.LAMP_SPECTRUM):
+        assert read['values'][name] == pytest.approx(lamp, rel=0.05)
+
+
+def test_read_follows_transmittance(emulator):
+    emulator.transmittance = [0.5]*len(CHANNEL_NAMES)
+
+    async def main():
+        async with ColorimeterClient(emulator.port) as client:
+            return await client.read(samples=3, reduce='median')
+    rsp = run(main())
+    for name, lamp in zip(CHANNEL_NAMES, emulator.LAMP_SPECTRUM):
+        assert rsp['values'][name] == pytest.approx(0.5*lamp, rel=0.05)
+
+
+def test_command_error(emulator):
+    async def main():
+        async with ColorimeterClient(emulator.port) as client:
+            await client.command('set_gain', gain='3x')
+    with pytest.raises(CommandFailed) as error:
+        run(main())
+    assert error.value.command == 'set_gain'
+    assert 'unknown gain' in error.value.error
+
+
+def test_pipelined_requests_matched_by_id(emulator):
+    gains = ['1x', '2x', '4x', '8x', '16x', '32x', '64x', '128x', '256x', '512x']
+
+    async def main():
+        async with ColorimeterClient(emulator.port) as client:
+            return await asyncio.gather(
+                    *(client.command('set_gain', gain=g) for g in gains)
+                    )
+    rsps = run(main())
+    assert [rsp['gain'] for rsp in rsps] == gains
+
+
+def test_events(emulator):
+    async def main():
+        async with ColorimeterClient(emulator.port) as client:
+            await client.command('get_config')
+            emulator.send_message({'event': 'capture', 'values': {}})
+            events = client.events()
+            return await asyncio.wait_for(events.__anext__(), 2.0)
+    assert run(main()) == {'event': 'capture', 'values': {}}
+
+
+def test_stream(emulator):
+    async def main():
+        async with ColorimeterClient(emulator.port) as client:
+            return [item async for item in client.stream(0.01, count=3)]
+    items = run(main())
+    assert len(items) == 3
+    timestamps = [t for t, rsp in items]
+    assert timestamps == sorted(timestamps)
+    assert all(rsp['samples'] == 1 for t, rsp in items)
+
+
+def test_command_when_closed():
+    client = ColorimeterClient('/dev/null')
+    with pytest.raises(ColorimeterError):
+        run(client.command('get_config'))
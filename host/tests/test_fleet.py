@@ -0,0 +1,50 @@
+import asyncio
+
+from colorimeter_host import Fleet
+from colorimeter_host import CommandFailed
+from colorimeter_host.protocol import CHANNEL_NAMES
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10.0))
+
+
+def test_command_all(emulators):
+    async def main():
+        fleet = Fleet.from_ports([d.port for d in emulators])
+        async with fleet:
+            ok = await fleet.command('set_gain', gain='4x')
+            bad = await fleet.command('set_gain', gain='3x')
+        return ok, bad
+    ok, bad = run(main())
+    assert [rsp['gain'] for rsp in ok.values()] == ['4x', '4x']
+    assert all(isinstance(rsp, CommandFailed) for rsp in bad.values())
+
+
+def test_poll_merges_devices(emulators):
+    ports = [d.port for d in emulators]
+
+    async def main():
+        async with Fleet.from_ports(ports) as fleet:
+            return [f async for f in fleet.poll(0.01, count=3, reduce='mean')]
+    frames = run(main())
+    assert len(frames) == 6
+    for port in ports:
+        device_frames = [f for f in frames if f.device == port]
+        assert [f.seq for f in device_frames] == [0, 1, 2]
+        for frame in device_frames:
+            assert frame.error is None
+            assert list(frame.values) == CHANNEL_NAMES
+
+
+def test_poll_reports_failed_device(emulators):
+    good, bad = emulators
+
+    async def main():
+        async with Fleet.from_ports([good.port, bad.port], timeout=1.0) as fleet:
+            bad.stop()
+            return [f async for f in fleet.poll(0.01, count=2)]
+    frames = run(main())
+    assert len(frames) == 4
+    assert all(f.error is None for f in frames if f.device == good.port)
+    assert all(f.error is not None for f in frames if f.device == bad.port)
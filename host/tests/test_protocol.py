@@ -0,0 +1,50 @@
+import ast
+import pathlib
+import pytest
+
+from colorimeter_host import protocol
+from colorimeter_host import recording
+
+# The firmware modules import CircuitPython libraries so the values shared
+# with the host are read from their source instead of importing them.
+SRC_DIR = pathlib.Path(__file__).resolve().parents[2] / 'src'
+
+
+def firmware_assignments(file_name):
+    path = SRC_DIR / file_name
+    if not path.exists():
+        pytest.skip('firmware source not available')
+    values = {}
+    for node in ast.parse(path.read_text()).body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+            if isinstance(target, ast.Name):
+                values[target.id] = node.value
+    return values
+
+
+def test_constants_match_firmware():
+    values = firmware_assignments('constants.py')
+    assert ast.literal_eval(values['COMMAND_QUEUE_SIZE']) == protocol.COMMAND_QUEUE_SIZE
+    channels = ast.literal_eval(values['STR_TO_CHANNEL'].args[0])
+    assert [name for name, num in sorted(channels, key=lambda x: x[1])] == protocol.CHANNEL_NAMES
+
+
+def test_recording_format_matches_firmware():
+    values = firmware_assignments('recorder.py')
+    names = ('RECORD_MAGIC', 'RECORD_VERSION', 'RECORD_FRAME', 'RECORD_BUTTON',
+            'RECORD_SERIAL', 'RECORD_STATE')
+    for name in names:
+        assert ast.literal_eval(values[name]) == getattr(recording, name)
+    assert ast.literal_eval(values['RECORD_HEADER_FMT']) == recording.RECORD_HEADER.format
+    assert ast.literal_eval(values['RECORD_BUTTON_FMT']) == recording.RECORD_BUTTON_BODY.format
+    assert ast.literal_eval(values['RECORD_SERIAL_FMT']) == recording.RECORD_SERIAL_BODY.format
+    assert ast.literal_eval(values['RECORD_STATE_FMT']) == recording.RECORD_STATE_BODY.format
+
+
+def test_decode_line():
+    assert protocol.decode_line(b'{"id": 1}\r\n') == {'id': 1}
+    assert protocol.decode_line(b'soft reboot\r\n') is None
+    assert protocol.decode_line(b'{"id": \r\n') is None
+    assert protocol.decode_line(b'\xff{}') is None
+    assert protocol.encode_message({'id': 1}) == b'{"id": 1}\n'
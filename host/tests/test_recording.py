@@ -0,0 +1,71 @@
+import json
+import struct
+import pytest
+
+from colorimeter_host import ColorimeterError
+from colorimeter_host import read_recording
+from colorimeter_host.recording import RECORD_HEADER
+from colorimeter_host.recording import RECORD_MAGIC
+from colorimeter_host.recording import RECORD_VERSION
+from colorimeter_host.recording import RECORD_FRAME
+from colorimeter_host.recording import RECORD_BUTTON
+from colorimeter_host.recording import RECORD_SERIAL
+from colorimeter_host.recording import RECORD_STATE
+from colorimeter_host.recording import RECORD_FRAME_BODY
+from colorimeter_host.recording import RECORD_BUTTON_BODY
+from colorimeter_host.recording import RECORD_SERIAL_BODY
+from colorimeter_host.recording import RECORD_STATE_BODY
+from colorimeter_host.protocol import CHANNEL_NAMES
+
+COUNTS = list(range(100, 100 + len(CHANNEL_NAMES)))
+STATE = {'measurement': 'Absorbance', 'is_blanked': True}
+
+
+def make_recording():
+    data = bytearray(RECORD_HEADER.pack(RECORD_MAGIC, RECORD_VERSION, len(CHANNEL_NAMES)))
+    state = json.dumps(STATE).encode()
+    data.append(RECORD_STATE)
+    data.extend(RECORD_STATE_BODY.pack(0, len(state)))
+    data.extend(state)
+    data.append(RECORD_FRAME)
+    data.extend(RECORD_FRAME_BODY.pack(100, 9, 100, 999, *COUNTS))
+    data.append(RECORD_BUTTON)
+    data.extend(RECORD_BUTTON_BODY.pack(250, 4))
+    message = json.dumps({'command': 'blank'}).encode()
+    data.append(RECORD_SERIAL)
+    data.extend(RECORD_SERIAL_BODY.pack(1500, len(message)))
+    data.extend(message)
+    return bytes(data)
+
+
+def test_read_recording():
+    records = list(read_recording(make_recording()))
+    assert records == [
+            {'type': 'state', 'state': STATE, 'time': 0.0},
+            {'type': 'frame', 'gain': 9, 'atime': 100, 'astep': 999,
+                'counts': COUNTS, 'time': 0.1},
+            {'type': 'button', 'mask': 4, 'time': 0.25},
+            {'type': 'serial', 'message': {'command': 'blank'}, 'time': 1.5},
+            ]
+
+
+def test_truncated_recording():
+    data = make_recording()
+    records = list(read_recording(data[:RECORD_HEADER.size + 5]))
+    assert records == []
+    records = list(read_recording(data[:-5]))
+    assert [r['type'] for r in records] == ['state', 'frame', 'button']
+
+
+def test_bad_header():
+    data = make_recording()
+    with pytest.raises(ColorimeterError):
+        list(read_recording(b'XXXX' + data[4:]))
+    with pytest.raises(ColorimeterError):
+        list(read_recording(data[:2]))
+
+
+def test_unknown_record_type():
+    data = make_recording() + bytes([7])
+    with pytest.raises(ColorimeterError):
+        list(read_recording(data))
@@ -0,0 +1,15 @@
+# Stand in for CircuitPython's analogio module on a PC. The default reading
+# is a full battery (4.2V through the PyBadge's divider by 2).
+
+DEFAULT_VALUE = int(65536*2.1/3.3)
+
+
+class AnalogIn:
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.value = DEFAULT_VALUE
+        self.reference_voltage = 3.3
+
+    def deinit(self):
+        pass
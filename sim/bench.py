@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+from collections import OrderedDict
+
+import simulator
+
+# Benchmarks the firmware's main loop on a PC under a virtual clock, an hour
+# of operation per case takes seconds. Each case is a configuration (filters,
+# kinetics, etc.) run with the simulated sensor and idle timeouts disabled,
+# except for the idle case, so the loop measures throughout. The report gives
+# the passes of the main loop, wall time and speedup over real time as json.
+#
+#   python sim/bench.py --duration 3600
+
+CASES = OrderedDict([
+    ('absorbance', {}),
+    ('moving_median', {'filters': {'default': {'type': 'moving_median', 'window': 9}}}),
+    ('two_pole', {'filters': {'default': {'type': 'two_pole', 'freq_cutoff': 0.5}}}),
+    ('statistics', {'statistics': {'enabled': True}}),
+    ('stability', {'stability': {'enabled': True}}),
+    ('idle', {'idle': {}}),
+    ])
+
+ACTIVE_IDLE = {'dim_timeout': None, 'blank_timeout': None, 'sleep_timeout': None}
+
+COMMANDS = {
+    'kinetics': {'command': 'kinetics', 'action': 'start', 'interval': 1.0},
+    }
+
+
+def light(t):
+    # Slowly changing counts with some ripple, absorbance rising over time
+    counts = 30000*10**(-0.01*t/60.0)
+    return [counts*(1.0 + 0.001*((7*i + int(10*t)) % 5)) for i in range(10)]
+
+
+def run_case(name, configuration, command, duration):
+    import clock
+    import messaging
+    from sim_devices import SimColorimeter
+    configuration = dict(configuration)
+    configuration.setdefault('idle', ACTIVE_IDLE)
+    with tempfile.TemporaryDirectory() as drive:
+        simulator.make_drive(drive, configuration)
+        cwd = os.getcwd()
+        os.chdir(drive)
+        virtual_clock = clock.VirtualClock()
+        wall_clock = clock.set_clock(virtual_clock)
+        messaging.set_message_sink(lambda msg: None)
+        try:
+            colorimeter = SimColorimeter(light)
+            if command is not None:
+                colorimeter.send(command)
+            num_steps = 0
+            t0 = time.monotonic()
+            while virtual_clock.t < duration:
+                colorimeter.step()
+                colorimeter.idle_manager.sleep()
+                num_steps += 1
+            wall_time = time.monotonic() - t0
+        finally:
+            messaging.set_message_sink(None)
+            clock.set_clock(wall_clock)
+            os.chdir(cwd)
+    rsp = OrderedDict()
+    rsp['case'] = name
+    rsp['steps'] = num_steps
+    rsp['virtual_time'] = virtual_clock.t
+    rsp['wall_time'] = wall_time
+    rsp['step_us'] = 1.0e6*wall_time/num_steps if num_steps else 0.0
+    rsp['speedup'] = virtual_clock.t/wall_time if wall_time > 0.0 else None
+    return rsp
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark the firmware main loop')
+    parser.add_argument('--duration', type=float, default=3600.0, help='virtual seconds per case')
+    parser.add_argument('cases', nargs='*', help='cases to run, default all')
+    args = parser.parse_args(argv)
+    simulator.install()
+    names = args.cases or list(CASES) + list(COMMANDS)
+    for name in names:
+        if name in COMMANDS:
+            report = run_case(name, {}, COMMANDS[name], args.duration)
+        else:
+            report = run_case(name, CASES[name], None, args.duration)
+        print(json.dumps(report))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
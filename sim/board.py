@@ -0,0 +1,42 @@
+# Stand in for CircuitPython's board module on a PC, the PyBadge's pins and
+# display. The display doesn't draw, the root group shown is kept for tests.
+
+
+class Pin:
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f'board.{self.name}'
+
+
+class Display:
+
+    width = 160
+    height = 128
+
+    def __init__(self):
+        self.brightness = 1.0
+        self.auto_refresh = True
+        self.root_group = None
+
+    def show(self, group):
+        self.root_group = group
+
+    def refresh(self, **kwargs):
+        return True
+
+
+DISPLAY = Display()
+
+PIN_NAMES = (
+        'A0', 'A1', 'A2', 'A3', 'A4', 'A5', 'A6', 'A7', 'A8',
+        'D2', 'D3', 'D4', 'D5', 'D6', 'D7', 'D8', 'D9', 'D10', 'D11', 'D12', 'D13',
+        'SCL', 'SDA', 'SCK', 'MOSI', 'MISO', 'TX', 'RX',
+        'BUTTON_CLOCK', 'BUTTON_OUT', 'BUTTON_LATCH',
+        'LIGHT', 'NEOPIXEL', 'SPEAKER', 'SPEAKER_ENABLE',
+        )
+
+for name in PIN_NAMES:
+    globals()[name] = Pin(name)
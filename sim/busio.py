@@ -0,0 +1,45 @@
+# Stand in for CircuitPython's busio module on a PC. The I2C bus is empty, so
+# the light sensor isn't found, the same as a device without one.
+
+
+class I2C:
+
+    def __init__(self, scl, sda, frequency=100000):
+        self.scl = scl
+        self.sda = sda
+
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def scan(self):
+        return []
+
+    def writeto(self, address, buffer, start=0, end=None):
+        raise OSError(19, 'No such device')
+
+    def readfrom_into(self, address, buffer, start=0, end=None):
+        raise OSError(19, 'No such device')
+
+    def writeto_then_readfrom(self, address, out_buffer, in_buffer, **kwargs):
+        raise OSError(19, 'No such device')
+
+    def deinit(self):
+        pass
+
+
+class SPI:
+
+    def __init__(self, clock, MOSI=None, MISO=None):
+        self.clock = clock
+
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def deinit(self):
+        pass
@@ -0,0 +1,32 @@
+# Stand in for CircuitPython's digitalio module on a PC. Outputs keep the
+# value written, inputs read whatever the test or simulator sets.
+
+
+class Direction:
+    INPUT = 'input'
+    OUTPUT = 'output'
+
+
+class Pull:
+    UP = 'up'
+    DOWN = 'down'
+
+
+class DigitalInOut:
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+        self.value = False
+
+    def switch_to_output(self, value=False, drive_mode=None):
+        self.direction = Direction.OUTPUT
+        self.value = value
+
+    def switch_to_input(self, pull=None):
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    def deinit(self):
+        pass
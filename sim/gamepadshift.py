@@ -0,0 +1,14 @@
+# Stand in for CircuitPython's gamepadshift module on a PC. get_pressed
+# returns the mask of buttons set by the test or simulator.
+
+
+class GamePadShift:
+
+    def __init__(self, clock, data, latch):
+        self.pressed = 0
+
+    def get_pressed(self):
+        return self.pressed
+
+    def deinit(self):
+        pass
@@ -0,0 +1,74 @@
+# Stand in for CircuitPython's keypad module on a PC. Nothing is scanned,
+# tests and the simulator queue key events with press and release.
+
+
+class Event:
+
+    def __init__(self, key_number=0, pressed=True, timestamp=None):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.timestamp = timestamp
+
+    @property
+    def released(self):
+        return not self.pressed
+
+    def __eq__(self, other):
+        return (self.key_number, self.pressed) == (other.key_number, other.pressed)
+
+
+class EventQueue:
+
+    def __init__(self, max_events=64):
+        self.max_events = max_events
+        self.queue = []
+        self.overflowed = False
+
+    def put(self, key_number, pressed):
+        if len(self.queue) >= self.max_events:
+            self.overflowed = True
+            return
+        self.queue.append((key_number, pressed))
+
+    def get(self):
+        if not self.queue:
+            return None
+        key_number, pressed = self.queue.pop(0)
+        return Event(key_number, pressed)
+
+    def get_into(self, event):
+        if not self.queue:
+            return False
+        event.key_number, event.pressed = self.queue.pop(0)
+        return True
+
+    def clear(self):
+        self.queue.clear()
+        self.overflowed = False
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __bool__(self):
+        return bool(self.queue)
+
+
+class ShiftRegisterKeys:
+
+    def __init__(self, *, clock, data, latch, key_count=8, value_to_latch=True,
+            value_when_pressed=True, interval=0.02, max_events=64, **kwargs):
+        self.key_count = key_count
+        self.interval = interval
+        self.events = EventQueue(max_events)
+
+    def press(self, key_number):
+        self.events.put(key_number, True)
+
+    def release(self, key_number):
+        self.events.put(key_number, False)
+
+    def reset(self):
+        self.events.clear()
+
+    def deinit(self):
+        pass
@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+import argparse
+
+import simulator
+
+# Replays a recording fetched from a device (see host/colorimeter_host/
+# recording.py) on a PC. The recorded configuration and calibrations are
+# written to a temporary drive so the replay starts as the device did.
+#
+#   python sim/run_replay.py record.bin --output replay.jsonl
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='replay a colorimeter recording')
+    parser.add_argument('recording')
+    parser.add_argument('--output', default=None, help='json lines of outputs')
+    args = parser.parse_args(argv)
+    recording = os.path.abspath(args.recording)
+    output = os.path.abspath(args.output) if args.output else None
+
+    simulator.install()
+    state = simulator.recording_state(recording)
+    with tempfile.TemporaryDirectory() as drive:
+        simulator.make_drive(drive, state['configuration'], state['calibrations'])
+        cwd = os.getcwd()
+        os.chdir(drive)
+        try:
+            import replay
+            replay.main(recording, output)
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
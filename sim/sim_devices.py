@@ -0,0 +1,95 @@
+import constants
+from colorimeter import Colorimeter
+from light_sensor import LightSensor
+
+# Simulated hardware for running the firmware on a PC, import after
+# simulator.install(). Light readings come from a function of the (virtual)
+# time, serial commands from a queue.
+
+
+class SimSensorDevice:
+
+    def __init__(self, counts):
+        # Stands in for the AS7341 driver, counts(t) gives the counts of the
+        # NUM_CHANNEL channels (8 visible, nir, clear) at time t.
+        import clock
+        self.clock = clock
+        self.counts = counts
+        self.gain = None
+        self.atime = None
+        self.astep = None
+        self.led = False
+        self.led_current = 4
+
+    def read(self):
+        return [int(v) for v in self.counts(self.clock.monotonic())]
+
+    @property
+    def all_channels(self):
+        return self.read()[:8]
+
+    @property
+    def channel_nir(self):
+        return self.read()[8]
+
+    @property
+    def channel_clear(self):
+        return self.read()[9]
+
+
+class SimLightSensor(LightSensor):
+
+    def __init__(self, counts):
+        self._device = SimSensorDevice(counts)
+        self.recorder = None
+        self.gain = self.DEFAULT_GAIN
+        self.integration_time = self.DEFAULT_INTEGRATION_TIME
+
+    @property
+    def raw_values(self):
+        # One read of the device per frame, the driver reads all channels
+        values = self._device.read()
+        if self.recorder is not None:
+            self.recorder.frame(self._gain, self._integration_time, values)
+        return values
+
+
+class SimMessageReceiver:
+
+    def __init__(self):
+        self.messages = []
+        self.error = False
+        self.error_count = 0
+
+    def send(self, msg):
+        self.messages.append(msg)
+
+    def update(self):
+        if self.messages:
+            return self.messages.pop(0)
+        return {}
+
+
+class SimColorimeter(Colorimeter):
+
+    def __init__(self, counts):
+        self.counts = counts
+        super().__init__()
+
+    def create_light_sensor(self):
+        return SimLightSensor(self.counts)
+
+    def create_message_receiver(self):
+        return SimMessageReceiver()
+
+    def send(self, msg):
+        self.message_receiver.send(msg)
+
+    def run_for(self, duration):
+        # Main loop passes, paced by the idle manager, for duration seconds
+        # of the current clock.
+        import clock
+        end_t = clock.monotonic() + duration
+        while clock.monotonic() < end_t:
+            self.step()
+            self.idle_manager.sleep()
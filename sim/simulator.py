@@ -0,0 +1,63 @@
+import os
+import gc
+import sys
+import json
+import shutil
+
+# Runs the firmware under CPython. The modules in this directory stand in for
+# the CircuitPython ones the firmware uses (board, keypad, ulab, etc.), the
+# rest (displayio, adafruit_display_text, ...) come from Blinka and the
+# libraries in requirements.txt.
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SIM_DIR)
+SRC_DIR = os.path.join(REPO_DIR, 'src')
+ASSETS_DIR = os.path.join(REPO_DIR, 'assets')
+
+MEM_FREE = 64*1024
+
+
+def install():
+    # Put the shims ahead of Blinka's on the path and the firmware after the
+    # standard library (its code.py would hide the code module), and give gc
+    # CircuitPython's memory functions. The firmware collects every pass,
+    # a full collection of CPython's heap takes ms so only the youngest
+    # generation is collected.
+    for path in (SIM_DIR, SRC_DIR):
+        if path in sys.path:
+            sys.path.remove(path)
+    sys.path.insert(0, SIM_DIR)
+    sys.path.append(SRC_DIR)
+    gc.mem_free = lambda: MEM_FREE
+    gc.mem_alloc = lambda: 0
+    if not hasattr(gc, 'collect_all'):
+        gc.collect_all = gc.collect
+        gc.collect = lambda generation=0: gc.collect_all(generation)
+
+
+def make_drive(path, configuration=None, calibrations=None):
+    # Lays out a CIRCUITPY drive in path with the assets and settings files,
+    # empty settings (all defaults) when not given. The firmware opens files
+    # relative to the working directory, so chdir to the drive before
+    # importing it (fonts are loaded on import).
+    import constants
+    os.makedirs(path, exist_ok=True)
+    shutil.copytree(ASSETS_DIR, os.path.join(path, 'assets'), dirs_exist_ok=True)
+    settings = (
+            (constants.CONFIGURATION_FILE, configuration),
+            (constants.CALIBRATIONS_FILE, calibrations),
+            )
+    for name, data in settings:
+        with open(os.path.join(path, name), 'w') as f:
+            json.dump(data if data is not None else {}, f)
+
+
+def recording_state(file_name):
+    # The state record at the start of a recording
+    from recorder import RecordReader
+    reader = RecordReader(file_name)
+    try:
+        record_type, t, state = next(reader)
+    finally:
+        reader.close()
+    return state
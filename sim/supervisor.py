@@ -0,0 +1,17 @@
+# Stand in for CircuitPython's supervisor module on a PC. Serial input isn't
+# read (serial_bytes_available stays 0), USB is always connected.
+
+
+class Runtime:
+
+    def __init__(self):
+        self.serial_bytes_available = 0
+        self.usb_connected = True
+        self.autoreload = True
+
+
+runtime = Runtime()
+
+
+def disable_autoreload():
+    runtime.autoreload = False
@@ -0,0 +1,2 @@
+# Stand in for CircuitPython's ulab on a PC, ulab.numpy is numpy
+from . import numpy
@@ -0,0 +1,9 @@
+# The subset of numpy the firmware uses. Unlike numpy, ulab makes arrays of
+# floats unless told otherwise.
+import numpy
+from numpy import *
+from numpy import linalg
+
+
+def array(values, dtype=numpy.float64):
+    return numpy.array(values, dtype=dtype)
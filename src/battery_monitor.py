@@ -1,61 +1,89 @@
+import clock
 import analogio
 import constants
-import ulab.numpy as np
+from filters import LowpassFilter
 
 class BatteryMonitor:
 
-    VOLT_NUM_INIT = 5 
     FREQ_CUTOFF = 0.02
 
     def __init__(self):
-        self.battery_ain = analogio.AnalogIn(constants.BATTERY_AIN_PIN) 
+        # Battery is sampled every BATTERY_DT seconds with a burst of
+        # BATTERY_NUM_SAMPLES averaged ADC reads. The first readings are low
+        # for some reason, so BATTERY_NUM_SETTLE readings are thrown away one
+        # per update before the lowpass filter is initialized.
+        self.battery_ain = analogio.AnalogIn(constants.BATTERY_AIN_PIN)
         self.lowpass = None
+        self.num_settle = 0
+        self.next_t = None
+        self.is_low = False
+
+    @property
+    def is_ready(self):
+        return self.lowpass is not None
 
     def update(self):
-        # Initialize lowpass filter
+        # Returns True when the battery has just become low
+        if self.num_settle < constants.BATTERY_NUM_SETTLE:
+            dummy = self.battery_ain.value
+            self.num_settle += 1
+            return False
+
+        t = clock.monotonic()
+        if self.next_t is not None and t < self.next_t:
+            return False
+        if self.next_t is None:
+            self.next_t = t
+        while self.next_t <= t:
+            self.next_t += constants.BATTERY_DT
+
         if self.lowpass is None:
-            # First reading or so is low for some reason. Throw a couple away 
-            # rather than initialize lowpass filter to low value.
-            for i in range(self.VOLT_NUM_INIT):
-                dummy = self.voltage_raw
             self.lowpass = LowpassFilter(
-                    freq_cutoff = self.FREQ_CUTOFF, 
-                    value = self.voltage_raw,  
-                    dt = constants.LOOP_DT
+                    freq_cutoff = self.FREQ_CUTOFF,
+                    value = self.voltage_raw,
+                    dt = constants.BATTERY_DT,
                     )
         else:
-            # Update filter on new reading
             self.lowpass.update(self.voltage_raw)
 
+        was_low = self.is_low
+        soc = self.soc
+        if soc <= constants.BATTERY_LOW_SOC:
+            self.is_low = True
+        elif soc > constants.BATTERY_LOW_SOC + constants.BATTERY_LOW_HYSTERESIS:
+            self.is_low = False
+        return self.is_low and not was_low
+
     @property
-    def voltage_lowpass(self):
+    def voltage(self):
         if self.lowpass is None:
             return 0.0
         else:
             return self.lowpass.value
 
     @property
-    def voltage_raw(self):
-       return 2.0*ain_to_volt(self.battery_ain.value)
-
-
-class LowpassFilter:
-
-    def __init__(self, freq_cutoff=1.0, value=0.0, dt=1.0):
-        self.dt = dt
-        self.value = value
-        self.freq_cutoff = freq_cutoff
+    def soc(self):
+        # State of charge (%) interpolated from the voltage lookup table
+        if self.lowpass is None:
+            return 0
+        return voltage_to_soc(self.voltage)
 
     @property
-    def freq_cutoff(self):
-        return self._alpha/((1.0-self._alpha)*2.0*np.pi*self.dt)
+    def voltage_raw(self):
+        total = 0
+        for i in range(constants.BATTERY_NUM_SAMPLES):
+            total += self.battery_ain.value
+        return 2.0*ain_to_volt(total/constants.BATTERY_NUM_SAMPLES)
 
-    @freq_cutoff.setter
-    def freq_cutoff(self, freq):
-        self._alpha = (2.0*np.pi*self.dt*freq)/(2.0*np.pi*self.dt*freq+1)
 
-    def update(self, new_value):
-        self.value = self._alpha*new_value + (1.0-self._alpha)*self.value
+def voltage_to_soc(voltage):
+    table = constants.BATTERY_SOC_TABLE
+    if voltage <= table[0][0]:
+        return table[0][1]
+    for (v0, soc0), (v1, soc1) in zip(table[:-1], table[1:]):
+        if voltage <= v1:
+            return int(soc0 + (soc1 - soc0)*(voltage - v0)/(v1 - v0))
+    return table[-1][1]
 
 
 def ain_to_volt(value):
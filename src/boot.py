@@ -0,0 +1,41 @@
+import time
+import board
+import digitalio
+import storage
+
+# Holding the blank button while the colorimeter starts up gives the firmware
+# write access to CIRCUITPY, e.g. for data logging. The drive is then read 
+# only from the computer until the next reset without the button held.
+BUTTON_BLANK = 0b00000100
+
+try:
+    import keypad
+except ImportError:
+    import gamepadshift
+    pad = gamepadshift.GamePadShift(
+            digitalio.DigitalInOut(board.BUTTON_CLOCK), 
+            digitalio.DigitalInOut(board.BUTTON_OUT),
+            digitalio.DigitalInOut(board.BUTTON_LATCH),
+            )
+    time.sleep(0.1)
+    pressed = pad.get_pressed()
+    pad.deinit()
+else:
+    keys = keypad.ShiftRegisterKeys(
+            clock = board.BUTTON_CLOCK,
+            data = board.BUTTON_OUT,
+            latch = board.BUTTON_LATCH,
+            key_count = 8,
+            value_when_pressed = True,
+            )
+    time.sleep(0.1)
+    pressed = 0
+    event = keys.events.get()
+    while event is not None:
+        if event.pressed:
+            pressed |= 1 << event.key_number
+        event = keys.events.get()
+    keys.deinit()
+
+if pressed & BUTTON_BLANK:
+    storage.remount('/', readonly=False)
@@ -0,0 +1,116 @@
+import clock
+import board
+import constants
+
+try:
+    import keypad
+except ImportError:
+    keypad = None
+    import digitalio
+    import gamepadshift
+
+
+class Buttons:
+
+    NUM_KEYS = 8
+
+    def __init__(self, repeat_delay=0.5, repeat_dt=0.2, repeat_min_dt=0.04,
+            repeat_accel=0.8):
+        # Button presses as a queue of button masks (see constants.BUTTON),
+        # key number i of the shift register is mask 1 << i. Keys in
+        # BUTTON_REPEAT repeat when held, starting after repeat_delay with the
+        # interval shrinking by repeat_accel each repeat down to repeat_min_dt.
+        self.repeat_delay = repeat_delay
+        self.repeat_dt = repeat_dt
+        self.repeat_min_dt = repeat_min_dt
+        self.repeat_accel = repeat_accel
+        self.repeat_mask = 0
+        for name in constants.BUTTON_REPEAT:
+            self.repeat_mask |= constants.BUTTON[name]
+        self.held_mask = 0
+        self.repeat_t = None
+        self.repeat_interval = repeat_dt
+        self.presses = []
+
+        if keypad is not None:
+            # Scanned and debounced in the background, events are queued
+            self.keys = keypad.ShiftRegisterKeys(
+                    clock = board.BUTTON_CLOCK,
+                    data = board.BUTTON_OUT,
+                    latch = board.BUTTON_LATCH,
+                    key_count = self.NUM_KEYS,
+                    value_when_pressed = True,
+                    interval = constants.BUTTON_SCAN_DT,
+                    max_events = constants.BUTTON_MAX_EVENTS,
+                    )
+            self.event = keypad.Event()
+            self.pad = None
+        else:
+            # Fallback for older firmware, presses are found from changes in
+            # the mask of pressed buttons read once per pass. A key must have
+            # been released for BUTTON_DEBOUNCE_DT before it presses again,
+            # shorter releases are contact bounce.
+            self.keys = None
+            self.release_t = [None]*self.NUM_KEYS
+            self.pad = gamepadshift.GamePadShift(
+                    digitalio.DigitalInOut(board.BUTTON_CLOCK),
+                    digitalio.DigitalInOut(board.BUTTON_OUT),
+                    digitalio.DigitalInOut(board.BUTTON_LATCH),
+                    )
+
+    def get_presses(self):
+        # Returns list of button masks, one per press or repeat, oldest first.
+        # The list is reused on the next call.
+        self.presses.clear()
+        if self.keys is not None:
+            while self.keys.events.get_into(self.event):
+                mask = 1 << self.event.key_number
+                if self.event.pressed:
+                    self.on_press(mask)
+                else:
+                    self.held_mask &= ~mask
+        else:
+            t = clock.monotonic()
+            pressed_mask = self.pad.get_pressed()
+            new_mask = pressed_mask & ~self.held_mask
+            released_mask = self.held_mask & ~pressed_mask
+            self.held_mask &= pressed_mask
+            for i in range(self.NUM_KEYS):
+                mask = 1 << i
+                if released_mask & mask:
+                    self.release_t[i] = t
+                elif new_mask & mask:
+                    release_t = self.release_t[i]
+                    if release_t is None or t - release_t >= constants.BUTTON_DEBOUNCE_DT:
+                        self.on_press(mask)
+                    else:
+                        self.held_mask |= mask
+        self.update_repeat()
+        return self.presses
+
+    def clear(self):
+        if self.keys is not None:
+            self.keys.events.clear()
+        self.held_mask = 0
+        self.repeat_t = None
+
+    def on_press(self, mask):
+        self.held_mask |= mask
+        self.presses.append(mask)
+        if mask & self.repeat_mask:
+            self.repeat_t = clock.monotonic() + self.repeat_delay
+            self.repeat_interval = self.repeat_dt
+
+    def update_repeat(self):
+        held_repeat = self.held_mask & self.repeat_mask
+        if not held_repeat or self.repeat_t is None:
+            self.repeat_t = None
+            return
+        t = clock.monotonic()
+        if t >= self.repeat_t:
+            self.presses.append(held_repeat)
+            self.repeat_t = t + self.repeat_interval
+            self.repeat_interval = max(
+                    self.repeat_min_dt,
+                    self.repeat_interval*self.repeat_accel
+                    )
@@ -0,0 +1,107 @@
+import ulab
+import constants
+from collections import OrderedDict
+
+
+class CalibrationBuilderError(Exception):
+    pass
+
+
+class CalibrationBuilder:
+
+    FIT_TYPE_DEGREE = {'linear': 1, 'polynomial': 2}
+
+    def __init__(self, name, channel, fit_type='linear', degree=None, units=None, led=None):
+        # Collects standards, (concentration, absorbance) pairs measured on
+        # one channel, and fits concentration as a polynomial in absorbance
+        # giving an entry in the calibrations.json format.
+        if not fit_type in self.FIT_TYPE_DEGREE:
+            raise CalibrationBuilderError(f'fit_type must be in {tuple(self.FIT_TYPE_DEGREE)}')
+        if degree is None:
+            degree = self.FIT_TYPE_DEGREE[fit_type]
+        if fit_type == 'linear' and degree != 1:
+            raise CalibrationBuilderError('linear fit must have degree 1')
+        if not degree in range(1, constants.CALIBRATION_MAX_DEGREE+1):
+            raise CalibrationBuilderError(f'degree must be in 1 to {constants.CALIBRATION_MAX_DEGREE}')
+        self.name = name
+        self.channel = channel
+        self.fit_type = fit_type
+        self.degree = degree
+        self.units = units
+        self.led = led
+        self.concentrations = []
+        self.absorbances = []
+        self.stds = []
+
+    @property
+    def count(self):
+        return len(self.absorbances)
+
+    def add(self, absorbance, std, concentration=None):
+        # Returns index of the new standard
+        if self.count >= constants.CALIBRATION_MAX_STANDARDS:
+            raise CalibrationBuilderError(f'max {constants.CALIBRATION_MAX_STANDARDS} standards')
+        self.absorbances.append(absorbance)
+        self.stds.append(std)
+        self.concentrations.append(concentration)
+        return self.count - 1
+
+    def set_concentration(self, index, concentration):
+        self.check_index(index)
+        self.concentrations[index] = concentration
+
+    def remove(self, index):
+        self.check_index(index)
+        del self.absorbances[index]
+        del self.stds[index]
+        del self.concentrations[index]
+
+    def check_index(self, index):
+        if not index in range(self.count):
+            raise CalibrationBuilderError(f'index must be in 0 to {self.count-1}')
+
+    def standards(self):
+        standards = []
+        for conc, absorb, std in zip(self.concentrations, self.absorbances, self.stds):
+            standards.append({'concentration': conc, 'absorbance': absorb, 'std': std})
+        return standards
+
+    def fit(self):
+        # Returns fit results: coefficients (highest power first, as used by
+        # polyval), residuals per standard, R² and the absorbance range.
+        if None in self.concentrations:
+            raise CalibrationBuilderError('all standards need a concentration')
+        if self.count < self.degree + 1:
+            raise CalibrationBuilderError(f'need at least {self.degree+1} standards')
+        x = ulab.numpy.array(self.absorbances)
+        y = ulab.numpy.array(self.concentrations)
+        if ulab.numpy.max(x) - ulab.numpy.min(x) <= 0.0:
+            raise CalibrationBuilderError('standards absorbances are all equal')
+        coef = ulab.numpy.polyfit(x, y, self.degree)
+        residuals = y - ulab.numpy.polyval(coef, x)
+        ss_res = ulab.numpy.sum(residuals*residuals)
+        ss_tot = ulab.numpy.sum((y - ulab.numpy.mean(y))**2)
+        if ss_tot > 0.0:
+            r_squared = 1.0 - ss_res/ss_tot
+        else:
+            r_squared = 1.0
+        rsp = OrderedDict()
+        rsp['fit_coef'] = [float(c) for c in coef]
+        rsp['residuals'] = [float(r) for r in residuals]
+        rsp['r_squared'] = float(r_squared)
+        rsp['range'] = {'min': float(ulab.numpy.min(x)), 'max': float(ulab.numpy.max(x))}
+        return rsp
+
+    def entry(self):
+        # Calibration entry for calibrations.json from the current fit
+        fit = self.fit()
+        entry = OrderedDict()
+        entry['fit_type'] = self.fit_type
+        entry['fit_coef'] = fit['fit_coef']
+        entry['range'] = fit['range']
+        entry['channel'] = self.channel
+        if self.units is not None:
+            entry['units'] = self.units
+        if self.led is not None:
+            entry['led'] = self.led
+        return entry
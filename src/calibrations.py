@@ -4,6 +4,8 @@ import json
 import constants
 from collections import OrderedDict
 from json_settings_file import JsonSettingsFile
+from unmixing import Unmixing
+from unmixing import UnmixingError
 
 class CalibrationsError(Exception):
     pass
@@ -13,18 +15,23 @@ class Calibrations(JsonSettingsFile):
     FILE_TYPE = 'calibrations'
     FILE_NAME = constants.CALIBRATIONS_FILE
     LOAD_ERROR_EXCEPTION = CalibrationsError
-    ALLOWED_FIT_TYPES = ['linear', 'polynomial']
+    ALLOWED_FIT_TYPES = ['linear', 'polynomial', 'unmixing']
 
     def __init__(self):
         super().__init__()
+        self.unmixers = {}
 
     def check(self):
         # Check each calibration for errors
+        self.unmixers = {}
         for name, calibration in self.data.items():
             error_list = []
-            error_list.extend(self.check_fit(name, calibration))
-            error_list.extend(self.check_range(name, calibration))
-            error_list.extend(self.check_channel(name, calibration))
+            if calibration.get('fit_type', None) == 'unmixing':
+                error_list.extend(self.check_unmixing(name, calibration))
+            else:
+                error_list.extend(self.check_fit(name, calibration))
+                error_list.extend(self.check_range(name, calibration))
+                error_list.extend(self.check_channel(name, calibration, required=True))
             if error_list:
                 self.error_dict[name] = error_list
 
@@ -68,9 +75,11 @@ class Calibrations(JsonSettingsFile):
         try:
             range_data = calibration['range']
         except KeyError:
-            if fit_type != 'linear':
+            # Range is optional for linear fits
+            if calibration.get('fit_type', None) != 'linear':
                 error_msg = f'{name} range data missing'
                 error_list.append(error_msg)
+            return error_list
         else:
             if not type(range_data) == dict:
                 error_msg = f'range_data must be dict'
@@ -102,19 +111,87 @@ class Calibrations(JsonSettingsFile):
 
         return error_list
 
-    def check_channel(self, name, calibration):
+    def check_channel(self, name, calibration, required=False):
+        # Fits are applied to the absorbance of their channel
         error_list = []
         try:
             channel = calibration['channel']
         except KeyError:
-            # OK not to specify channel as it is optional
-            pass
+            if required:
+                error_list.append(f'{name} channel missing')
         else:
             if not channel in range(0,constants.NUM_CHANNEL):
                 error_msg = f'channel {channel} not allowed'
                 error_list.append(error_msg)
         return error_list
 
+    def check_unmixing(self, name, calibration):
+        # Components are a list of {"name": str, "spectrum": [absorbance per
+        # unit concentration for each channel]}. The unmixing matrix is
+        # computed here, once per load.
+        error_list = []
+        components = calibration.get('components', None)
+        if type(components) != list or not components:
+            error_list.append(f'{name} components must be non-empty list')
+            return error_list
+        spectra = []
+        for component in components:
+            try:
+                spectrum = [float(v) for v in component['spectrum']]
+                component_name = component['name']
+            except (KeyError, TypeError, ValueError):
+                error_list.append(f'{name} components must have name and spectrum')
+                return error_list
+            if type(component_name) != str:
+                error_list.append(f'{name} component name must be str')
+            if len(spectrum) != constants.NUM_CHANNEL:
+                error_msg = f'{name} {component_name} spectrum must have {constants.NUM_CHANNEL} values'
+                error_list.append(error_msg)
+            spectra.append(spectrum)
+        chan_strs = calibration.get('channels', list(constants.STR_TO_CHANNEL))
+        if type(chan_strs) != list or not chan_strs:
+            error_list.append(f'{name} channels must be non-empty list')
+        else:
+            for chan_str in chan_strs:
+                if not chan_str in constants.STR_TO_CHANNEL:
+                    error_list.append(f'{name} unknown channel {chan_str}')
+        non_negative = calibration.get('non_negative', False)
+        if type(non_negative) != bool:
+            error_list.append(f'{name} non_negative must be true or false')
+        if error_list:
+            return error_list
+        channels = [constants.STR_TO_CHANNEL[chan_str] for chan_str in chan_strs]
+        try:
+            self.unmixers[name] = Unmixing(spectra, channels, non_negative)
+        except UnmixingError as error:
+            error_list.append(f'{name} {error}')
+        return error_list
+
+    def write_entry(self, name, entry):
+        # Add or replace one calibration, the rest of the file is kept as 
+        # written (including entries with errors). Returns True if replaced.
+        if self.FILE_NAME in os.listdir():
+            data = self.read_file()
+        else:
+            data = {}
+        replaced = name in data
+        data[name] = entry
+        self.write_file(data)
+        return replaced
+
+    def is_unmixing(self, name):
+        return name in self.unmixers
+
+    def component_names(self, name):
+        try:
+            components = self.data[name]['components']
+        except KeyError:
+            return []
+        return [component['name'] for component in components]
+
+    def unmix(self, name, absorbances):
+        return self.unmixers[name].apply(absorbances)
+
     def led(self, name):
         try:
             led = self.data[name]['led']
@@ -137,36 +214,35 @@ class Calibrations(JsonSettingsFile):
         else:
             return data.get('channel', None)
 
-    def apply(self, name, absorbance):
-        fit_type = self.data[name]['fit_type']
-        fit_coef = ulab.numpy.array(self.data[name]['fit_coef'])
+    def is_fit(self, name):
+        try:
+            return self.data[name]['fit_type'] in ('linear', 'polynomial')
+        except KeyError:
+            return False
 
-        if fit_type in ('linear', 'polynomial'):
-            # Get range min and max for checking if absorbance within range
-            try:
-                range_min = self.data[name]['range']['min']
-                range_max = self.data[name]['range']['max']
-            except KeyError:
-                range_min = None
-                range_max = None
-
-            # Check to see if absorbance is within acceptable range
-            is_inside_range = True 
-            if range_min is not None:
-                is_inside_range &= absorbance >= range_min
-            if range_max is not None:
-                is_inside_range &= absorbance <= range_max
-
-            # Apply calibration if within range
-            if is_inside_range:
-                value = ulab.numpy.polyval(fit_coef, [absorbance])[0]
-            else:
-                value = None
-        else:
+    def in_range(self, name, absorbance):
+        # Check to see if absorbance is within the calibration range
+        try:
+            range_min = self.data[name]['range']['min']
+            range_max = self.data[name]['range']['max']
+        except KeyError:
+            return True
+        return range_min <= absorbance <= range_max
+
+    def evaluate(self, name, absorbance):
+        # Fit value, extrapolated outside the calibration range
+        fit_type = self.data[name]['fit_type']
+        if not fit_type in ('linear', 'polynomial'):
             # We shouldn't be here ... unknown fit type
             error_msg = f'{fit_type} fit type not implemented'
             raise CalibrationsError(error_msg)
+        fit_coef = ulab.numpy.array(self.data[name]['fit_coef'])
+        return float(ulab.numpy.polyval(fit_coef, [absorbance])[0])
 
-        return value
+    def apply(self, name, absorbance):
+        # Fit value or None if absorbance is outside the calibration range
+        if self.in_range(name, absorbance):
+            return self.evaluate(name, absorbance)
+        return None
 
 
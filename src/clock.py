@@ -0,0 +1,68 @@
+import time
+
+# All firmware timing (main loop pacing, jobs, blanking, debounce/repeat,
+# filters, kinetics, logging) goes through this module so the wall clock can
+# be swapped for a VirtualClock, e.g. by replay, making runs deterministic and
+# as fast as the code allows.
+
+
+class WallClock:
+
+    is_virtual = False
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, dt):
+        time.sleep(dt)
+
+
+class VirtualClock:
+
+    is_virtual = True
+
+    def __init__(self, t=0.0):
+        # Time only moves when slept, advanced or set, sleeps return at once
+        self.t = t
+
+    def monotonic(self):
+        return self.t
+
+    def sleep(self, dt):
+        if dt > 0:
+            self.t += dt
+
+    def advance(self, dt):
+        self.sleep(dt)
+
+    def set(self, t):
+        # Never runs backwards, e.g. after sleeps past the next recorded time
+        if t > self.t:
+            self.t = t
+
+
+_clock = WallClock()
+
+
+def set_clock(new_clock):
+    # None restores the wall clock. Returns the clock replaced.
+    global _clock
+    old_clock = _clock
+    _clock = new_clock if new_clock is not None else WallClock()
+    return old_clock
+
+
+def get_clock():
+    return _clock
+
+
+def monotonic():
+    return _clock.monotonic()
+
+
+def sleep(dt):
+    _clock.sleep(dt)
+
+
+def is_virtual():
+    return _clock.is_virtual
@@ -1,12 +1,14 @@
 import gc
-import time
+import json
+import clock
 import ulab
+import binascii
 import board
 import analogio
-import digitalio
-import gamepadshift
 import constants
+import supervisor
 import adafruit_itertools
+from collections import OrderedDict
 
 from light_sensor import LightSensor
 from light_sensor import LightSensorOverflow
@@ -23,19 +25,59 @@ from calibrations import CalibrationsError
 from menu_screen import MenuScreen
 from message_screen import MessageScreen
 from multi_measure_screen import MultiMeasureScreen
+from kinetics_screen import KineticsScreen
+from spectrum_screen import SpectrumScreen
+from trend_screen import TrendScreen
+
+from kinetics import Kinetics
+from data_logger import DataLogger
+from recorder import Recorder
+from measurement_history import MeasurementHistory
+from sample_batch import SampleBatch
+from sample_batch import SampleBatchError
+from running_stats import RunningStats
+from stability import StabilityDetector
+from filters import create_filter
+from idle_manager import IdleManager
+from illumination import Illumination
+from buttons import Buttons
+from menu_entries import MenuEntries
+from calibration_builder import CalibrationBuilder
+from calibration_builder import CalibrationBuilderError
 
 from messaging import MessageReceiver
+from messaging import CommandError
 from messaging import send_message
 
+from jobs import is_job
+from jobs import step_job
+from jobs import run_job
+
+from mem_profile import profile as mem_profile
+
 class Mode:
     MEASURE = 0
     MENU    = 1
     MESSAGE = 2
     ABORT   = 3
+    KINETICS = 4
+    TREND    = 5
+
+MODE_TO_STR = {
+        Mode.MEASURE  : 'measure',
+        Mode.MENU     : 'menu',
+        Mode.MESSAGE  : 'message',
+        Mode.ABORT    : 'abort',
+        Mode.KINETICS : 'kinetics',
+        Mode.TREND    : 'trend',
+        }
 
 class Colorimeter:
 
     ABOUT_STR = 'About'
+    KINETICS_STR = 'Kinetics'
+    TREND_STR = 'Trend'
+    SETTINGS_FILES = ('configuration', 'calibrations')
     RAW_SENSOR_STR = 'Raw Sensor' 
     ABSORBANCE_STR = 'Absorbance'
     TRANSMITTANCE_STR = 'Transmittance'
@@ -43,42 +85,81 @@ class Colorimeter:
 
     def __init__(self):
 
-        self.menu_screen = None
-        self.message_screen = None
-        self.measure_screen = None
-        self.mode = Mode.MEASURE
-        board.DISPLAY.brightness = 1.0
-
-        self.menu_items = list(self.DEFAULT_MEASUREMENTS)
+        self.menu_items = []
         self.menu_view_pos = 0
         self.menu_item_pos = 0
         self.is_blanked = False
+        self.is_blanking = False
+        self.kinetics = None
+        self.kinetics_chan_pos = 0
+        self.spectrum_view = False
+        self.trend_chan_pos = 0
+        self.trend_next_t = None
+        self.trend_sum = 0.0
+        self.trend_count = 0
+        self.illumination = None
+        self.sensor_t = None
+        self.filter_t = None
+        self.fit_in_range = True
+        self.calibration_builder = None
         self.blank_values = ulab.numpy.ones((constants.NUM_CHANNEL,)) 
+        self.transmittance_reference = ulab.numpy.ones((constants.NUM_CHANNEL,))
+        self.sample_block = ulab.numpy.zeros(
+                (constants.MAX_READ_SAMPLES, constants.NUM_CHANNEL)
+                )
 
+        # Initial screen, after the state the mode setter uses (spectrum_view)
+        self.menu_screen = None
+        self.message_screen = None
+        self.measure_screen = None
+        self.mode = Mode.MEASURE
+        board.DISPLAY.brightness = 1.0
 
 
-        # Setup gamepad inputs - change this (Keypad shift??)
-        self.last_button_press = time.monotonic()
-        self.pad = gamepadshift.GamePadShift(
-                digitalio.DigitalInOut(board.BUTTON_CLOCK), 
-                digitalio.DigitalInOut(board.BUTTON_OUT),
-                digitalio.DigitalInOut(board.BUTTON_LATCH),
-                )
 
         # Load Configuration
         self.configuration = Configuration()
         try:
-            self.configuration.load()
+            with mem_profile.region('configuration'):
+                self.configuration.load()
         except ConfigurationError as error:
             # Unable to load configuration file or not a dict after loading
             self.message_screen.set_message(error)
             self.message_screen.set_to_error()
             self.mode = Mode.MESSAGE
 
+        # Settings files are reloaded by the firmware (see update_reload).
+        # With hot_reload the supervisor no longer restarts everything when
+        # files are written, which also stops code uploads restarting it.
+        if self.configuration.hot_reload:
+            try:
+                supervisor.runtime.autoreload = False
+            except AttributeError:
+                supervisor.disable_autoreload()
+
+        # Setup button inputs
+        self.buttons = self.create_buttons()
+
+        # Setup running statistics for replicate measurements
+        self.statistics_enabled = self.configuration.statistics_enabled
+        self.running_stats = RunningStats(
+                constants.NUM_CHANNEL, 
+                **self.configuration.statistics_settings
+                )
+
+        # Setup stable reading detection for auto-capture
+        self.stability_enabled = self.configuration.stability_enabled
+        self.stability = StabilityDetector(
+                self.configuration.stability_channels,
+                **self.configuration.stability_settings
+                )
+        self.capture_requested = False
+
         # Load calibrations and populate menu items
         self.calibrations = Calibrations()
         try:
-            self.calibrations.load()
+            with mem_profile.region('calibrations'):
+                self.calibrations.load()
         except CalibrationsError as error: 
             # Unable to load calibrations file or not a dict after loading
             self.message_screen.set_message(error) 
@@ -92,11 +173,10 @@ class Colorimeter:
                 self.message_screen.set_to_error()
                 self.mode = Mode.MESSAGE
 
-        self.menu_items.extend([k for k in self.calibrations.data])
-        self.menu_items.append(self.ABOUT_STR)
+        self.setup_menu_items()
 
         # Set default/startup measurement
-        if self.configuration.startup in self.menu_items:
+        if self.is_measurement_item(self.configuration.startup):
             self.measurement_name = self.configuration.startup
         else:
             if self.configuration.startup is not None:
@@ -106,25 +186,101 @@ class Colorimeter:
                 self.mode = Mode.MESSAGE
             self.measurement_name = self.menu_items[0] 
 
+        # Setup recording of sensor frames, buttons and serial messages
+        self.recorder = Recorder()
+
         # Setup light sensor and preliminary blanking 
         try:
-            self.light_sensor = LightSensor()
+            self.light_sensor = self.create_light_sensor()
         except LightSensorIOError as error:
             error_msg = f'missing sensor? {error}'
             self.message_screen.set_message(error_msg,ok_to_continue=False)
             self.message_screen.set_to_abort()
             self.mode = Mode.ABORT
+            self.light_sensor = None
         else:
+            self.light_sensor.recorder = self.recorder
             if self.configuration.gain is not None:
                 self.light_sensor.gain = self.configuration.gain
-            self.blank_sensor(set_blanked=False)
+            if self.configuration.integration_time is not None:
+                self.light_sensor.integration_time = self.configuration.integration_time
+            if self.configuration.illumination_enabled:
+                self.illumination = Illumination(
+                        self.light_sensor, 
+                        **self.configuration.illumination_settings
+                        )
+                self.illumination.select_led(self.calibrations.led(self.measurement_name))
+            self.startup_blank()
+
+        # Setup data logging and measurement history
+        self.data_logger = DataLogger()
+        self.log_next_t = None
+        self.history = MeasurementHistory(constants.HISTORY_CAPACITY)
+        self.history_next_t = None
+        self.batch = SampleBatch(constants.BATCH_CAPACITY)
+        self.reload_next_t = None
+
+        # Setup idle power saving
+        self.idle_manager = IdleManager(**self.configuration.idle_settings)
 
         # Setup up battery monitoring settings cycles 
-        self.battery_monitor = BatteryMonitor()
+        self.battery_monitor = self.create_battery_monitor()
         self.setup_menu_cycles()
 
-        # Setup message receiver
-        self.message_receiver = MessageReceiver()
+        # Setup message receiver, command queue and command dispatch table
+        self.message_receiver = self.create_message_receiver()
+        self.command_queue = []
+        self.command_job = None
+        self.command_job_rsp = None
+        self.command_job_resume_t = None
+        self.serial_commands = OrderedDict([
+            ('read',                 self.read_command),
+            ('blank',                self.blank_command),
+            ('reset_blank',          self.reset_blank_command),
+            ('set_gain',             self.set_gain_command),
+            ('set_integration_time', self.set_integration_time_command),
+            ('select_measurement',   self.select_measurement_command),
+            ('list_measurements',    self.list_measurements_command),
+            ('get_config',           self.get_config_command),
+            ('kinetics',             self.kinetics_command),
+            ('log',                  self.log_command),
+            ('history',              self.history_command),
+            ('statistics',           self.statistics_command),
+            ('stability',            self.stability_command),
+            ('reload',               self.reload_command),
+            ('memory',               self.memory_command),
+            ('calibrate',            self.calibrate_command),
+            ('batch',                self.batch_command),
+            ('record',               self.record_command),
+            ])
+
+    def create_light_sensor(self):
+        # Hardware is created by these methods so replay can substitute it
+        return LightSensor()
+
+    def create_buttons(self):
+        return Buttons(**self.configuration.buttons_settings)
+
+    def create_battery_monitor(self):
+        return BatteryMonitor()
+
+    def create_message_receiver(self):
+        return MessageReceiver()
+
+    def startup_blank(self):
+        # Preliminary blank, replay restores the recorded state instead
+        self.blank_sensor(set_blanked=False)
+
+    def setup_menu_items(self, mru=()):
+        self.menu_items = list(self.DEFAULT_MEASUREMENTS)
+        self.menu_items.extend([k for k in self.calibrations.data])
+        self.menu_items.append(self.KINETICS_STR)
+        self.menu_items.append(self.TREND_STR)
+        self.menu_items.append(self.ABOUT_STR)
+        self.menu_entries = MenuEntries(self.menu_items, self.calibrations)
+        for name in reversed(mru):
+            if self.is_measurement_item(name):
+                self.menu_entries.use(name)
 
     def setup_menu_cycles(self):
         self.gain_cycle = adafruit_itertools.cycle(constants.GAIN_TO_STR) 
@@ -139,15 +295,24 @@ class Colorimeter:
     @mode.setter
     def mode(self, new_mode):
         self.delete_screens()
-        if new_mode == Mode.MEASURE:
-            self.measure_screen = MultiMeasureScreen()
-        elif new_mode in (Mode.MESSAGE, Mode.ABORT):
-            self.message_screen = MessageScreen()
-        elif new_mode == Mode.MENU:
-            self.menu_screen = MenuScreen()
-            self.menu_view_pos = 0
-            self.menu_item_pos = 0
-            self.update_menu_screen()
+        with mem_profile.region(f'screen_{MODE_TO_STR[new_mode]}'):
+            if new_mode == Mode.MEASURE and self.spectrum_view:
+                self.measure_screen = SpectrumScreen()
+            elif new_mode == Mode.MEASURE:
+                self.measure_screen = MultiMeasureScreen()
+            elif new_mode == Mode.KINETICS:
+                self.measure_screen = KineticsScreen()
+            elif new_mode == Mode.TREND:
+                trend = self.configuration.trend_settings
+                self.measure_screen = TrendScreen(trend['y_min'], trend['y_max'])
+                self.reset_trend()
+            elif new_mode in (Mode.MESSAGE, Mode.ABORT):
+                self.message_screen = MessageScreen()
+            elif new_mode == Mode.MENU:
+                self.menu_screen = MenuScreen()
+                self.menu_view_pos = 0
+                self.menu_item_pos = 0
+                self.update_menu_screen()
         gc.collect()  # Mostly to free memory after menu update
         self._mode = new_mode
 
@@ -157,45 +322,73 @@ class Colorimeter:
         self.menu_screen = None 
         gc.collect()  
 
+    @property
+    def measurement_name(self):
+        return self._measurement_name
+
+    @measurement_name.setter
+    def measurement_name(self, name):
+        self._measurement_name = name
+        if self.illumination is not None:
+            self.illumination.select_led(self.calibrations.led(name))
+        self.measurement_filter = create_filter(
+                constants.NUM_CHANNEL,
+                self.configuration.filter_settings(name),
+                constants.LOOP_DT,
+                )
+        self.reset_measurement_state()
+
+    def reset_measurement_state(self):
+        # Called when the sample or measurement changes
+        self.running_stats.reset()
+        self.stability.reset()
+        self.filter_t = None
+        if self.measurement_filter is not None:
+            self.measurement_filter.reset()
+
+    def is_measurement_item(self, name):
+        test = name in self.menu_items
+        test &= name != self.ABOUT_STR
+        test &= name != self.KINETICS_STR
+        test &= name != self.TREND_STR
+        return test
+
     @property
     def num_menu_items(self):
-        return len(self.menu_items)
+        return len(self.menu_entries)
+
+    def set_menu_item_pos(self, pos):
+        # Move selection, scrolling the view just enough to keep it visible
+        self.menu_item_pos = max(0, min(pos, self.num_menu_items-1))
+        items_per_screen = self.menu_screen.items_per_screen
+        if self.menu_item_pos < self.menu_view_pos:
+            self.menu_view_pos = self.menu_item_pos
+        elif self.menu_item_pos > self.menu_view_pos + items_per_screen - 1:
+            self.menu_view_pos = self.menu_item_pos - items_per_screen + 1
 
     def incr_menu_item_pos(self):
-        if self.menu_item_pos < self.num_menu_items-1:
-            self.menu_item_pos += 1
-        diff_pos = self.menu_item_pos - self.menu_view_pos
-        if diff_pos > self.menu_screen.items_per_screen-1:
-            self.menu_view_pos += 1
+        self.set_menu_item_pos(self.menu_item_pos + 1)
 
     def decr_menu_item_pos(self):
-        if self.menu_item_pos > 0:
-            self.menu_item_pos -= 1
-        if self.menu_item_pos < self.menu_view_pos:
-            self.menu_view_pos -= 1
+        self.set_menu_item_pos(self.menu_item_pos - 1)
+
+    def page_menu_item_pos(self, num_pages):
+        items_per_screen = self.menu_screen.items_per_screen
+        self.set_menu_item_pos(self.menu_item_pos + num_pages*items_per_screen)
+
+    def jump_menu_item_pos(self):
+        # Jump to the next first letter group and show it at the top 
+        pos = self.menu_entries.next_group(self.menu_item_pos)
+        self.set_menu_item_pos(pos)
+        max_view_pos = max(0, self.num_menu_items - self.menu_screen.items_per_screen)
+        self.menu_view_pos = min(pos, max_view_pos)
 
     def update_menu_screen(self):
         if self.menu_screen is None:
             return 
         n0 = self.menu_view_pos
         n1 = n0 + self.menu_screen.items_per_screen
-        view_items = []
-        for i, item in enumerate(self.menu_items[n0:n1]):
-            led = self.calibrations.led(item)
-            chan = self.calibrations.channel(item)
-            if led is None and chan is None:
-                item_text = f'{n0+i} {item}' 
-            elif chan is None:
-                item_text = f'{n0+i} {item} ({led})' 
-            elif led is None:
-                chan_str = constants.CHANNEL_TO_STR[chan]
-                item_text = f'{n0+i} {item} ({chan_str})' 
-            else:
-                chan_str = constants.CHANNEL_TO_STR[chan]
-                item = item[:8]
-                item_text = f'{n0+i} {item} ({led},{chan_str})' 
-            view_items.append(item_text)
-        self.menu_screen.set_menu_items(view_items)
+        self.menu_screen.set_menu_items(self.menu_entries.view_texts[n0:n1])
         pos = self.menu_item_pos - self.menu_view_pos
         self.menu_screen.set_curr_item(pos)
 
@@ -219,6 +412,31 @@ class Colorimeter:
         test &= (not self.is_raw_sensor) 
         return test
 
+    @property
+    def is_unmixing(self):
+        return self.calibrations.is_unmixing(self.measurement_name)
+
+    @property
+    def is_fit(self):
+        return self.calibrations.is_fit(self.measurement_name)
+
+    @property
+    def measurement_value_names(self):
+        # Names of the values shown, components for unmixing, the channel
+        # for fits else all channels
+        if self.is_unmixing:
+            return self.calibrations.component_names(self.measurement_name)
+        if self.is_fit:
+            chan = self.calibrations.channel(self.measurement_name)
+            return [constants.CHANNEL_TO_STR[chan]]
+        return self.light_sensor.CHANNEL_NAMES
+
+    def values_dict(self, values):
+        if self.is_unmixing or self.is_fit:
+            names = self.measurement_value_names
+            return OrderedDict([(n, float(v)) for n, v in zip(names, values)])
+        return channel_dict(values)
+
     @property
     def measurement_units(self):
         if self.measurement_name in self.DEFAULT_MEASUREMENTS: 
@@ -227,56 +445,110 @@ class Colorimeter:
             units = self.calibrations.units(self.measurement_name)
         return units
 
+    @property
+    def measurement_reference(self):
+        # Value of a blank for the current measurement
+        if self.is_raw_sensor:
+            return self.blank_values
+        elif self.is_transmittance:
+            return self.transmittance_reference
+        return None
+
     @property
     def raw_sensor_values(self):
+        # sensor_t is set to the time of the (light) frame read
+        if self.illumination is not None:
+            values = self.illumination.read()
+            self.sensor_t = self.illumination.light_t
+            return values
+        self.sensor_t = clock.monotonic()
         return self.light_sensor.raw_values
 
     @property
     def transmittances(self):
-        transmittances = self.raw_sensor_values/self.blank_values
+        return self.calc_transmittances(self.raw_sensor_values)
+
+    @property
+    def absorbances(self):
+        return self.calc_absorbances(self.raw_sensor_values)
+
+    @property
+    def measurement_values(self):
+        return self.calc_measurement_values(self.raw_sensor_values)
+
+    def calc_transmittances(self, raw_values):
+        transmittances = raw_values/self.blank_values
         mask = transmittances > 1.0
         transmittances[mask] = 1.0
         return transmittances
 
-    @property
-    def absorbances(self):
-        absorbances = -ulab.numpy.log10(self.transmittances)
+    def calc_absorbances(self, raw_values):
+        absorbances = -ulab.numpy.log10(self.calc_transmittances(raw_values))
         mask = absorbances < 0.0
         absorbances[mask] = 0.0
         return absorbances
 
-    @property
-    def measurement_values(self):
+    def calc_measurement_values(self, raw_values):
         if self.is_absorbance: 
-            values = self.absorbances
+            values = self.calc_absorbances(raw_values)
         elif self.is_transmittance:
-            values = self.transmittances
+            values = self.calc_transmittances(raw_values)
         elif self.is_raw_sensor:
-            values = self.raw_sensor_values
-        elif self.is_calibrated_measurement:
-            error_message = 'calibrated measurement not implemented'
-            self.message_screen.set_message(error_message)
-            self.message_screen.set_to_error()
-            self.measurement_name = 'Absorbance'
-            self.mode = Mode.MESSAGE
+            values = raw_values
+        elif self.is_unmixing:
+            absorbances = self.calc_absorbances(raw_values)
+            values = self.calibrations.unmix(self.measurement_name, absorbances)
+        else:
+            values = self.calc_fit_values(raw_values)
         return values
 
+    def calc_fit_values(self, raw_values):
+        # Linear/polynomial calibration of the absorbance of its channel. The
+        # value goes in the first slot (as for unmixing) so filters, history
+        # and logging are unchanged. Outside the calibration range the fit is
+        # extrapolated and fit_in_range is cleared.
+        name = self.measurement_name
+        absorbance = float(self.calc_absorbances(raw_values)[self.calibrations.channel(name)])
+        self.fit_in_range = self.calibrations.in_range(name, absorbance)
+        values = ulab.numpy.zeros((constants.NUM_CHANNEL,))
+        values[0] = self.calibrations.evaluate(name, absorbance)
+        return values
 
-    def blank_sensor(self, set_blanked=True):
-        num_samp = constants.NUM_BLANK_SAMPLES
-        num_chan = constants.NUM_CHANNEL
-        blank_samples = ulab.numpy.zeros((num_samp, num_chan))
+    def acquire_block(self, num_samp, dt):
+        # Job acquiring num_samp sensor readings into the preallocated sample 
+        # block. Returns a view of the filled rows.
+        block = self.sample_block[:num_samp]
+        resume_t = clock.monotonic()
         for i in range(num_samp):
-            try:
-                values =  self.light_sensor.raw_values
-            except LightSensorOverflow:
-                value = self.light_sensor.max_counts
-            blank_samples[i,:] = values
-            time.sleep(constants.BLANK_DT)
-        self.blank_values = ulab.numpy.median(blank_samples,axis=0)
-        self.blank_values = ulab.numpy.where(self.blank_values>0, self.blank_values, 1.0)
-        if set_blanked:
-            self.is_blanked = True
+            block[i,:] = self.raw_sensor_values
+            if i < num_samp-1:
+                resume_t += dt
+                yield resume_t
+        return block
+
+    def read_sensor_block(self, num_samp, dt):
+        return run_job(self.acquire_block(num_samp, dt))
+
+    def blank_sensor_job(self, set_blanked=True):
+        self.is_blanking = True
+        try:
+            num_samp = constants.NUM_BLANK_SAMPLES
+            blank_samples = yield from self.acquire_block(num_samp, constants.BLANK_DT)
+            self.blank_values = ulab.numpy.median(blank_samples,axis=0)
+            self.blank_values = ulab.numpy.where(self.blank_values>0, self.blank_values, 1.0)
+            if set_blanked:
+                self.is_blanked = True
+            self.reset_measurement_state()
+            self.stability.disarm()
+        finally:
+            self.is_blanking = False
+        # Rates from before the blank aren't comparable, keep the settings
+        if self.kinetics is not None:
+            self.kinetics.reset()
+        return {'blanks': channel_dict(self.blank_values)}
+
+    def blank_sensor(self, set_blanked=True):
+        run_job(self.blank_sensor_job(set_blanked))
 
     def blank_button_pressed(self, buttons):  
         if self.is_raw_sensor:
@@ -305,6 +577,12 @@ class Colorimeter:
         else:
             return False
 
+    def statistics_button_pressed(self, buttons):
+        if self.is_raw_sensor:
+            return False
+        else:
+            return buttons & constants.BUTTON['itime']
+
     def itime_button_pressed(self, buttons):
         if self.is_raw_sensor:
             return buttons & constants.BUTTON['itime']
@@ -312,23 +590,22 @@ class Colorimeter:
             return False
 
     def handle_button_press(self):
-        buttons = self.pad.get_pressed()
-        if not buttons:
-            # No buttons pressed
-            return 
-        if not self.check_debounce():
-            # Still within debounce timeout
-            return  
-
-        # Get time of last button press for debounce check
-        self.last_button_press = time.monotonic()
+        # Handle all presses (and repeats) queued since the last pass
+        for buttons in self.buttons.get_presses():
+            # First press after idling only wakes the device up
+            self.recorder.button(buttons)
+            if self.idle_manager.activity():
+                continue
+            self.handle_buttons(buttons)
 
+    def handle_buttons(self, buttons):
         # Update state of system based on buttons pressed.
         # This is different for each operating mode. 
         if self.mode == Mode.MEASURE:
             if self.blank_button_pressed(buttons):
-                self.measure_screen.set_blanking()
-                self.blank_sensor()
+                # Blank in the background unless a command job is running 
+                if self.command_job is None and not self.is_kinetics_running:
+                    self.start_command_job(None, self.blank_sensor_job())
             elif self.menu_button_pressed(buttons):
                 self.mode = Mode.MENU
             elif self.gain_button_pressed(buttons):
@@ -336,6 +613,48 @@ class Colorimeter:
                 self.is_blanked = False
             elif self.itime_button_pressed(buttons):
                 pass
+            elif self.statistics_button_pressed(buttons):
+                self.statistics_enabled = not self.statistics_enabled
+                self.running_stats.reset()
+            elif self.right_button_pressed(buttons):
+                # Manual capture, taken with the next reading
+                self.capture_requested = True
+            elif self.channel_button_pressed(buttons):
+                # Toggle between channel list and spectrum views
+                self.spectrum_view = not self.spectrum_view
+                self.mode = Mode.MEASURE
+
+        elif self.mode == Mode.KINETICS:
+            if buttons & constants.BUTTON['blank']:
+                if self.command_job is None and not self.is_kinetics_running:
+                    self.start_command_job(None, self.blank_sensor_job())
+            elif self.menu_button_pressed(buttons):
+                self.mode = Mode.MENU
+            elif self.right_button_pressed(buttons):
+                if self.is_kinetics_running:
+                    self.kinetics.stop()
+                else:
+                    self.start_kinetics()
+            elif self.channel_button_pressed(buttons):
+                if self.kinetics is not None:
+                    self.kinetics_chan_pos += 1
+                    self.kinetics_chan_pos %= len(self.kinetics.channels)
+
+        elif self.mode == Mode.TREND:
+            if buttons & constants.BUTTON['blank']:
+                if self.command_job is None and not self.is_kinetics_running:
+                    self.start_command_job(None, self.blank_sensor_job())
+                    self.measure_screen.clear()
+            elif self.menu_button_pressed(buttons):
+                self.mode = Mode.MENU
+            elif self.right_button_pressed(buttons):
+                self.measure_screen.clear()
+                self.reset_trend()
+            elif self.channel_button_pressed(buttons):
+                self.trend_chan_pos += 1
+                self.trend_chan_pos %= constants.NUM_CHANNEL
+                self.measure_screen.clear()
+                self.reset_trend()
 
         elif self.mode == Mode.MENU:
             if self.menu_button_pressed(buttons):
@@ -344,15 +663,29 @@ class Colorimeter:
                 self.decr_menu_item_pos()
             elif self.down_button_pressed(buttons): 
                 self.incr_menu_item_pos()
+            elif buttons & constants.BUTTON['itime']:
+                self.page_menu_item_pos(-1)
+            elif buttons & constants.BUTTON['gain']:
+                self.page_menu_item_pos(1)
+            elif self.channel_button_pressed(buttons):
+                self.jump_menu_item_pos()
             elif self.right_button_pressed(buttons): 
-                selected_item = self.menu_items[self.menu_item_pos]
+                selected_item = self.menu_entries.item(self.menu_item_pos)
                 if selected_item == self.ABOUT_STR:
                     about_msg = f'firmware version {constants.__version__}'
                     self.mode = Mode.MESSAGE
                     self.message_screen.set_message(about_msg) 
                     self.message_screen.set_to_about()
+                elif selected_item == self.KINETICS_STR:
+                    if self.kinetics is None:
+                        self.setup_kinetics()
+                    self.mode = Mode.KINETICS
+                elif selected_item == self.TREND_STR:
+                    self.setup_trend()
+                    self.mode = Mode.TREND
                 else:
-                    self.measurement_name = self.menu_items[self.menu_item_pos]
+                    self.measurement_name = selected_item
+                    self.menu_entries.use(selected_item)
                     self.mode = Mode.MEASURE
             self.update_menu_screen()
 
@@ -368,78 +701,1159 @@ class Colorimeter:
                 else:
                     self.mode = Mode.MEASURE
 
-    def check_debounce(self):
-        button_dt = time.monotonic() - self.last_button_press
-        if button_dt < constants.DEBOUNCE_DT: 
-            return False
-        else:
-            return True
-
     def handle_serial_command(self): 
-        msg = self.message_receiver.update()
-        if msg:
+        self.receive_serial_commands()
+        self.update_command_job()
+        # Commands are processed in FIFO order. A command which starts a job
+        # holds back the rest of the queue until the job completes.
+        while self.command_queue and self.command_job is None:
+            msg = self.command_queue.pop(0)
+            self.process_serial_command(msg)
+
+    def receive_serial_commands(self):
+        while True:
+            msg = self.message_receiver.update()
+            if not msg:
+                if self.message_receiver.error:
+                    self.idle_manager.activity()
+                    continue
+                break
+            self.idle_manager.activity()
+            self.recorder.serial(msg)
+            if len(self.command_queue) < constants.COMMAND_QUEUE_SIZE:
+                self.command_queue.append(msg)
+            else:
+                rsp = new_response(msg)
+                rsp['response'] = {'error': 'command queue full'}
+                send_message(rsp)
+
+    def process_serial_command(self, msg):
+        rsp = new_response(msg)
+        if rsp['command'] is None:
+            rsp['command'] = 'missing'
+            send_message(rsp)
+            return
+        rsp['response'] = {}
+        try:
+            handler = self.serial_commands[rsp['command']]
+        except (KeyError, TypeError):
+            rsp['response']['error'] = 'unknown command'
+        else:
             try:
-                cmd = msg['command']
-            except KeyError:
-                rsp = {'command': 'missing'}
+                result = handler(msg)
+            except CommandError as error:
+                rsp['response']['error'] = str(error)
             else:
-                rsp = {'command': cmd, 'response': {}}
-                if cmd == 'read':
-                    rsp['response']['values'] = self.light_sensor.values_as_dict
-                    if self.is_blanked:
-                        rsp['response']['blanks'] = {}
-                        for name, chan in constants.STR_TO_CHANNEL.items():
-                            rsp['response']['blanks'][name] = self.blank_values[chan]
-                else:
-                    rsp['response']['error'] = 'unknown command'
+                if is_job(result):
+                    # Acknowledge now, response is sent when the job is done
+                    del rsp['response']
+                    rsp['status'] = 'pending'
+                    send_message(rsp)
+                    self.start_command_job(rsp, result)
+                    return
+                rsp['response'] = result
+        send_message(rsp)
+
+    def start_command_job(self, rsp, job):
+        # rsp is None for jobs started locally, e.g. by a button press. 
+        self.command_job = job
+        self.command_job_rsp = rsp
+        self.command_job_resume_t = None
+        self.update_command_job()
+
+    def update_command_job(self):
+        if self.command_job is None:
+            return
+        resume_t = self.command_job_resume_t
+        if resume_t is not None and clock.monotonic() < resume_t:
+            return
+        try:
+            done, value = step_job(self.command_job)
+        except CommandError as error:
+            done, value = True, {'error': str(error)}
+        if not done:
+            self.command_job_resume_t = value
+            return
+        rsp = self.command_job_rsp
+        self.command_job = None
+        self.command_job_rsp = None
+        self.command_job_resume_t = None
+        if rsp is not None:
+            rsp['status'] = 'done'
+            rsp['response'] = value
             send_message(rsp)
 
-    def run(self):
+    def check_light_sensor(self):
+        if self.light_sensor is None:
+            raise CommandError('light sensor not available')
 
-        while True:
-            # Deal with any incomming serial commands
-            self.handle_serial_command()
+    def read_command(self, msg):
+        self.check_light_sensor()
+        try:
+            num_samp = int(msg.get('samples', 1))
+            interval = float(msg.get('interval', 0.0))
+        except (ValueError, TypeError):
+            raise CommandError('samples and interval must be numbers')
+        if not num_samp in range(1, constants.MAX_READ_SAMPLES+1):
+            raise CommandError(f'samples must be in 1 to {constants.MAX_READ_SAMPLES}')
+        if interval < 0.0 or interval > constants.MAX_READ_INTERVAL:
+            raise CommandError(f'interval must be in 0 to {constants.MAX_READ_INTERVAL}')
+        reduce_type = msg.get('reduce', 'none')
+        if not reduce_type in constants.READ_REDUCE_TYPES:
+            raise CommandError(f'reduce must be in {constants.READ_REDUCE_TYPES}')
+        if num_samp == 1:
+            block = self.read_sensor_block(num_samp, interval)
+            return self.read_response(block, reduce_type)
+        else:
+            return self.read_job(num_samp, interval, reduce_type)
+
+    def read_job(self, num_samp, interval, reduce_type):
+        block = yield from self.acquire_block(num_samp, interval)
+        return self.read_response(block, reduce_type)
+
+    def read_response(self, block, reduce_type):
+        # Reduce a block of samples acquired in one burst on the device 
+        rsp = {}
+        num_samp = block.shape[0]
+        if reduce_type == 'none':
+            if num_samp == 1:
+                rsp['values'] = channel_dict(block[0,:], int)
+            else:
+                rsp['values'] = OrderedDict()
+                for name, chan in constants.STR_TO_CHANNEL.items():
+                    rsp['values'][name] = [int(x) for x in block[:,chan]]
+        elif reduce_type == 'mean':
+            rsp['values'] = channel_dict(ulab.numpy.mean(block, axis=0))
+        elif reduce_type == 'median':
+            rsp['values'] = channel_dict(ulab.numpy.median(block, axis=0))
+        else:
+            rsp['values'] = OrderedDict([
+                ('mean', channel_dict(ulab.numpy.mean(block, axis=0))),
+                ('std',  channel_dict(ulab.numpy.std(block, axis=0))),
+                ('min',  channel_dict(ulab.numpy.min(block, axis=0))),
+                ('max',  channel_dict(ulab.numpy.max(block, axis=0))),
+                ])
+        rsp['samples'] = num_samp
+        rsp['reduce'] = reduce_type
+        if self.is_blanked:
+            rsp['blanks'] = channel_dict(self.blank_values)
+        return rsp
+
+    def blank_command(self, msg):
+        self.check_light_sensor()
+        if self.is_kinetics_running:
+            raise CommandError('kinetics running, stop it before blanking')
+        return self.blank_sensor_job()
+
+    def reset_blank_command(self, msg):
+        self.blank_values = ulab.numpy.ones((constants.NUM_CHANNEL,))
+        self.is_blanked = False
+        return {'is_blanked': self.is_blanked}
 
-            # Deal with any button presses
-            self.handle_button_press()
+    def set_gain_command(self, msg):
+        self.check_light_sensor()
+        gain_str = msg.get('gain', None)
+        try:
+            gain = constants.STR_TO_GAIN[gain_str]
+        except (KeyError, TypeError):
+            raise CommandError(f'unknown gain {gain_str}')
+        self.light_sensor.gain = gain
+        self.is_blanked = False
+        while next(self.gain_cycle) != gain:
+            continue
+        return {'gain': gain_str, 'is_blanked': self.is_blanked}
 
-            # Update display based on the current operating mode
-            if self.mode == Mode.MEASURE:
-                # Get measurement and display result on measurment screen
+    def set_integration_time_command(self, msg):
+        self.check_light_sensor()
+        itime_str = msg.get('integration_time', None)
+        try:
+            itime = constants.STR_TO_INTEGRATION_TIME[itime_str]
+        except (KeyError, TypeError):
+            raise CommandError(f'unknown integration time {itime_str}')
+        self.light_sensor.integration_time = itime
+        self.is_blanked = False
+        return {'integration_time': itime_str, 'is_blanked': self.is_blanked}
+
+    def select_measurement_command(self, msg):
+        name = msg.get('name', None)
+        if not self.is_measurement_item(name):
+            raise CommandError(f'unknown measurement {name}')
+        self.measurement_name = name
+        self.menu_entries.use(name)
+        if self.mode == Mode.MENU:
+            self.mode = Mode.MEASURE
+        return {'measurement': name, 'units': self.measurement_units}
+
+    def list_measurements_command(self, msg):
+        measurements = []
+        for name in self.menu_items:
+            if not self.is_measurement_item(name):
+                continue
+            chan = self.calibrations.channel(name)
+            if chan is not None:
+                chan = constants.CHANNEL_TO_STR[chan]
+            measurements.append({
+                'name'    : name, 
+                'units'   : self.calibrations.units(name), 
+                'led'     : self.calibrations.led(name),
+                'channel' : chan, 
+                })
+            if self.calibrations.is_unmixing(name):
+                measurements[-1]['components'] = self.calibrations.component_names(name)
+        return {'measurements': measurements, 'current': self.measurement_name}
+
+    def get_config_command(self, msg):
+        rsp = OrderedDict()
+        rsp['version'] = constants.__version__
+        rsp['measurement'] = self.measurement_name
+        rsp['precision'] = self.configuration.precision
+        rsp['startup'] = self.configuration.startup
+        rsp['filter'] = self.configuration.filter_settings(self.measurement_name)
+        rsp['is_blanked'] = self.is_blanked
+        rsp['idle_state'] = self.idle_manager.state
+        rsp['illumination'] = self.illumination is not None
+        rsp['battery'] = OrderedDict()
+        rsp['battery']['voltage'] = self.battery_monitor.voltage
+        rsp['battery']['soc'] = self.battery_monitor.soc
+        rsp['battery']['low'] = self.battery_monitor.is_low
+        if self.light_sensor is not None:
+            rsp['gain'] = constants.GAIN_TO_STR[self.light_sensor.gain]
+            itime = self.light_sensor.integration_time
+            rsp['integration_time'] = constants.INTEGRATION_TIME_TO_STR[itime]
+        return rsp
+
+    def kinetics_command(self, msg):
+        self.check_light_sensor()
+        action = msg.get('action', 'status')
+        rsp = OrderedDict()
+        if action == 'start':
+            channels = msg.get('channels', None)
+            if channels is not None:
                 try:
-                    self.measure_screen.set_measurement(
-                            self.measurement_name, 
-                            self.measurement_units, 
-                            self.measurement_values,
-                            self.light_sensor.CHANNEL_NAMES,
-                            self.configuration.precision,
-                            )
-                except LightSensorOverflow:
-                    self.measure_screen.set_overflow(self.measurement_name)
-
-                # Update battery status
-                self.battery_monitor.update()
-                battery_voltage = self.battery_monitor.voltage_lowpass
-                self.measure_screen.set_battery(battery_voltage)
-
-                # Update blanked status, 
-                if self.is_blanked:
-                    self.measure_screen.set_blanked()
-                else:
-                    self.measure_screen.set_not_blanked()
+                    channels = [constants.STR_TO_CHANNEL[c] for c in channels]
+                except (KeyError, TypeError):
+                    raise CommandError(f'unknown channels {channels}')
+                if not channels:
+                    raise CommandError('channels must not be empty')
+            interval = msg.get('interval', None)
+            if interval is not None:
+                try:
+                    interval = float(interval)
+                except (ValueError, TypeError):
+                    interval = 0.0
+                if interval <= 0.0:
+                    raise CommandError('interval must be > 0')
+            self.start_kinetics(channels, interval)
+        elif action == 'stop':
+            if self.kinetics is not None:
+                self.kinetics.stop()
+        elif action == 'download':
+            if self.kinetics is None:
+                raise CommandError('no kinetics data')
+            try:
+                start = int(msg.get('start', 0))
+                count = msg.get('count', None)
+                if count is not None:
+                    count = int(count)
+            except (ValueError, TypeError):
+                raise CommandError('start and count must be integers')
+            times, values = self.kinetics.data(start, count)
+            rsp['start'] = start
+            rsp['times'] = times
+            rsp['values'] = self.kinetics_dict(values)
+        elif action != 'status':
+            raise CommandError(f'unknown action {action}')
+
+        kinetics = self.kinetics
+        if kinetics is None:
+            rsp['running'] = False
+            rsp['count'] = 0
+        else:
+            rsp['running'] = kinetics.running
+            rsp['count'] = kinetics.count
+            rsp['total'] = kinetics.total
+            rsp['interval'] = kinetics.interval
+            rsp['elapsed'] = kinetics.elapsed(clock.monotonic())
+            rsp['rate'] = self.kinetics_dict(kinetics.slope)
+            rsp['r_squared'] = self.kinetics_dict(kinetics.r_squared)
+        return rsp
+
+    def kinetics_dict(self, values):
+        values_dict = OrderedDict()
+        if self.kinetics is None:
+            return values_dict
+        for chan, value in zip(self.kinetics.channels, values):
+            values_dict[constants.CHANNEL_TO_STR[chan]] = value
+        return values_dict
+
+    def setup_kinetics(self, channels=None, interval=None):
+        if channels is None:
+            channels = self.configuration.kinetics_channels
+        if interval is None:
+            interval = self.configuration.kinetics_interval
+        capacity = self.configuration.kinetics_capacity
+        kinetics = self.kinetics
+        if kinetics is None or kinetics.channels != channels or kinetics.capacity != capacity:
+            self.kinetics = None
+            gc.collect()
+            self.kinetics = Kinetics(channels, interval, capacity)
+            self.kinetics_chan_pos = 0
+        self.kinetics.interval = interval
 
-                # Display current sensor gain
-                self.measure_screen.set_gain(self.light_sensor.gain)
-                self.measure_screen.show()
+    @property
+    def is_kinetics_running(self):
+        return self.kinetics is not None and self.kinetics.running
+
+    def start_kinetics(self, channels=None, interval=None):
+        self.setup_kinetics(channels, interval)
+        self.kinetics.start(clock.monotonic())
+
+    def update_kinetics(self):
+        # Kinetics sampling runs in the background in every mode 
+        if self.kinetics is None or self.is_blanking:
+            return
+        # Samples are timed by their light frame, which comes after the dark
+        # frame when dark subtraction is on.
+        if self.kinetics.is_due(clock.monotonic()):
+            absorbances = self.absorbances
+            self.kinetics.update(self.sensor_t, absorbances)
+
+    def update_kinetics_screen(self):
+        kinetics = self.kinetics
+        if kinetics is None:
+            return
+        pos = self.kinetics_chan_pos
+        self.measure_screen.set_kinetics(
+                constants.CHANNEL_TO_STR[kinetics.channels[pos]],
+                kinetics.slope[pos],
+                kinetics.r_squared[pos],
+                kinetics.count,
+                kinetics.elapsed(clock.monotonic()),
+                kinetics.running,
+                )
 
-            elif self.mode == Mode.MENU:
-                self.menu_screen.show()
+    def setup_trend(self):
+        # Trend the configured channel, else the channel of the current
+        # measurement if it has one.
+        chan_str = self.configuration.trend_settings['channel']
+        if chan_str is not None:
+            chan = constants.STR_TO_CHANNEL[chan_str]
+        else:
+            chan = self.calibrations.channel(self.measurement_name)
+        if chan is not None:
+            self.trend_chan_pos = chan
+
+    def reset_trend(self):
+        self.trend_next_t = None
+        self.trend_sum = 0.0
+        self.trend_count = 0
+
+    def update_trend(self):
+        # Every reading is shown in the header and averaged into the next
+        # plot column, one column is added per trend interval. When readings
+        # take longer than the interval (e.g. with dark frames) the average is
+        # repeated for the intervals missed so the time axis stays uniform.
+        if self.is_blanking:
+            return
+        pos = self.trend_chan_pos
+        absorbance = float(self.absorbances[pos])
+        self.measure_screen.set_value(constants.CHANNEL_TO_STR[pos], absorbance)
+        self.trend_sum += absorbance
+        self.trend_count += 1
+        t = clock.monotonic()
+        if self.trend_next_t is not None and t < self.trend_next_t:
+            return
+        value = self.trend_sum/self.trend_count
+        self.trend_sum = 0.0
+        self.trend_count = 0
+        if self.trend_next_t is None:
+            self.trend_next_t = t
+        interval = self.configuration.trend_settings['interval']
+        num_points = 0
+        while self.trend_next_t <= t:
+            self.trend_next_t += interval
+            num_points += 1
+        for i in range(min(num_points, self.measure_screen.num_columns)):
+            self.measure_screen.add_point(value)
+
+    def update_logging(self, raw_values, values):
+        interval = self.configuration.log_interval
+        if interval is None:
+            return
+        t = clock.monotonic()
+        if self.log_next_t is not None and t < self.log_next_t:
+            return
+        self.data_logger.append(
+                t, 
+                self.measurement_name, 
+                self.light_sensor.gain, 
+                raw_values, 
+                values,
+                )
+        if self.log_next_t is None:
+            self.log_next_t = t
+        while self.log_next_t <= t:
+            self.log_next_t += interval
+
+    def update_history(self, values):
+        t = clock.monotonic()
+        if self.history_next_t is not None and t < self.history_next_t:
+            return
+        self.history.append(
+                t, 
+                self.menu_items.index(self.measurement_name), 
+                self.light_sensor.gain, 
+                values,
+                )
+        if self.history_next_t is None:
+            self.history_next_t = t
+        while self.history_next_t <= t:
+            self.history_next_t += constants.HISTORY_DT
+
+    def history_command(self, msg):
+        # Returns records with start <= seq < stop, by default the most recent
+        history = self.history
+        try:
+            stop = int(msg.get('stop', history.next_seq))
+            start = int(msg.get('start', stop - constants.HISTORY_MAX_RECORDS))
+        except (ValueError, TypeError):
+            raise CommandError('start and stop must be integers')
+        start = max(start, history.first_seq)
+        stop = min(stop, history.next_seq, start + constants.HISTORY_MAX_RECORDS)
+        records = []
+        for seq in range(start, stop):
+            t, name_index, gain, flags, values = history.record(seq)
+            records.append({
+                'seq'         : seq,
+                'time'        : t,
+                'measurement' : self.menu_items[name_index],
+                'gain'        : constants.GAIN_TO_STR[gain],
+                'captured'    : bool(flags & MeasurementHistory.CAPTURED),
+                'values'      : [float(v) for v in values],
+                })
+        rsp = OrderedDict()
+        rsp['first'] = history.first_seq
+        rsp['next'] = history.next_seq
+        rsp['channels'] = list(constants.STR_TO_CHANNEL)
+        rsp['records'] = records
+        return rsp
+
+    def statistics_command(self, msg):
+        action = msg.get('action', 'status')
+        if action == 'on':
+            self.statistics_enabled = True
+            self.running_stats.reset()
+        elif action == 'off':
+            self.statistics_enabled = False
+        elif action == 'reset':
+            self.running_stats.reset()
+        elif action != 'status':
+            raise CommandError(f'unknown action {action}')
+        rsp = OrderedDict()
+        rsp['enabled'] = self.statistics_enabled
+        rsp['measurement'] = self.measurement_name
+        rsp['count'] = self.running_stats.count
+        rsp['mean'] = self.values_dict(self.running_stats.mean)
+        rsp['std'] = self.values_dict(self.running_stats.std)
+        return rsp
+
+    def update_stability(self, raw_values, values):
+        if self.stability_enabled and not self.is_blanking:
+            if self.is_absorbance:
+                absorbances = values
+            else:
+                absorbances = self.calc_absorbances(raw_values)
+            if self.stability.update(absorbances):
+                self.capture_measurement(raw_values, values, 'auto')
+        if self.capture_requested:
+            self.capture_requested = False
+            self.capture_measurement(raw_values, values, 'manual')
+        self.measure_screen.set_stable(self.stability_enabled and self.stability.is_stable)
+
+    def capture_measurement(self, raw_values, values, source):
+        # Record the reading in the history (flagged as captured) and in the
+        # log, and notify the host. With statistics on the mean is captured.
+        if self.statistics_enabled and self.running_stats.count:
+            values = self.running_stats.mean
+        t = clock.monotonic()
+        seq = self.history.next_seq
+        self.history.append(
+                t,
+                self.menu_items.index(self.measurement_name),
+                self.light_sensor.gain,
+                values,
+                MeasurementHistory.CAPTURED,
+                )
+        self.data_logger.append(
+                t, 
+                self.measurement_name, 
+                self.light_sensor.gain, 
+                raw_values, 
+                values,
+                )
+        msg = OrderedDict()
+        msg['event'] = 'capture'
+        msg['source'] = source
+        msg['seq'] = seq
+        msg['time'] = t
+        msg['measurement'] = self.measurement_name
+        msg['units'] = self.measurement_units
+        msg['values'] = self.values_dict(values)
+        if self.is_fit:
+            msg['in_range'] = self.fit_in_range
+        if self.batch.is_active:
+            msg['sample'] = self.batch.sample_id
+            msg['sample_index'] = self.batch.record(t, self.measurement_name, values)
+        send_message(msg)
+        if 'sample' in msg:
+            self.update_batch_sample()
+
+    def update_batch_sample(self):
+        # Select the measurement the next sample expects, or tell the host
+        # the batch is complete.
+        if self.batch.is_active:
+            name = self.batch.measurement
+            if name is not None and name != self.measurement_name:
+                self.measurement_name = name
+        elif len(self.batch):
+            msg = OrderedDict()
+            msg['event'] = 'batch_complete'
+            msg['samples'] = len(self.batch)
+            msg['measured'] = self.batch.num_measured
+            send_message(msg)
+
+    def batch_command(self, msg):
+        # Sample batches: load a list of samples (over serial or from
+        # BATCH_FILE), captures fill in the results, export fetches them.
+        action = msg.get('action', 'status')
+        try:
+            if action == 'load':
+                self.batch_load(msg)
+            elif action == 'skip':
+                self.batch.skip()
+                self.update_batch_sample()
+            elif action == 'goto':
+                self.batch.goto(get_int(msg, 'index'))
+                self.update_batch_sample()
+            elif action == 'clear':
+                self.batch.clear()
+            elif action == 'export':
+                return self.batch_export(msg)
+            elif action != 'status':
+                raise CommandError(f'unknown action {action}')
+        except SampleBatchError as error:
+            raise CommandError(str(error))
+        rsp = OrderedDict()
+        rsp['samples'] = len(self.batch)
+        rsp['measured'] = self.batch.num_measured
+        rsp['index'] = self.batch.pos
+        rsp['sample'] = self.batch.sample_id
+        rsp['measurement'] = self.batch.measurement
+        return rsp
+
+    def batch_load(self, msg):
+        samples = msg.get('samples', None)
+        if samples is None:
+            name = msg.get('file', constants.BATCH_FILE)
+            try:
+                with open(name, 'r') as f:
+                    samples = json.load(f)
+            except (OSError, ValueError):
+                raise CommandError(f'unable to read {name}')
+            if type(samples) == dict:
+                samples = samples.get('samples', None)
+        batch = self.batch
+        batch.load(samples)
+        for name in batch.measurements:
+            if name is not None and not self.is_measurement_item(name):
+                batch.clear()
+                raise CommandError(f'unknown measurement {name}')
+        self.update_batch_sample()
+
+    def batch_export(self, msg):
+        # Whole batch (or rows start to start+count) in one response, as CSV
+        # text or as base64 little endian float32 values, row major.
+        num = len(self.batch)
+        try:
+            start = int(msg.get('start', 0))
+            count = int(msg.get('count', num))
+        except (ValueError, TypeError):
+            raise CommandError('start and count must be integers')
+        start = max(0, min(start, num))
+        stop = max(start, min(start + count, num))
+        export_format = msg.get('format', 'csv')
+        rsp = OrderedDict()
+        rsp['format'] = export_format
+        rsp['start'] = start
+        rsp['channels'] = list(constants.STR_TO_CHANNEL)
+        if export_format == 'csv':
+            chan_str = ','.join(constants.STR_TO_CHANNEL)
+            rsp['header'] = f'id,state,measurement,time,{chan_str}'
+            rsp['data'] = ''.join(self.batch.csv_rows(start, stop))
+        elif export_format == 'binary':
+            batch = self.batch
+            rsp['ids'] = batch.ids[start:stop]
+            rsp['states'] = [batch.STATE_TO_STR[batch.states[i]] for i in range(start, stop)]
+            rsp['measurements'] = [batch.names[i] for i in range(start, stop)]
+            rsp['times'] = [batch.times[i] for i in range(start, stop)]
+            data = binascii.b2a_base64(batch.results_bytes(start, stop))
+            rsp['data'] = data.decode().strip()
+        else:
+            raise CommandError(f'unknown format {export_format}')
+        return rsp
+
+    def stability_command(self, msg):
+        action = msg.get('action', 'status')
+        if action == 'on':
+            self.stability_enabled = True
+            self.stability.reset()
+        elif action == 'off':
+            self.stability_enabled = False
+        elif action == 'capture':
+            self.capture_requested = True
+        elif action != 'status':
+            raise CommandError(f'unknown action {action}')
+        rsp = OrderedDict()
+        rsp['enabled'] = self.stability_enabled
+        rsp['stable'] = self.stability.is_stable
+        rsp['armed'] = self.stability.armed
+        rsp['channels'] = [self.light_sensor.CHANNEL_NAMES[c] for c in self.stability.channels]
+        rsp['window'] = self.stability.window
+        rsp['std_max'] = self.stability.std_max
+        rsp['drift_max'] = self.stability.drift_max
+        return rsp
+
+    def record_command(self, msg):
+        # Record raw sensor frames, button presses and serial messages to a
+        # binary file in LOG_DIR for replay (see replay.py)
+        action = msg.get('action', 'status')
+        rsp = OrderedDict()
+        if action == 'start':
+            self.check_light_sensor()
+            name = msg.get('file', constants.RECORD_FILE)
+            if type(name) != str or not name or '/' in name:
+                raise CommandError('file must be a file name')
+            try:
+                self.recorder.start(name, self.recording_state())
+            except OSError as error:
+                raise CommandError(f'unable to start recording ({error})')
+        elif action == 'stop':
+            self.recorder.stop()
+        elif action == 'fetch':
+            return self.fetch_chunk_response(msg.get('file', constants.RECORD_FILE), msg)
+        elif action != 'status':
+            raise CommandError(f'unknown action {action}')
+        rsp['recording'] = self.recorder.recording
+        rsp['file'] = self.recorder.file_name
+        rsp['size'] = self.recorder.file_size + self.recorder.buffer_len
+        rsp['frames'] = self.recorder.num_frames
+        rsp['dropped'] = self.recorder.num_dropped
+        rsp['write_error'] = self.recorder.error
+        return rsp
+
+    def recording_state(self):
+        # State written at the start of a recording, replay starts from it
+        state = OrderedDict()
+        state['measurement'] = self.measurement_name
+        state['mode'] = MODE_TO_STR[self.mode]
+        state['spectrum_view'] = self.spectrum_view
+        state['trend_channel'] = self.trend_chan_pos
+        state['is_blanked'] = self.is_blanked
+        state['blank_values'] = [float(v) for v in self.blank_values]
+        state['gain'] = self.light_sensor.gain
+        state['integration_time'] = list(self.light_sensor.integration_time)
+        state['configuration'] = self.configuration.data
+        state['calibrations'] = self.calibrations.data
+        return state
+
+    def fetch_chunk_response(self, name, msg):
+        # Base64 chunk of a file in LOG_DIR for the log and record fetch actions
+        try:
+            offset = int(msg.get('offset', 0))
+            size = int(msg.get('size', constants.LOG_CHUNK_SIZE))
+        except (ValueError, TypeError):
+            raise CommandError('offset and size must be integers')
+        try:
+            data, eof = self.data_logger.read_chunk(name, offset, size)
+        except OSError as error:
+            raise CommandError(f'unable to read {name} ({error})')
+        rsp = OrderedDict()
+        rsp['file'] = name
+        rsp['offset'] = offset
+        rsp['data'] = binascii.b2a_base64(data).decode().strip()
+        rsp['eof'] = eof
+        return rsp
+
+    def log_command(self, msg):
+        action = msg.get('action', 'status')
+        rsp = OrderedDict()
+        if action == 'list':
+            rsp['files'] = OrderedDict()
+            for name in self.data_logger.file_list():
+                rsp['files'][name] = self.data_logger.get_file_size(name)
+        elif action == 'fetch':
+            return self.fetch_chunk_response(msg.get('file', constants.LOG_FILE), msg)
+        elif action == 'flush':
+            self.data_logger.flush()
+        elif action != 'status':
+            raise CommandError(f'unknown action {action}')
+        rsp['interval'] = self.configuration.log_interval
+        rsp['enabled'] = self.data_logger.enabled
+        rsp['buffered'] = self.data_logger.buffer_len
+        rsp['dropped'] = self.data_logger.num_dropped
+        rsp['write_error'] = self.data_logger.error
+        return rsp
 
-            elif self.mode in (Mode.MESSAGE, Mode.ABORT):
-                self.message_screen.show()
+    @property
+    def is_sleep_inhibited(self):
+        # Keep sampling while unattended work is going on
+        test = self.command_job is not None
+        test |= self.is_kinetics_running
+        test |= self.configuration.log_interval is not None
+        test |= self.stability_enabled
+        test |= self.mode == Mode.TREND
+        test |= self.recorder.recording
+        return test
 
-            gc.collect()
-            time.sleep(constants.LOOP_DT)
+    def update_reload(self):
+        # Poll settings files for changes at a low rate and reload them
+        t = clock.monotonic()
+        if self.reload_next_t is not None and t < self.reload_next_t:
+            return
+        self.reload_next_t = t + constants.RELOAD_CHECK_DT
+        for name in self.SETTINGS_FILES:
+            if getattr(self, name).is_changed():
+                self.send_reload_event(name, *self.reload_settings(name))
+
+    def send_reload_event(self, name, reloaded, errors):
+        msg = OrderedDict()
+        msg['event'] = 'reload'
+        msg['file'] = name
+        msg['reloaded'] = reloaded
+        msg['errors'] = errors
+        send_message(msg)
+
+    def reload_settings(self, name):
+        # Loads and checks the file into a new object which replaces the
+        # current one only when it could be read. Returns (reloaded, errors).
+        if name == 'configuration':
+            settings = Configuration()
+            load_error = ConfigurationError
+        else:
+            settings = Calibrations()
+            load_error = CalibrationsError
+        try:
+            with mem_profile.region(name):
+                settings.load()
+        except load_error as error:
+            # Keep current settings and wait for the next change to the file 
+            getattr(self, name).stat = settings.stat
+            return False, [str(error)]
+        errors = settings.pop_errors()
+        if name == 'configuration':
+            self.apply_configuration(settings)
+        else:
+            self.apply_calibrations(settings)
+        return True, errors
+
+    def apply_configuration(self, configuration):
+        old_configuration = self.configuration
+        self.configuration = configuration
+
+        # Sensor settings are only changed when changed in the file, the blank
+        # is kept when the gain and integration time are unchanged.
+        if self.light_sensor is not None:
+            gain = configuration.gain
+            if gain is not None and gain != old_configuration.gain:
+                self.light_sensor.gain = gain
+                self.is_blanked = False
+            itime = configuration.integration_time
+            if itime is not None and itime != old_configuration.integration_time:
+                self.light_sensor.integration_time = itime
+                self.is_blanked = False
+        self.setup_menu_cycles()
+
+        self.statistics_enabled = configuration.statistics_enabled
+        self.running_stats = RunningStats(
+                constants.NUM_CHANNEL, 
+                **configuration.statistics_settings
+                )
+        self.stability_enabled = configuration.stability_enabled
+        self.stability = StabilityDetector(
+                configuration.stability_channels,
+                **configuration.stability_settings
+                )
+        for key, value in configuration.idle_settings.items():
+            setattr(self.idle_manager, key, value)
+        for key, value in configuration.buttons_settings.items():
+            setattr(self.buttons, key, value)
+
+        # Sets up the measurement filter from the new settings
+        self.measurement_name = self.measurement_name
+
+    def apply_calibrations(self, calibrations):
+        self.calibrations = calibrations
+        old_menu_items = self.menu_items
+        self.setup_menu_items(self.menu_entries.mru)
+
+        # History records refer to measurements by menu index
+        if self.menu_items != old_menu_items:
+            self.history.clear()
+
+        if self.is_measurement_item(self.measurement_name):
+            self.measurement_name = self.measurement_name
+        else:
+            self.measurement_name = self.menu_items[0]
+        if self.mode == Mode.MENU:
+            self.mode = Mode.MENU
+
+    def reload_command(self, msg):
+        # Reload settings files, all of them or the one given by 'file'
+        name = msg.get('file', None)
+        if name is None:
+            names = self.SETTINGS_FILES
+        elif name in self.SETTINGS_FILES:
+            names = [name]
+        else:
+            raise CommandError(f'unknown file {name}')
+        rsp = OrderedDict()
+        for name in names:
+            reloaded, errors = self.reload_settings(name)
+            rsp[name] = {'reloaded': reloaded, 'errors': errors}
+        return rsp
+
+    def calibrate_command(self, msg):
+        # Build a calibration from measured standards: start, measure each
+        # standard (with or without its concentration), set concentrations,
+        # fit and save to calibrations.json.
+        action = msg.get('action', 'status')
+        if action == 'start':
+            self.calibrate_start(msg)
+            return self.calibrate_status()
+        builder = self.calibration_builder
+        if builder is None:
+            raise CommandError('no calibration started')
+        try:
+            if action == 'measure':
+                self.check_light_sensor()
+                if not self.is_blanked:
+                    raise CommandError('not blanked')
+                try:
+                    num_samp = int(msg.get('samples', constants.CALIBRATION_NUM_SAMPLES))
+                except (ValueError, TypeError):
+                    num_samp = 0
+                if not num_samp in range(1, constants.MAX_READ_SAMPLES+1):
+                    raise CommandError(f'samples must be in 1 to {constants.MAX_READ_SAMPLES}')
+                concentration = msg.get('concentration', None)
+                if concentration is not None:
+                    concentration = get_float(msg, 'concentration')
+                return self.calibrate_measure_job(num_samp, concentration)
+            elif action == 'set':
+                builder.set_concentration(get_int(msg, 'index'), get_float(msg, 'concentration'))
+            elif action == 'remove':
+                builder.remove(get_int(msg, 'index'))
+            elif action == 'fit':
+                rsp = self.calibrate_status()
+                rsp['fit'] = builder.fit()
+                return rsp
+            elif action == 'save':
+                return self.calibrate_save()
+            elif action == 'cancel':
+                self.calibration_builder = None
+                return OrderedDict()
+            elif action != 'status':
+                raise CommandError(f'unknown action {action}')
+        except CalibrationBuilderError as error:
+            raise CommandError(str(error))
+        return self.calibrate_status()
+
+    def calibrate_start(self, msg):
+        name = msg.get('name', None)
+        if type(name) != str or not name:
+            raise CommandError('name must be a non-empty string')
+        reserved = self.DEFAULT_MEASUREMENTS + [self.ABOUT_STR, self.KINETICS_STR, self.TREND_STR]
+        if name in reserved:
+            raise CommandError(f'name {name} is reserved')
+        chan_str = msg.get('channel', None)
+        if not chan_str in constants.STR_TO_CHANNEL:
+            raise CommandError(f'channel must be in {list(constants.STR_TO_CHANNEL)}')
+        degree = msg.get('degree', None)
+        if degree is not None:
+            degree = get_int(msg, 'degree')
+        try:
+            self.calibration_builder = CalibrationBuilder(
+                    name,
+                    constants.STR_TO_CHANNEL[chan_str],
+                    fit_type = msg.get('fit_type', 'linear'),
+                    degree = degree,
+                    units = msg.get('units', None),
+                    led = msg.get('led', None),
+                    )
+        except CalibrationBuilderError as error:
+            raise CommandError(str(error))
+
+    def calibrate_measure_job(self, num_samp, concentration):
+        # Standard absorbance is the mean over a block of samples, the std
+        # shows how steady the reading was.
+        builder = self.calibration_builder
+        if builder.led is not None and self.illumination is not None:
+            self.illumination.select_led(builder.led)
+        try:
+            block = yield from self.acquire_block(num_samp, constants.CALIBRATION_SAMPLE_DT)
+        except LightSensorOverflow:
+            raise CommandError('light sensor overflow')
+        finally:
+            if self.illumination is not None:
+                self.illumination.select_led(self.calibrations.led(self.measurement_name))
+        chan = builder.channel
+        raw_values = block[:,chan]
+        if ulab.numpy.min(raw_values) <= 0.0:
+            raise CommandError('no light on channel')
+        transmittances = raw_values/self.blank_values[chan]
+        transmittances[transmittances > 1.0] = 1.0
+        absorbances = -ulab.numpy.log10(transmittances)
+        try:
+            index = builder.add(
+                    float(ulab.numpy.mean(absorbances)),
+                    float(ulab.numpy.std(absorbances)),
+                    concentration,
+                    )
+        except CalibrationBuilderError as error:
+            raise CommandError(str(error))
+        rsp = self.calibrate_status()
+        rsp['index'] = index
+        return rsp
+
+    def calibrate_save(self):
+        # Fit, write the entry and reload calibrations so it shows in the menu
+        builder = self.calibration_builder
+        fit = builder.fit()
+        try:
+            replaced = self.calibrations.write_entry(builder.name, builder.entry())
+        except CalibrationsError as error:
+            raise CommandError(str(error))
+        except OSError as error:
+            # Most likely CIRCUITPY is read only, see boot.py
+            raise CommandError(f'unable to write calibrations ({error})')
+        reloaded, errors = self.reload_settings('calibrations')
+        self.calibration_builder = None
+        rsp = OrderedDict()
+        rsp['name'] = builder.name
+        rsp['replaced'] = replaced
+        rsp['fit'] = fit
+        rsp['reloaded'] = reloaded
+        rsp['errors'] = errors
+        return rsp
+
+    def calibrate_status(self):
+        builder = self.calibration_builder
+        rsp = OrderedDict()
+        rsp['name'] = builder.name
+        rsp['channel'] = constants.CHANNEL_TO_STR[builder.channel]
+        rsp['fit_type'] = builder.fit_type
+        rsp['degree'] = builder.degree
+        rsp['standards'] = builder.standards()
+        return rsp
+
+    def update_memory(self):
+        mem_profile.update_loop(self.mode)
+        if mem_profile.pop_low_event():
+            msg = OrderedDict()
+            msg['event'] = 'low_memory'
+            msg['free'] = gc.mem_free()
+            msg['mode'] = MODE_TO_STR[self.mode]
+            send_message(msg)
+
+    def memory_command(self, msg):
+        action = msg.get('action', 'status')
+        if action == 'reset':
+            mem_profile.reset()
+        elif action != 'status':
+            raise CommandError(f'unknown action {action}')
+        rsp = OrderedDict()
+        rsp['free'] = gc.mem_free()
+        rsp['alloc'] = gc.mem_alloc()
+        rsp['min_free'] = mem_profile.min_free
+        rsp['low'] = mem_profile.is_low
+        rsp['low_count'] = mem_profile.low_count
+        rsp['loop_garbage'] = mem_profile.loop_garbage
+        rsp['loop_garbage_max'] = mem_profile.loop_garbage_max
+        rsp['regions'] = mem_profile.regions
+        rsp['high_water'] = OrderedDict()
+        for mode, alloc in mem_profile.high_water.items():
+            rsp['high_water'][MODE_TO_STR[mode]] = alloc
+        return rsp
+
+    def update_battery(self):
+        # Battery is sampled at its own low rate, most calls return at once
+        if self.battery_monitor.update():
+            msg = OrderedDict()
+            msg['event'] = 'battery_low'
+            msg['voltage'] = self.battery_monitor.voltage
+            msg['soc'] = self.battery_monitor.soc
+            send_message(msg)
+
+    def update_status_labels(self):
+        # Update battery status
+        self.measure_screen.set_battery(
+                self.battery_monitor.voltage,
+                self.battery_monitor.is_low,
+                )
+
+        # Update blanked status, 
+        if self.is_blanking:
+            self.measure_screen.set_blanking()
+        elif self.is_blanked:
+            self.measure_screen.set_blanked()
+        else:
+            self.measure_screen.set_not_blanked()
+
+        # Display current sensor gain
+        self.measure_screen.set_gain(self.light_sensor.gain)
+
+    def run(self):
+        while True:
+            self.step()
+            self.idle_manager.sleep()
+
+    def step(self):
+        # One pass through the main loop
+
+        # Deal with any incomming serial commands
+        self.handle_serial_command()
+
+        # Deal with any button presses
+        self.handle_button_press()
+
+        # Take kinetics sample when due 
+        self.update_kinetics()
+
+        # Sample battery when due
+        self.update_battery()
+
+        # Reload settings files when changed
+        self.update_reload()
+
+        # Step down to dimmed, blanked or sleeping when idle 
+        self.idle_manager.update(self.is_sleep_inhibited)
+
+        # Update display based on the current operating mode, no
+        # measurements are taken while sleeping.
+        if self.idle_manager.is_sleeping:
+            pass
+
+        elif self.mode == Mode.MEASURE:
+            self.update_measure_screen()
+            self.update_status_labels()
+            self.show_screen()
+
+        elif self.mode == Mode.KINETICS:
+            self.update_kinetics_screen()
+            self.update_status_labels()
+            self.show_screen()
+
+        elif self.mode == Mode.TREND:
+            try:
+                self.update_trend()
+            except LightSensorOverflow:
+                self.measure_screen.set_overflow()
+            self.update_status_labels()
+            self.show_screen()
+
+        else:
+            self.show_screen()
+
+        # Write buffered log and recording data to flash when due
+        self.data_logger.update()
+        self.recorder.update()
+
+        # Collect garbage, tracking memory use
+        self.update_memory()
+
+    def update_measure_screen(self):
+        # Get measurement and display result on measurment screen
+        try:
+            raw_values = self.raw_sensor_values
+            values = self.calc_measurement_values(raw_values)
+            if self.measurement_filter is not None:
+                # Filter follows the measured period between its samples
+                if self.filter_t is not None:
+                    self.measurement_filter.set_dt(self.sensor_t - self.filter_t)
+                self.filter_t = self.sensor_t
+                values = self.measurement_filter.update(values)
+            if self.spectrum_view:
+                self.measure_screen.set_reference(self.measurement_reference)
+            self.measure_screen.set_sample(self.batch.sample_id)
+            if self.statistics_enabled:
+                self.running_stats.update(values)
+                self.measure_screen.set_statistics(
+                        self.measurement_name,
+                        self.running_stats.mean,
+                        self.running_stats.std,
+                        self.running_stats.count,
+                        self.measurement_value_names,
+                        )
+            else:
+                self.measure_screen.set_measurement(
+                        self.measurement_name, 
+                        self.measurement_units, 
+                        values,
+                        self.measurement_value_names,
+                        self.configuration.precision,
+                        )
+            self.update_stability(raw_values, values)
+            if self.is_fit:
+                self.measure_screen.set_range_error(not self.fit_in_range)
+            self.update_logging(raw_values, values)
+            self.update_history(values)
+        except LightSensorOverflow:
+            self.measure_screen.set_overflow(self.measurement_name)
+
+    def show_screen(self):
+        if self.mode == Mode.MENU:
+            self.menu_screen.show()
+        elif self.mode in (Mode.MESSAGE, Mode.ABORT):
+            self.message_screen.show()
+        else:
+            self.measure_screen.show()
+
+
+def new_response(msg):
+    # Start a response echoing the command and the optional request id
+    rsp = OrderedDict()
+    try:
+        rsp['command'] = msg.get('command', None)
+    except AttributeError:
+        rsp['command'] = None
+        return rsp
+    if 'id' in msg:
+        rsp['id'] = msg['id']
+    return rsp
+
+
+def get_int(msg, key):
+    try:
+        return int(msg[key])
+    except KeyError:
+        raise CommandError(f'{key} missing')
+    except (ValueError, TypeError):
+        raise CommandError(f'{key} must be an integer')
+
+
+def get_float(msg, key):
+    try:
+        return float(msg[key])
+    except KeyError:
+        raise CommandError(f'{key} missing')
+    except (ValueError, TypeError):
+        raise CommandError(f'{key} must be a number')
+
+
+def channel_dict(values, convert=float):
+    values_dict = OrderedDict()
+    for name, chan in constants.STR_TO_CHANNEL.items():
+        values_dict[name] = convert(values[chan])
+    return values_dict
 
 
 
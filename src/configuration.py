@@ -2,6 +2,7 @@ import os
 import json
 import constants
 from collections import OrderedDict
+from filters import FILTER_TYPES
 from json_settings_file import JsonSettingsFile
 
 class ConfigurationError(Exception):
@@ -14,38 +15,48 @@ class Configuration(JsonSettingsFile):
     LOAD_ERROR_EXCEPTION = ConfigurationError
     ALLOWED_PRECISION = (2,3,4)
     DEFAULT_PRECISION = 2
+    DEFAULT_KINETICS_INTERVAL = 5.0
+    DEFAULT_KINETICS_CAPACITY = 120
+    MAX_KINETICS_CAPACITY = 500
+    DEFAULT_STATISTICS_CHANGE_ABS = 0.02
+    DEFAULT_STATISTICS_CHANGE_REL = 0.05
+    DEFAULT_STABILITY_WINDOW = 10
+    DEFAULT_IDLE_TIMEOUTS = {
+            'dim_timeout'   : 60.0, 
+            'blank_timeout' : 300.0,
+            'sleep_timeout' : 900.0,
+            }
+    DEFAULT_IDLE_DIM_BRIGHTNESS = 0.2
+    DEFAULT_ILLUMINATION_SETTLE_DT = 0.01
+    DEFAULT_BUTTONS_SETTINGS = {
+            'repeat_delay'  : 0.5,
+            'repeat_dt'     : 0.2,
+            'repeat_min_dt' : 0.04,
+            'repeat_accel'  : 0.8,
+            }
+    DEFAULT_ILLUMINATION_LED_CURRENT = 4
+    DEFAULT_ILLUMINATION_DARK_INTERVAL = 1
+    DEFAULT_STABILITY_STD_MAX = 0.002
+    DEFAULT_STABILITY_DRIFT_MAX = 0.004
+    DEFAULT_TREND_INTERVAL = 0.5
+    DEFAULT_TREND_RANGE = [0.0, 1.0]
+    DEFAULT_HOT_RELOAD = False
 
     def __init__(self):
         super().__init__()
 
     def check(self):
-        error_dict = {}
-        # Check gain
-        try:
-            gain_str = self.data['gain']
-        except KeyError:
-            error_msg = f'{self.FILE_TYPE} missing gain'
-            error_dict['gain'] = error_msg
-        else:
-            try:
-                gain = constants.STR_TO_GAIN[gain_str]
-            except KeyError:
-                error_msg = f'{self.FILE_TYPE} unknown gain {gain_str}'
-                error_dict['gain'] = error_msg
-
-        # Check integration time
-        try:
-            itime_str = self.data['integration_time']
-        except KeyError:
-            error_msg = f'{self.FILE_TYPE} missing integration time'
-            error_dict['integration_time'] = error_msg
-        else:
+        # Check gain, missing gain is ok (sensor default is used)
+        gain_str = self.data.get('gain', None)
+        if gain_str is not None and not gain_str in constants.STR_TO_GAIN:
+            error_msg = f'{self.FILE_TYPE} unknown gain {gain_str}'
+            self.error_dict['gain'] = error_msg
 
-            try:
-                itime = constants.STR_TO_INTEGRATION_TIME[itime_str]
-            except KeyError:
-                error_msg = f'{self.FILE_TYPE} unknown integration time {itime_str}'
-                error_dict['integration_time'] = error_msg
+        # Check integration time, missing integration time is ok
+        itime_str = self.data.get('integration_time', None)
+        if itime_str is not None and not itime_str in constants.STR_TO_INTEGRATION_TIME:
+            error_msg = f'{self.FILE_TYPE} unknown integration time {itime_str}'
+            self.error_dict['integration_time'] = error_msg
 
         # Remove configurations with errors
         for name in self.error_dict:
@@ -56,7 +67,262 @@ class Configuration(JsonSettingsFile):
         precision = self.data['precision']
         if not precision in self.ALLOWED_PRECISION: 
             error_msg = f'precision must be in {self.ALLOWED_PRECISION}'
-            error_dict['precision'] = error_msg
+            self.error_dict['precision'] = error_msg
+            self.data['precision'] = self.DEFAULT_PRECISION
+
+        # Check kinetics settings, invalid settings are replaced by defaults
+        kinetics = self.data.get('kinetics', {})
+        if type(kinetics) != dict:
+            self.error_dict['kinetics'] = f'{self.FILE_TYPE} kinetics must be dict'
+            self.data['kinetics'] = {}
+        else:
+            error_list = self.check_kinetics(kinetics)
+            if error_list:
+                self.error_dict['kinetics'] = error_list
+
+        # Check data logging interval, logging is disabled when invalid
+        if 'log_interval' in self.data:
+            try:
+                log_interval = float(self.data['log_interval'])
+            except (ValueError, TypeError):
+                log_interval = 0.0
+            if log_interval <= 0.0:
+                self.error_dict['log_interval'] = 'log_interval must be > 0'
+                del self.data['log_interval']
+
+        # Check statistics settings, invalid settings are replaced by defaults
+        statistics = self.data.get('statistics', {})
+        if type(statistics) != dict:
+            self.error_dict['statistics'] = f'{self.FILE_TYPE} statistics must be dict'
+            self.data['statistics'] = {}
+        else:
+            error_list = self.check_statistics(statistics)
+            if error_list:
+                self.error_dict['statistics'] = error_list
+
+        # Check measurement filters, invalid filters are removed
+        filters = self.data.get('filters', {})
+        if type(filters) != dict:
+            self.error_dict['filters'] = f'{self.FILE_TYPE} filters must be dict'
+            self.data['filters'] = {}
+        else:
+            error_list = self.check_filters(filters)
+            if error_list:
+                self.error_dict['filters'] = error_list
+
+        # Check button settings, invalid settings are replaced by defaults
+        buttons = self.data.get('buttons', {})
+        if type(buttons) != dict:
+            self.error_dict['buttons'] = f'{self.FILE_TYPE} buttons must be dict'
+            self.data['buttons'] = {}
+        else:
+            error_list = self.check_buttons(buttons)
+            if error_list:
+                self.error_dict['buttons'] = error_list
+
+        # Check illumination settings, invalid settings are replaced by defaults
+        illumination = self.data.get('illumination', {})
+        if type(illumination) != dict:
+            self.error_dict['illumination'] = f'{self.FILE_TYPE} illumination must be dict'
+            self.data['illumination'] = {}
+        else:
+            error_list = self.check_illumination(illumination)
+            if error_list:
+                self.error_dict['illumination'] = error_list
+
+        # Check idle settings, invalid settings are replaced by defaults
+        idle = self.data.get('idle', {})
+        if type(idle) != dict:
+            self.error_dict['idle'] = f'{self.FILE_TYPE} idle must be dict'
+            self.data['idle'] = {}
+        else:
+            error_list = self.check_idle(idle)
+            if error_list:
+                self.error_dict['idle'] = error_list
+
+        # Check stability settings, invalid settings are replaced by defaults
+        stability = self.data.get('stability', {})
+        if type(stability) != dict:
+            self.error_dict['stability'] = f'{self.FILE_TYPE} stability must be dict'
+            self.data['stability'] = {}
+        else:
+            error_list = self.check_stability(stability)
+            if error_list:
+                self.error_dict['stability'] = error_list
+
+        # Check trend plot settings, invalid settings are replaced by defaults
+        trend = self.data.get('trend', {})
+        if type(trend) != dict:
+            self.error_dict['trend'] = f'{self.FILE_TYPE} trend must be dict'
+            self.data['trend'] = {}
+        else:
+            error_list = self.check_trend(trend)
+            if error_list:
+                self.error_dict['trend'] = error_list
+
+    def check_buttons(self, buttons):
+        error_list = []
+        for key in self.DEFAULT_BUTTONS_SETTINGS:
+            value = buttons.get(key, 1.0)
+            if not type(value) in (int, float) or value <= 0.0:
+                error_list.append(f'buttons {key} must be > 0')
+                del buttons[key]
+        accel = buttons.get('repeat_accel', 1.0)
+        if accel > 1.0:
+            error_list.append('buttons repeat_accel must be <= 1')
+            del buttons['repeat_accel']
+        return error_list
+
+    def check_illumination(self, illumination):
+        error_list = []
+        settle_dt = illumination.get('settle_dt', self.DEFAULT_ILLUMINATION_SETTLE_DT)
+        if not type(settle_dt) in (int, float) or not 0.0 <= settle_dt <= 1.0:
+            error_list.append('illumination settle_dt must be in [0,1]')
+            del illumination['settle_dt']
+        led_current = illumination.get('led_current', self.DEFAULT_ILLUMINATION_LED_CURRENT)
+        if type(led_current) != int or not 4 <= led_current <= 258:
+            error_list.append('illumination led_current must be integer in 4 to 258 (mA)')
+            del illumination['led_current']
+        dark_interval = illumination.get('dark_interval', self.DEFAULT_ILLUMINATION_DARK_INTERVAL)
+        if type(dark_interval) != int or dark_interval < 1:
+            error_list.append('illumination dark_interval must be integer >= 1')
+            del illumination['dark_interval']
+        return error_list
+
+    def check_idle(self, idle):
+        # Timeouts may be null to disable that idle step
+        error_list = []
+        for key in self.DEFAULT_IDLE_TIMEOUTS:
+            value = idle.get(key, 1.0)
+            if value is not None and (not type(value) in (int, float) or value <= 0.0):
+                error_list.append(f'idle {key} must be > 0 or null')
+                del idle[key]
+        brightness = idle.get('dim_brightness', self.DEFAULT_IDLE_DIM_BRIGHTNESS)
+        if not type(brightness) in (int, float) or not 0.0 <= brightness <= 1.0:
+            error_list.append('idle dim_brightness must be in [0,1]')
+            del idle['dim_brightness']
+        return error_list
+
+    def check_filters(self, filters):
+        # Filter settings keyed by measurement name or 'default' 
+        error_list = []
+        for name in list(filters):
+            settings = filters[name]
+            if type(settings) != dict:
+                error_list.append(f'filter {name} must be dict')
+                del filters[name]
+                continue
+            filter_type = settings.get('type', 'none')
+            if not filter_type in FILTER_TYPES:
+                error_list.append(f'filter {name} unknown type {filter_type}')
+                del filters[name]
+                continue
+            alpha = settings.get('alpha', 0.5)
+            if not type(alpha) in (int, float) or not 0.0 < alpha <= 1.0:
+                error_list.append(f'filter {name} alpha must be in (0,1]')
+                del filters[name]
+                continue
+            window = settings.get('window', 5)
+            if type(window) != int or window < 1:
+                error_list.append(f'filter {name} window must be integer >= 1')
+                del filters[name]
+                continue
+            freq_cutoff = settings.get('freq_cutoff', 1.0)
+            freq_nyquist = 0.5/constants.LOOP_DT
+            if not type(freq_cutoff) in (int, float) or not 0.0 < freq_cutoff < freq_nyquist:
+                error_list.append(f'filter {name} freq_cutoff must be in (0,{freq_nyquist})')
+                del filters[name]
+                continue
+            q = settings.get('q', 0.7071)
+            if not type(q) in (int, float) or q <= 0.0:
+                error_list.append(f'filter {name} q must be > 0')
+                del filters[name]
+        return error_list
+
+    def check_stability(self, stability):
+        error_list = []
+        chan_strs = stability.get('channels', list(constants.STR_TO_CHANNEL))
+        if type(chan_strs) != list or not chan_strs:
+            error_list.append('stability channels must be non-empty list')
+            del stability['channels']
+        else:
+            for chan_str in chan_strs:
+                if not chan_str in constants.STR_TO_CHANNEL:
+                    error_list.append(f'stability unknown channel {chan_str}')
+                    del stability['channels']
+                    break
+        window = stability.get('window', self.DEFAULT_STABILITY_WINDOW)
+        if type(window) != int or window < 4:
+            error_list.append('stability window must be integer >= 4')
+            del stability['window']
+        for key in ('std_max', 'drift_max'):
+            value = stability.get(key, 1.0)
+            if not type(value) in (int, float) or value <= 0.0:
+                error_list.append(f'stability {key} must be > 0')
+                del stability[key]
+        return error_list
+
+    def check_statistics(self, statistics):
+        error_list = []
+        window = statistics.get('window', None)
+        if window is not None:
+            if type(window) != int or window < 2:
+                error_list.append('statistics window must be integer >= 2')
+                del statistics['window']
+        forgetting = statistics.get('forgetting', None)
+        if forgetting is not None:
+            if not type(forgetting) in (int, float) or not 0.0 < forgetting < 1.0:
+                error_list.append('statistics forgetting must be in (0,1)')
+                del statistics['forgetting']
+        for key in ('change_abs', 'change_rel'):
+            value = statistics.get(key, 0.0)
+            if not type(value) in (int, float) or value < 0.0:
+                error_list.append(f'statistics {key} must be >= 0')
+                del statistics[key]
+        return error_list
+
+    def check_kinetics(self, kinetics):
+        error_list = []
+        chan_strs = kinetics.get('channels', list(constants.STR_TO_CHANNEL))
+        if type(chan_strs) != list or not chan_strs:
+            error_list.append('kinetics channels must be non-empty list')
+            del kinetics['channels']
+        else:
+            for chan_str in chan_strs:
+                if not chan_str in constants.STR_TO_CHANNEL:
+                    error_list.append(f'kinetics unknown channel {chan_str}')
+                    del kinetics['channels']
+                    break
+        try:
+            interval = float(kinetics.get('interval', self.DEFAULT_KINETICS_INTERVAL))
+        except (ValueError, TypeError):
+            interval = 0.0 
+        if interval <= 0.0:
+            error_list.append('kinetics interval must be > 0')
+            del kinetics['interval']
+        capacity = kinetics.get('capacity', self.DEFAULT_KINETICS_CAPACITY)
+        if type(capacity) != int or not capacity in range(2, self.MAX_KINETICS_CAPACITY+1):
+            error_list.append(f'kinetics capacity must be in 2 to {self.MAX_KINETICS_CAPACITY}')
+            del kinetics['capacity']
+        return error_list
+
+    def check_trend(self, trend):
+        error_list = []
+        chan_str = trend.get('channel', None)
+        if chan_str is not None and not chan_str in constants.STR_TO_CHANNEL:
+            error_list.append(f'trend unknown channel {chan_str}')
+            del trend['channel']
+        interval = trend.get('interval', self.DEFAULT_TREND_INTERVAL)
+        if not type(interval) in (int, float) or interval <= 0.0:
+            error_list.append('trend interval must be > 0')
+            del trend['interval']
+        y_range = trend.get('range', self.DEFAULT_TREND_RANGE)
+        range_ok = type(y_range) == list and len(y_range) == 2
+        range_ok = range_ok and all([type(v) in (int, float) for v in y_range])
+        if not range_ok or y_range[0] >= y_range[1]:
+            error_list.append('trend range must be [min, max] with min < max')
+            del trend['range']
+        return error_list
 
     @property
     def integration_time(self):
@@ -86,6 +352,118 @@ class Configuration(JsonSettingsFile):
     def precision(self):
         return self.data['precision']
 
+    @property
+    def log_interval(self):
+        log_interval = self.data.get('log_interval', None)
+        if log_interval is not None:
+            log_interval = float(log_interval)
+        return log_interval
+
+    @property
+    def statistics_enabled(self):
+        return bool(self.data.get('statistics', {}).get('enabled', False))
+
+    @property
+    def statistics_settings(self):
+        statistics = self.data.get('statistics', {})
+        return {
+                'window'     : statistics.get('window', None),
+                'forgetting' : statistics.get('forgetting', None),
+                'change_abs' : statistics.get('change_abs', self.DEFAULT_STATISTICS_CHANGE_ABS),
+                'change_rel' : statistics.get('change_rel', self.DEFAULT_STATISTICS_CHANGE_REL),
+                }
+
+    @property
+    def hot_reload(self):
+        return bool(self.data.get('hot_reload', self.DEFAULT_HOT_RELOAD))
+
+    @property
+    def buttons_settings(self):
+        buttons = self.data.get('buttons', {})
+        settings = {}
+        for key, default in self.DEFAULT_BUTTONS_SETTINGS.items():
+            settings[key] = buttons.get(key, default)
+        return settings
+
+    @property
+    def illumination_enabled(self):
+        return bool(self.data.get('illumination', {}).get('enabled', False))
+
+    @property
+    def illumination_settings(self):
+        illumination = self.data.get('illumination', {})
+        return {
+                'settle_dt'     : illumination.get(
+                    'settle_dt', self.DEFAULT_ILLUMINATION_SETTLE_DT),
+                'led_current'   : illumination.get(
+                    'led_current', self.DEFAULT_ILLUMINATION_LED_CURRENT),
+                'dark_frame'    : bool(illumination.get('dark_frame', True)),
+                'dark_interval' : illumination.get(
+                    'dark_interval', self.DEFAULT_ILLUMINATION_DARK_INTERVAL),
+                }
+
+    @property
+    def idle_settings(self):
+        idle = self.data.get('idle', {})
+        settings = {}
+        for key, default in self.DEFAULT_IDLE_TIMEOUTS.items():
+            settings[key] = idle.get(key, default)
+        settings['dim_brightness'] = idle.get(
+                'dim_brightness', 
+                self.DEFAULT_IDLE_DIM_BRIGHTNESS
+                )
+        return settings
+
+    def filter_settings(self, name):
+        filters = self.data.get('filters', {})
+        return filters.get(name, filters.get('default', {}))
+
+    @property
+    def stability_enabled(self):
+        return bool(self.data.get('stability', {}).get('enabled', False))
+
+    @property
+    def stability_channels(self):
+        stability = self.data.get('stability', {})
+        chan_strs = stability.get('channels', constants.STR_TO_CHANNEL)
+        return [constants.STR_TO_CHANNEL[chan_str] for chan_str in chan_strs]
+
+    @property
+    def stability_settings(self):
+        stability = self.data.get('stability', {})
+        return {
+                'window'    : stability.get('window', self.DEFAULT_STABILITY_WINDOW),
+                'std_max'   : stability.get('std_max', self.DEFAULT_STABILITY_STD_MAX),
+                'drift_max' : stability.get('drift_max', self.DEFAULT_STABILITY_DRIFT_MAX),
+                }
+
+    @property
+    def trend_settings(self):
+        trend = self.data.get('trend', {})
+        y_range = trend.get('range', self.DEFAULT_TREND_RANGE)
+        return {
+                'channel'  : trend.get('channel', None),
+                'interval' : float(trend.get('interval', self.DEFAULT_TREND_INTERVAL)),
+                'y_min'    : float(y_range[0]),
+                'y_max'    : float(y_range[1]),
+                }
+
+    @property
+    def kinetics_channels(self):
+        kinetics = self.data.get('kinetics', {})
+        chan_strs = kinetics.get('channels', constants.STR_TO_CHANNEL)
+        return [constants.STR_TO_CHANNEL[chan_str] for chan_str in chan_strs]
+
+    @property
+    def kinetics_interval(self):
+        kinetics = self.data.get('kinetics', {})
+        return float(kinetics.get('interval', self.DEFAULT_KINETICS_INTERVAL))
+
+    @property
+    def kinetics_capacity(self):
+        kinetics = self.data.get('kinetics', {})
+        return kinetics.get('capacity', self.DEFAULT_KINETICS_CAPACITY)
+
 
 
 
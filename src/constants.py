@@ -9,10 +9,78 @@ CONFIGURATION_FILE = 'configuration.json'
 SPLASHSCREEN_BMP = 'assets/splashscreen.bmp'
 
 LOOP_DT = 0.1
+IDLE_DIM_LOOP_DT = 0.25
+IDLE_BLANK_LOOP_DT = 1.0
+IDLE_SLEEP_DT = 1.0
+IDLE_SLEEP_POLL_DT = 0.1
+# Pins which wake the device from light sleep when pulled low. The buttons
+# are read through a shift register so they can't be used as pin alarms and
+# sleep polls every IDLE_SLEEP_POLL_DT instead, set for boards with buttons
+# wired directly to pins, e.g. (board.BUTTON_A,).
+IDLE_WAKE_PINS = ()
 BLANK_DT = 0.05
-DEBOUNCE_DT = 0.7 
+BUTTON_SCAN_DT = 0.02
+BUTTON_DEBOUNCE_DT = 0.15
+BUTTON_MAX_EVENTS = 64
 NUM_BLANK_SAMPLES = 5 
+MAX_READ_SAMPLES = 50
+MAX_READ_INTERVAL = 5.0
+READ_REDUCE_TYPES = ('none', 'mean', 'median', 'stats')
+COMMAND_QUEUE_SIZE = 8
 BATTERY_AIN_PIN = board.A6
+BATTERY_DT = 2.0
+BATTERY_NUM_SAMPLES = 16
+BATTERY_NUM_SETTLE = 5
+BATTERY_LOW_SOC = 10
+BATTERY_LOW_HYSTERESIS = 5
+
+# Single cell lipo (voltage, state of charge %), voltage increasing
+BATTERY_SOC_TABLE = (
+        (3.27,   0),
+        (3.61,   5),
+        (3.69,  10),
+        (3.73,  20),
+        (3.77,  30),
+        (3.80,  40),
+        (3.84,  50),
+        (3.87,  60),
+        (3.95,  70),
+        (4.02,  80),
+        (4.11,  90),
+        (4.20, 100),
+        )
+
+# Optional led drivers by name, leds not listed here (e.g. calibration led 
+# names) use the led driver on the AS7341. Example: {'red': board.D5}
+LED_PINS = collections.OrderedDict([])
+
+RELOAD_CHECK_DT = 2.0
+MEM_LOW_FREE = 16*1024
+MEM_LOW_HYSTERESIS = 4*1024
+MENU_MRU_SIZE = 3
+MENU_MRU_MIN_ITEMS = 10
+
+LOG_DIR = 'logs'
+LOG_FILE = 'log.csv'
+LOG_BUFFER_SIZE = 4096
+LOG_FLUSH_DT = 60.0
+LOG_MAX_FILE_SIZE = 256*1024
+LOG_NUM_FILES = 4
+LOG_CHUNK_SIZE = 1024
+RECORD_FILE = 'record.bin'
+RECORD_BUFFER_SIZE = 4096
+
+CALIBRATION_NUM_SAMPLES = 20
+CALIBRATION_SAMPLE_DT = 0.05
+CALIBRATION_MAX_STANDARDS = 20
+CALIBRATION_MAX_DEGREE = 3
+
+BATCH_FILE = 'batch.json'
+BATCH_CAPACITY = 96
+
+HISTORY_CAPACITY = 120
+HISTORY_DT = 1.0
+HISTORY_MAX_RECORDS = 20
 
 BUTTON = { 
         'none'  : 0b00000000,
@@ -25,6 +93,7 @@ BUTTON = {
         'itime' : 0b00000010,
         'gain'  : 0b00000001,
         }
+BUTTON_REPEAT = ('up', 'down')
 
 COLOR_TO_RGB = collections.OrderedDict([ 
     ('black'  , 0x000000), 
@@ -55,7 +124,14 @@ STR_TO_GAIN = collections.OrderedDict([
 
 GAIN_TO_STR = collections.OrderedDict(((v,k) for k,v in STR_TO_GAIN.items()))
 
-STR_TO_INTEGRATION_TIME = collections.OrderedDict([])
+# Integration time = (atime+1)*(astep+1)*2.78us, values are (atime, astep)
+STR_TO_INTEGRATION_TIME = collections.OrderedDict([
+    ('25ms',  (14, 599)),
+    ('50ms',  (29, 599)),
+    ('100ms', (59, 599)),
+    ('200ms', (119, 599)),
+    ('280ms', (100, 999)),
+    ])
 INTEGRATION_TIME_TO_STR = \
     collections.OrderedDict(((v,k) for k,v in STR_TO_INTEGRATION_TIME.items()))
 
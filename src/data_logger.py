@@ -0,0 +1,130 @@
+import os
+import clock
+import constants
+
+
+class DataLogger:
+
+    HEADER = 'time,measurement,gain,{raw},{values}\n'
+
+    def __init__(self):
+        # Records are collected in a preallocated RAM buffer and written to
+        # flash in one block when it fills or after LOG_FLUSH_DT seconds.
+        self.buffer = bytearray(constants.LOG_BUFFER_SIZE)
+        self.buffer_view = memoryview(self.buffer)
+        self.buffer_len = 0
+        self.last_flush_t = clock.monotonic()
+        self.file_size = None
+        self.error = None
+        self.num_dropped = 0
+
+    @property
+    def enabled(self):
+        return self.error is None
+
+    @property
+    def file_path(self):
+        return f'{constants.LOG_DIR}/{constants.LOG_FILE}'
+
+    @property
+    def header(self):
+        chans = constants.STR_TO_CHANNEL
+        raw = ','.join([f'raw_{c}' for c in chans])
+        values = ','.join([f'value_{c}' for c in chans])
+        return self.HEADER.format(raw=raw, values=values)
+
+    def append(self, t, name, gain, raw_values, values):
+        if not self.enabled:
+            return
+        name = name.replace(',', ';')
+        gain_str = constants.GAIN_TO_STR.get(gain, '')
+        raw_str = ','.join([f'{int(v)}' for v in raw_values])
+        values_str = ','.join([f'{v:1.6g}' for v in values])
+        record = f'{t:1.3f},{name},{gain_str},{raw_str},{values_str}\n'.encode()
+        if self.buffer_len + len(record) > len(self.buffer):
+            self.flush()
+        if len(record) > len(self.buffer):
+            self.num_dropped += 1
+            return
+        n0 = self.buffer_len
+        n1 = n0 + len(record)
+        self.buffer_view[n0:n1] = record
+        self.buffer_len = n1
+
+    def update(self):
+        if self.buffer_len == 0:
+            return
+        if clock.monotonic() - self.last_flush_t >= constants.LOG_FLUSH_DT:
+            self.flush()
+
+    def flush(self):
+        self.last_flush_t = clock.monotonic()
+        if self.buffer_len == 0 or not self.enabled:
+            return
+        try:
+            self.setup_file()
+            with open(self.file_path, 'ab') as f:
+                if self.file_size == 0:
+                    header = self.header.encode()
+                    f.write(header)
+                    self.file_size += len(header)
+                f.write(self.buffer_view[:self.buffer_len])
+            self.file_size += self.buffer_len
+        except OSError as error:
+            # Most likely CIRCUITPY is read only, see boot.py
+            self.error = f'unable to write log ({error})'
+            self.num_dropped += 1
+        self.buffer_len = 0
+
+    def setup_file(self):
+        if not constants.LOG_DIR in os.listdir():
+            os.mkdir(constants.LOG_DIR)
+        if self.file_size is None:
+            self.file_size = self.get_file_size(constants.LOG_FILE)
+        if self.file_size >= constants.LOG_MAX_FILE_SIZE:
+            self.rotate()
+
+    def rotate(self):
+        # log.csv -> log1.csv -> log2.csv ... dropping the oldest file
+        num_files = constants.LOG_NUM_FILES
+        file_list = self.file_list()
+        for i in range(num_files-1, -1, -1):
+            src = self.rotated_name(i)
+            if not src in file_list:
+                continue
+            if i == num_files-1:
+                os.remove(f'{constants.LOG_DIR}/{src}')
+            else:
+                dst = self.rotated_name(i+1)
+                os.rename(f'{constants.LOG_DIR}/{src}', f'{constants.LOG_DIR}/{dst}')
+        self.file_size = 0
+
+    def rotated_name(self, num):
+        if num == 0:
+            return constants.LOG_FILE
+        base, ext = constants.LOG_FILE.split('.')
+        return f'{base}{num}.{ext}'
+
+    def file_list(self):
+        try:
+            return sorted(os.listdir(constants.LOG_DIR))
+        except OSError:
+            return []
+
+    def get_file_size(self, name):
+        try:
+            return os.stat(f'{constants.LOG_DIR}/{name}')[6]
+        except OSError:
+            return 0
+
+    def read_chunk(self, name, offset, size):
+        # Read part of a log file for transfer over serial. Returns the data
+        # and whether the end of the file was reached.
+        if not name in self.file_list():
+            raise OSError(f'no log file {name}')
+        size = min(size, constants.LOG_CHUNK_SIZE)
+        with open(f'{constants.LOG_DIR}/{name}', 'rb') as f:
+            f.seek(offset)
+            data = f.read(size)
+        eof = offset + len(data) >= self.get_file_size(name)
+        return data, eof
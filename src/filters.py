@@ -0,0 +1,230 @@
+import math
+import ulab
+
+# Streaming filters. The vector filters work on ulab arrays of length num in
+# place, their state is allocated once on creation and update returns the
+# filter's own value array (which changes on the next update).
+#
+# ema, moving_average and moving_median work per sample, their time span is
+# alpha or window times the sample period. one_pole and two_pole are designed
+# in Hz for a sample period dt and follow the measured period given to
+# set_dt, which on the device is longer than the loop dt (sensor reads, idle).
+
+FILTER_TYPES = ('none', 'ema', 'moving_average', 'moving_median', 'one_pole', 'two_pole')
+
+
+class LowpassFilter:
+
+    def __init__(self, freq_cutoff=1.0, value=0.0, dt=1.0):
+        self.dt = dt
+        self.value = value
+        self.freq_cutoff = freq_cutoff
+
+    @property
+    def freq_cutoff(self):
+        return self._alpha/((1.0-self._alpha)*2.0*math.pi*self.dt)
+
+    @freq_cutoff.setter
+    def freq_cutoff(self, freq):
+        self._alpha = (2.0*math.pi*self.dt*freq)/(2.0*math.pi*self.dt*freq+1)
+
+    def update(self, new_value):
+        self.value = self._alpha*new_value + (1.0-self._alpha)*self.value
+
+
+class EmaFilter:
+
+    def __init__(self, num, alpha=0.5):
+        self.alpha = alpha
+        self.value = ulab.numpy.zeros((num,))
+        self.delta = ulab.numpy.zeros((num,))
+        self.count = 0
+
+    def reset(self):
+        self.count = 0
+
+    def set_dt(self, dt):
+        pass
+
+    def update(self, values):
+        if self.count == 0:
+            self.value[:] = values
+        else:
+            # value += alpha*(values - value)
+            self.delta[:] = values
+            self.delta -= self.value
+            self.delta *= self.alpha
+            self.value += self.delta
+        self.count += 1
+        return self.value
+
+
+class MovingAverageFilter:
+
+    def __init__(self, num, window=5):
+        self.window = window
+        self.buffer = ulab.numpy.zeros((window, num))
+        self.total = ulab.numpy.zeros((num,))
+        self.value = ulab.numpy.zeros((num,))
+        self.reset()
+
+    def reset(self):
+        self.pos = 0
+        self.count = 0
+        self.total[:] = 0.0
+
+    def set_dt(self, dt):
+        pass
+
+    def update(self, values):
+        if self.count == self.window:
+            self.total -= self.buffer[self.pos,:]
+        self.buffer[self.pos,:] = values
+        self.total += values
+        self.pos = (self.pos + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        if self.pos == 0:
+            # Recompute the sum once per wrap so rounding errors don't build up
+            self.total[:] = ulab.numpy.sum(self.buffer, axis=0)
+        self.value[:] = self.total
+        self.value /= self.count
+        return self.value
+
+
+class MovingMedianFilter:
+
+    def __init__(self, num, window=5):
+        self.window = window
+        self.buffer = ulab.numpy.zeros((window, num))
+        self.value = ulab.numpy.zeros((num,))
+        self.reset()
+
+    def reset(self):
+        self.pos = 0
+        self.count = 0
+
+    def set_dt(self, dt):
+        pass
+
+    def update(self, values):
+        self.buffer[self.pos,:] = values
+        self.pos = (self.pos + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        if self.count < self.window:
+            self.value[:] = ulab.numpy.median(self.buffer[:self.count,:], axis=0)
+        else:
+            self.value[:] = ulab.numpy.median(self.buffer, axis=0)
+        return self.value
+
+
+class IirFilter:
+
+    # Smoothing of the measured sample period, relative change of the period
+    # before the coefficients are redesigned and the ratio above which an
+    # interval is a gap (menus, blanking) rather than the period.
+    DT_ALPHA = 0.2
+    DT_TOLERANCE = 0.1
+    DT_GAP_RATIO = 4.0
+
+    def __init__(self, num, coeffs, dt):
+        # Second order section y = (b0 + b1 z^-1 + b2 z^-2)/(1 + a1 z^-1 + a2 z^-2) x
+        # in transposed direct form II, a one pole filter has b2 = a2 = 0.
+        # coeffs(dt) returns the (b, a) coefficients for sample period dt.
+        self.coeffs = coeffs
+        self.dt = dt
+        self.dt_mean = None
+        self.set_coeffs(*coeffs(dt))
+        self.value = ulab.numpy.zeros((num,))
+        self.z1 = ulab.numpy.zeros((num,))
+        self.z2 = ulab.numpy.zeros((num,))
+        self.tmp = ulab.numpy.zeros((num,))
+        self.count = 0
+
+    def reset(self):
+        self.count = 0
+
+    def set_coeffs(self, b, a):
+        self.b0, self.b1, self.b2 = b
+        self.a1, self.a2 = a
+
+    def set_dt(self, dt):
+        # Measured time since the previous sample, the state is kept when the
+        # coefficients change so the output doesn't jump.
+        if dt <= 0.0:
+            return
+        if self.dt_mean is None:
+            self.dt_mean = dt
+        elif dt > self.DT_GAP_RATIO*self.dt_mean:
+            return
+        else:
+            self.dt_mean += self.DT_ALPHA*(dt - self.dt_mean)
+        if abs(self.dt_mean - self.dt) > self.DT_TOLERANCE*self.dt:
+            self.dt = self.dt_mean
+            self.set_coeffs(*self.coeffs(self.dt))
+
+    def update(self, values):
+        if self.count == 0:
+            # Start from the steady state for the first input (unity dc gain)
+            self.z2[:] = values
+            self.z2 *= self.b2 - self.a2
+            self.z1[:] = values
+            self.z1 *= 1.0 - self.b0
+        # y = b0*x + z1
+        self.value[:] = values
+        self.value *= self.b0
+        self.value += self.z1
+        # z1 = b1*x - a1*y + z2
+        self.z1[:] = values
+        self.z1 *= self.b1
+        self.tmp[:] = self.value
+        self.tmp *= self.a1
+        self.z1 -= self.tmp
+        self.z1 += self.z2
+        # z2 = b2*x - a2*y
+        self.z2[:] = values
+        self.z2 *= self.b2
+        self.tmp[:] = self.value
+        self.tmp *= self.a2
+        self.z2 -= self.tmp
+        self.count += 1
+        return self.value
+
+
+def one_pole_coeffs(freq_cutoff, dt):
+    alpha = 1.0 - math.exp(-2.0*math.pi*freq_cutoff*dt)
+    return (alpha, 0.0, 0.0), (alpha - 1.0, 0.0)
+
+
+def two_pole_coeffs(freq_cutoff, dt, q=0.7071):
+    # Lowpass biquad from the bilinear transform, a cutoff at or above the
+    # Nyquist frequency of a slow sample period is held just below it.
+    w0 = min(2.0*math.pi*freq_cutoff*dt, 0.9*math.pi)
+    cos_w0 = math.cos(w0)
+    alpha = math.sin(w0)/(2.0*q)
+    a0 = 1.0 + alpha
+    b0 = 0.5*(1.0 - cos_w0)/a0
+    b1 = (1.0 - cos_w0)/a0
+    a1 = -2.0*cos_w0/a0
+    a2 = (1.0 - alpha)/a0
+    return (b0, b1, b0), (a1, a2)
+
+
+def create_filter(num, settings, dt):
+    # Returns filter for settings dict from the configuration or None. dt is
+    # the nominal sample period, one_pole and two_pole are designed for it
+    # until set_dt gives them the measured one.
+    filter_type = settings.get('type', 'none')
+    if filter_type == 'ema':
+        return EmaFilter(num, settings.get('alpha', 0.5))
+    elif filter_type == 'moving_average':
+        return MovingAverageFilter(num, settings.get('window', 5))
+    elif filter_type == 'moving_median':
+        return MovingMedianFilter(num, settings.get('window', 5))
+    elif filter_type == 'one_pole':
+        freq_cutoff = settings.get('freq_cutoff', 1.0)
+        return IirFilter(num, lambda dt: one_pole_coeffs(freq_cutoff, dt), dt)
+    elif filter_type == 'two_pole':
+        freq_cutoff = settings.get('freq_cutoff', 1.0)
+        q = settings.get('q', 0.7071)
+        return IirFilter(num, lambda dt: two_pole_coeffs(freq_cutoff, dt, q), dt)
+    return None
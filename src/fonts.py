@@ -1,6 +1,8 @@
 from adafruit_bitmap_font import bitmap_font
+from mem_profile import profile as mem_profile
 
 fontname = 'Hack-Bold'
-font_8pt = bitmap_font.load_font(f'/assets/{fontname}-8.pcf')
-#font_14pt = bitmap_font.load_font(f'/assets/{fontname}-14.pcf')
-#font_10pt = bitmap_font.load_font(f'/assets/{fontname}-10.pcf')
+with mem_profile.region('fonts'):
+    font_8pt = bitmap_font.load_font(f'assets/{fontname}-8.pcf')
+#font_14pt = bitmap_font.load_font(f'assets/{fontname}-14.pcf')
+#font_10pt = bitmap_font.load_font(f'assets/{fontname}-10.pcf')
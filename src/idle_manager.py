@@ -0,0 +1,108 @@
+import clock
+import board
+import constants
+import supervisor
+
+try:
+    import alarm
+except ImportError:
+    alarm = None
+
+
+class IdleState:
+    ACTIVE = 0
+    DIM = 1
+    BLANK = 2
+    SLEEP = 3
+
+
+class IdleManager:
+
+    STATE_TO_LOOP_DT = {
+            IdleState.ACTIVE : constants.LOOP_DT,
+            IdleState.DIM    : constants.IDLE_DIM_LOOP_DT,
+            IdleState.BLANK  : constants.IDLE_BLANK_LOOP_DT,
+            IdleState.SLEEP  : constants.IDLE_SLEEP_DT,
+            }
+
+    def __init__(self, dim_timeout=None, blank_timeout=None, sleep_timeout=None,
+            dim_brightness=0.2, wake_pins=constants.IDLE_WAKE_PINS):
+        # Steps down from active to dimmed, blanked and light sleep after the
+        # given times (s) without button presses or serial messages. A
+        # timeout of None disables that step.
+        self.dim_timeout = dim_timeout
+        self.blank_timeout = blank_timeout
+        self.sleep_timeout = sleep_timeout
+        self.dim_brightness = dim_brightness
+        self.wake_pins = tuple(wake_pins)
+        self.state = IdleState.ACTIVE
+        self.last_activity_t = clock.monotonic()
+
+    @property
+    def is_active(self):
+        return self.state == IdleState.ACTIVE
+
+    @property
+    def is_display_on(self):
+        return self.state < IdleState.BLANK
+
+    @property
+    def is_sleeping(self):
+        return self.state == IdleState.SLEEP
+
+    @property
+    def loop_dt(self):
+        return self.STATE_TO_LOOP_DT[self.state]
+
+    def activity(self):
+        # Returns True if this woke the device up from an idle state
+        self.last_activity_t = clock.monotonic()
+        if self.is_active:
+            return False
+        self.set_state(IdleState.ACTIVE)
+        return True
+
+    def update(self, inhibit_sleep=False):
+        idle_dt = clock.monotonic() - self.last_activity_t
+        state = IdleState.ACTIVE
+        if self.dim_timeout is not None and idle_dt >= self.dim_timeout:
+            state = IdleState.DIM
+        if self.blank_timeout is not None and idle_dt >= self.blank_timeout:
+            state = IdleState.BLANK
+        if self.sleep_timeout is not None and idle_dt >= self.sleep_timeout:
+            if not inhibit_sleep:
+                state = IdleState.SLEEP
+        if state != self.state:
+            self.set_state(state)
+
+    def set_state(self, state):
+        self.state = state
+        if state == IdleState.ACTIVE:
+            board.DISPLAY.brightness = 1.0
+        elif state == IdleState.DIM:
+            board.DISPLAY.brightness = self.dim_brightness
+        else:
+            board.DISPLAY.brightness = 0.0
+        # No display refreshes while the display is off
+        board.DISPLAY.auto_refresh = self.is_display_on
+
+    def sleep(self):
+        """ Waits for the next pass of the main loop, in light sleep when
+        sleeping and the alarm module is available.
+
+        Light sleep wakes on a TimeAlarm after IDLE_SLEEP_DT or on a PinAlarm
+        for any of the wake pins (pulled low). The shift register buttons and
+        the USB serial port can't raise alarms, so when there are no wake pins
+        or USB is connected the sleep is cut to IDLE_SLEEP_POLL_DT, so button
+        presses and serial commands are seen within that time.
+        """
+        dt = self.loop_dt
+        if self.is_sleeping and alarm is not None and not clock.is_virtual():
+            if supervisor.runtime.usb_connected or not self.wake_pins:
+                dt = min(dt, constants.IDLE_SLEEP_POLL_DT)
+            alarms = [alarm.time.TimeAlarm(monotonic_time=clock.monotonic() + dt)]
+            for pin in self.wake_pins:
+                alarms.append(alarm.pin.PinAlarm(pin, value=False, pull=True))
+            alarm.light_sleep_until_alarms(*alarms)
+        else:
+            clock.sleep(dt)
@@ -0,0 +1,89 @@
+import clock
+import ulab
+import digitalio
+import constants
+
+
+class SensorLed:
+
+    def __init__(self, light_sensor, current):
+        # Led driven by the AS7341 LDR pin
+        self.light_sensor = light_sensor
+        self.light_sensor.led_current = current
+        self.off()
+
+    def on(self):
+        self.light_sensor.led = True
+
+    def off(self):
+        self.light_sensor.led = False
+
+
+class PinLed:
+
+    def __init__(self, pin):
+        self.io = digitalio.DigitalInOut(pin)
+        self.io.direction = digitalio.Direction.OUTPUT
+        self.off()
+
+    def on(self):
+        self.io.value = True
+
+    def off(self):
+        self.io.value = False
+
+
+class Illumination:
+
+    def __init__(self, light_sensor, settle_dt=0.01, led_current=4,
+            dark_frame=True, dark_interval=1):
+        # Turns the led on only while the sensor integrates. A dark frame is
+        # read with the led off every dark_interval light frames and
+        # subtracted from the light frames which removes stray light.
+        self.light_sensor = light_sensor
+        self.settle_dt = settle_dt
+        self.dark_frame = dark_frame
+        self.dark_interval = dark_interval
+        self.light = ulab.numpy.zeros((constants.NUM_CHANNEL,))
+        self.dark = ulab.numpy.zeros((constants.NUM_CHANNEL,))
+        self.num_since_dark = None
+        self.dark_settings = None
+        self.light_t = None
+        self.leds = {name: PinLed(pin) for name, pin in constants.LED_PINS.items()}
+        self.sensor_led = SensorLed(light_sensor, led_current)
+        self.led = self.sensor_led
+        self.led_name = None
+
+    def select_led(self, name):
+        # Switch to the led for a calibration, None selects the default
+        self.led.off()
+        self.led = self.leds.get(name, self.sensor_led)
+        self.led_name = name
+        self.num_since_dark = None
+
+    def read(self):
+        # Returns dark corrected light frame. The returned array is reused on
+        # the next read. With dark frames a read takes up to two sensor
+        # frames, light_t is the time the light frame started.
+        if self.dark_frame:
+            # New dark frame when due or when gain/integration time changed
+            settings = (self.light_sensor.gain, self.light_sensor.integration_time)
+            if settings != self.dark_settings:
+                self.num_since_dark = None
+            if self.num_since_dark is None or self.num_since_dark >= self.dark_interval:
+                self.dark[:] = self.light_sensor.raw_values
+                self.dark_settings = settings
+                self.num_since_dark = 0
+            self.num_since_dark += 1
+        self.led.on()
+        try:
+            if self.settle_dt > 0:
+                clock.sleep(self.settle_dt)
+            self.light_t = clock.monotonic()
+            self.light[:] = self.light_sensor.raw_values
+        finally:
+            self.led.off()
+        if self.dark_frame:
+            self.light -= self.dark
+            self.light[:] = ulab.numpy.maximum(self.light, 0.0)
+        return self.light
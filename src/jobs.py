@@ -0,0 +1,39 @@
+import clock
+
+# Jobs are generators used for operations which span several passes through
+# the main loop. A job yields the time at which it wants to be resumed (or
+# None to be resumed on the next pass) and returns its result when done.
+
+def _job_type():
+    yield
+
+JobType = type(_job_type())
+
+
+def is_job(obj):
+    return type(obj) == JobType
+
+
+def step_job(job):
+    # Advance job by one step. Returns (done, value) where value is the
+    # resume time while running and the job's result once done.
+    try:
+        resume_t = next(job)
+    except StopIteration as stop:
+        if stop.args:
+            return True, stop.args[0]
+        else:
+            return True, None
+    return False, resume_t
+
+
+def run_job(job):
+    # Run job to completion, sleeping until each requested resume time.
+    while True:
+        done, value = step_job(job)
+        if done:
+            return value
+        if value is not None:
+            dt = value - clock.monotonic()
+            if dt > 0:
+                clock.sleep(dt)
@@ -15,6 +15,7 @@ class JsonSettingsFile:
     def __init__(self):
         self.data = {}
         self.error_dict = OrderedDict()
+        self.stat = None
 
     @property
     def has_errors(self):
@@ -34,23 +35,79 @@ class JsonSettingsFile:
             error_msg = None
         return error_msg
 
+    def pop_errors(self):
+        error_list = []
+        while self.has_errors:
+            error_list.append(self.pop_error())
+        return error_list
+
+    def file_stat(self):
+        # File size and modification time, None when there is no file
+        try:
+            stat = os.stat(self.FILE_NAME)
+        except OSError:
+            return None
+        return stat[6], stat[8]
+
+    def is_changed(self):
+        return self.file_stat() != self.stat
+
+    @property
+    def backup_file_name(self):
+        return f'{self.FILE_NAME}.bak'
+
+    @property
+    def temp_file_name(self):
+        return f'{self.FILE_NAME}.tmp'
+
+    def restore_backup(self):
+        # A reset part way through write_file can leave only the backup
+        files = os.listdir()
+        if not self.FILE_NAME in files and self.backup_file_name in files:
+            try:
+                os.rename(self.backup_file_name, self.FILE_NAME)
+            except OSError:
+                pass
+
+    def read_file(self):
+        # Returns the file contents as written, without any checking
+        try:
+            with open(self.FILE_NAME, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            error_msg = f'unable to read {self.FILE_TYPE} file'
+            raise self.LOAD_ERROR_EXCEPTION(error_msg)
+        if type(data) != dict:
+            error_msg = f'{self.FILE_TYPE} file incorrect format'
+            raise self.LOAD_ERROR_EXCEPTION(error_msg)
+        return data
+
+    def write_file(self, data):
+        # Write to a temporary file and swap it in, the old file is kept as
+        # a backup until the new one is in place so a reset never leaves a
+        # truncated settings file. Raises OSError if CIRCUITPY is read only.
+        with open(self.temp_file_name, 'w') as f:
+            json.dump(data, f)
+        files = os.listdir()
+        if self.backup_file_name in files:
+            os.remove(self.backup_file_name)
+        has_file = self.FILE_NAME in files
+        if has_file:
+            os.rename(self.FILE_NAME, self.backup_file_name)
+        os.rename(self.temp_file_name, self.FILE_NAME)
+        if has_file:
+            os.remove(self.backup_file_name)
+
     def load(self):
         self.data = {}
+        self.restore_backup()
+        self.stat = self.file_stat()
         if self.FILE_NAME in os.listdir():
-            try:
-                with open(self.FILE_NAME, 'r') as f:
-                    data = json.load(f)
-            except (OSError, ValueError):
-                error_msg = f'unable to read {self.FILE_TYPE} file'
-                raise self.LOAD_ERROR_EXCEPTION(error_msg)
-            else:
-                if type(data) != dict:
-                    error_msg = f'{self.FILE_TYPE} file incorrect format'
-                    raise self.LOAD_ERROR_EXCEPTION(error_msg)
-                data_tuples = [(k,v) for (k,v) in data.items()]
-                data_tuples.sort()
-                self.data = OrderedDict(data_tuples) 
-                self.check()
+            data = self.read_file()
+            data_tuples = [(k,v) for (k,v) in data.items()]
+            data_tuples.sort()
+            self.data = OrderedDict(data_tuples) 
+            self.check()
 
     def check(self):
         pass
@@ -0,0 +1,150 @@
+import ulab
+
+
+class Kinetics:
+
+    SEC_PER_MIN = 60.0
+
+    def __init__(self, channels, interval, capacity):
+        self.channels = list(channels)
+        self.interval = interval
+        self.capacity = capacity
+        num_chan = len(self.channels)
+
+        # Ring buffers for sample times (minutes since start) and absorbances
+        self.times = ulab.numpy.zeros((capacity,))
+        self.values = ulab.numpy.zeros((capacity, num_chan))
+        self.sample = ulab.numpy.zeros((num_chan,))
+
+        # Running sums for the least squares fit of absorbance vs time
+        self.sum_y = ulab.numpy.zeros((num_chan,))
+        self.sum_xy = ulab.numpy.zeros((num_chan,))
+        self.sum_yy = ulab.numpy.zeros((num_chan,))
+        self.reset()
+
+    def reset(self):
+        self.running = False
+        self.count = 0
+        self.total = 0
+        self.pos = 0
+        self.t_start = None
+        self.t_next = None
+        self.clear_sums()
+
+    def clear_sums(self):
+        self.sum_x = 0.0
+        self.sum_xx = 0.0
+        self.sum_y[:] = 0.0
+        self.sum_xy[:] = 0.0
+        self.sum_yy[:] = 0.0
+
+    def start(self, t):
+        self.reset()
+        self.running = True
+        self.t_start = t
+        self.t_next = t
+
+    def stop(self):
+        self.running = False
+
+    def is_due(self, t):
+        return self.running and t >= self.t_next
+
+    @property
+    def is_full(self):
+        return self.count == self.capacity
+
+    def elapsed(self, t):
+        if self.t_start is None:
+            return 0.0
+        return t - self.t_start
+
+    def update(self, t, absorbances):
+        for i, chan in enumerate(self.channels):
+            self.sample[i] = absorbances[chan]
+        x = (t - self.t_start)/self.SEC_PER_MIN
+
+        # Drop the oldest sample from the fit once the ring buffer is full
+        if self.is_full:
+            x_old = self.times[self.pos]
+            y_old = self.values[self.pos,:]
+            self.sum_x -= x_old
+            self.sum_xx -= x_old*x_old
+            self.sum_y -= y_old
+            self.sum_xy -= x_old*y_old
+            self.sum_yy -= y_old*y_old
+        else:
+            self.count += 1
+
+        self.times[self.pos] = x
+        self.values[self.pos,:] = self.sample
+        self.sum_x += x
+        self.sum_xx += x*x
+        self.sum_y += self.sample
+        self.sum_xy += x*self.sample
+        self.sum_yy += self.sample*self.sample
+        self.total += 1
+        self.pos += 1
+        if self.pos == self.capacity:
+            # Recompute the sums from the buffer once per wrap to stop round
+            # off error accumulating in the sliding sums.
+            self.pos = 0
+            self.recompute_sums()
+
+        # Schedule next sample on a fixed grid from the start time. Missed
+        # slots are skipped rather than letting the schedule drift.
+        num_dt = int((t - self.t_start)/self.interval) + 1
+        self.t_next = self.t_start + num_dt*self.interval
+
+    def recompute_sums(self):
+        times = self.times[:self.count]
+        values = self.values[:self.count]
+        self.sum_x = ulab.numpy.sum(times)
+        self.sum_xx = ulab.numpy.sum(times*times)
+        for i in range(len(self.channels)):
+            column = values[:,i]
+            self.sum_y[i] = ulab.numpy.sum(column)
+            self.sum_xy[i] = ulab.numpy.sum(times*column)
+            self.sum_yy[i] = ulab.numpy.sum(column*column)
+
+    @property
+    def slope(self):
+        # Rate of change in absorbance per minute for each channel
+        n = self.count
+        denom = n*self.sum_xx - self.sum_x*self.sum_x
+        if n < 2 or denom <= 0.0:
+            return ulab.numpy.zeros((len(self.channels),))
+        return (n*self.sum_xy - self.sum_x*self.sum_y)/denom
+
+    @property
+    def r_squared(self):
+        n = self.count
+        denom_x = n*self.sum_xx - self.sum_x*self.sum_x
+        denom_y = n*self.sum_yy - self.sum_y*self.sum_y
+        numer = n*self.sum_xy - self.sum_x*self.sum_y
+        if n < 3 or denom_x <= 0.0:
+            return ulab.numpy.zeros((len(self.channels),))
+        denom_y = ulab.numpy.where(denom_y > 0.0, denom_y, 1.0)
+        r_squared = (numer*numer)/(denom_x*denom_y)
+        return ulab.numpy.where(r_squared < 1.0, r_squared, 1.0)
+
+    def chronological_index(self, num):
+        # Buffer index of the num-th oldest sample
+        if self.is_full:
+            return (self.pos + num) % self.capacity
+        return num
+
+    def data(self, start=0, count=None):
+        # Return (times in seconds, values per channel) for samples start to
+        # start+count in chronological order.
+        if count is None:
+            count = self.count
+        stop = min(start + count, self.count)
+        times = []
+        values = [[] for chan in self.channels]
+        for num in range(start, stop):
+            ind = self.chronological_index(num)
+            times.append(self.times[ind]*self.SEC_PER_MIN)
+            for i in range(len(self.channels)):
+                values[i].append(self.values[ind,i])
+        return times, values
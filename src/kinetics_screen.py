@@ -0,0 +1,147 @@
+import board
+import displayio
+import constants
+import fonts
+from adafruit_display_text import label
+
+
+class KineticsScreen:
+
+    LABEL_X = 4
+    LABEL_Y_SPACING = 17
+
+    def __init__(self):
+
+        # Setup color palette
+        self.color_to_index = {k:i for (i,k) in enumerate(constants.COLOR_TO_RGB)}
+        self.palette = displayio.Palette(len(constants.COLOR_TO_RGB))
+        for i, palette_tuple in enumerate(constants.COLOR_TO_RGB.items()):
+            self.palette[i] = palette_tuple[1]
+
+        # Create tile grid
+        self.bitmap = displayio.Bitmap(
+                board.DISPLAY.width,
+                board.DISPLAY.height,
+                len(constants.COLOR_TO_RGB)
+                )
+        self.bitmap.fill(self.color_to_index['black'])
+        self.tile_grid = displayio.TileGrid(self.bitmap,pixel_shader=self.palette)
+        font_scale = 1
+
+        # Create header text label
+        header_str = 'Kinetics'
+        text_color = constants.COLOR_TO_RGB['white']
+        self.header_label = label.Label(
+                fonts.font_8pt,
+                text = header_str,
+                color = text_color,
+                scale = font_scale,
+                anchor_point = (0.5, 1.0),
+                )
+        bbox = self.header_label.bounding_box
+        header_label_x = board.DISPLAY.width//2
+        header_label_y = bbox[3] + 1
+        self.header_label.anchored_position = (header_label_x, header_label_y)
+
+        # Create rate, R^2, progress and status text labels
+        self.value_labels = []
+        label_colors = ('white', 'white', 'gray', 'yellow')
+        for i, color in enumerate(label_colors):
+            value_label = label.Label(
+                    fonts.font_8pt,
+                    text = ' ',
+                    color = constants.COLOR_TO_RGB[color],
+                    scale = font_scale,
+                    anchor_point = (0.0,1.0),
+                    )
+            value_label_y = header_label_y + (i+1)*self.LABEL_Y_SPACING
+            value_label.anchored_position = (self.LABEL_X, value_label_y)
+            self.value_labels.append(value_label)
+        self.rate_label, self.rsq_label, self.progress_label, self.status_label = \
+                self.value_labels
+
+        # Create text label for blanking info
+        blank_str = '*'
+        text_color = constants.COLOR_TO_RGB['orange']
+        self.blank_label = label.Label(
+                fonts.font_8pt,
+                text=blank_str,
+                color=text_color,
+                scale=font_scale,
+                anchor_point = (0.5,0.0),
+                )
+        blank_label_x = board.DISPLAY.width - 10
+        blank_label_y = board.DISPLAY.height - 14
+        self.blank_label.anchored_position = (blank_label_x, blank_label_y)
+
+        # Create battery text label
+        bat_str = 'battery 0.0V'
+        text_color = constants.COLOR_TO_RGB['gray']
+        self.bat_label = label.Label(
+                fonts.font_8pt,
+                text = bat_str,
+                color = text_color,
+                scale = font_scale,
+                anchor_point = (0.5,0.0),
+                )
+        bat_label_x = board.DISPLAY.width//2
+        bat_label_y = board.DISPLAY.height - 15
+        self.bat_label.anchored_position = (bat_label_x, bat_label_y)
+
+        # Create gain text label
+        gain_str = 'ABCX'
+        text_color = constants.COLOR_TO_RGB['gray']
+        self.gain_label = label.Label(
+                fonts.font_8pt,
+                text = gain_str,
+                color = text_color,
+                scale = font_scale,
+                anchor_point = (0.0,0.0),
+                )
+        gain_label_x = 1
+        gain_label_y = board.DISPLAY.height - 15
+        self.gain_label.anchored_position = (gain_label_x, gain_label_y)
+
+        # Ceate display group and add items to it
+        self.group = displayio.Group()
+        self.group.append(self.tile_grid)
+        self.group.append(self.header_label)
+        for item in self.value_labels:
+            self.group.append(item)
+        self.group.append(self.blank_label)
+        self.group.append(self.bat_label)
+        self.group.append(self.gain_label)
+
+    def set_kinetics(self, chan, rate, r_squared, count, elapsed, running):
+        self.header_label.text = f'Kinetics {chan}'
+        self.rate_label.text = f'rate {rate:1.4f} A/min'
+        self.rsq_label.text = f'R²   {r_squared:1.4f}'
+        self.progress_label.text = f'n {count}  t {int(elapsed)}s'
+        if running:
+            self.status_label.text = 'running'
+        elif count:
+            self.status_label.text = 'stopped'
+        else:
+            self.status_label.text = 'press > to start'
+
+    def set_not_blanked(self):
+        self.blank_label.text = 'NB'
+
+    def set_blanking(self):
+        self.blank_label.text = '**'
+
+    def set_blanked(self):
+        self.blank_label.text = 'BL'
+
+    def set_battery(self, value, is_low=False):
+        self.bat_label.text = f'battery {value:1.1f}V'
+        if is_low:
+            self.bat_label.color = constants.COLOR_TO_RGB['red']
+        else:
+            self.bat_label.color = constants.COLOR_TO_RGB['gray']
+
+    def set_gain(self, value):
+        self.gain_label.text = constants.GAIN_TO_STR[value]
+
+    def show(self):
+        board.DISPLAY.show(self.group)
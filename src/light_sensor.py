@@ -9,6 +9,7 @@ class LightSensor:
 
     NUM_CHAN = 10
     DEFAULT_GAIN = constants.STR_TO_GAIN['16x']
+    DEFAULT_INTEGRATION_TIME = constants.STR_TO_INTEGRATION_TIME['280ms']
     CHANNEL_NAMES = [k for k in constants.STR_TO_CHANNEL]
     AS7341_MAX_COUNT = 2**16-1
 
@@ -18,11 +19,14 @@ class LightSensor:
             self._device = adafruit_as7341.AS7341(i2c)
         except ValueError as error:
             raise LightSensorIOError(error)
+        self.recorder = None
         self.gain = self.DEFAULT_GAIN
+        self.integration_time = self.DEFAULT_INTEGRATION_TIME
 
     @property 
     def max_counts(self):
-        return self.AS7341_MAX_COUNT
+        atime, astep = self._integration_time
+        return min((atime+1)*(astep+1), self.AS7341_MAX_COUNT)
 
     @property
     def gain(self):
@@ -33,6 +37,33 @@ class LightSensor:
         self._gain = value
         self._device.gain = value
 
+    @property
+    def integration_time(self):
+        return self._integration_time
+
+    @integration_time.setter
+    def integration_time(self, value):
+        atime, astep = value
+        self._integration_time = value
+        self._device.atime = atime
+        self._device.astep = astep
+
+    @property
+    def led(self):
+        return self._device.led
+
+    @led.setter
+    def led(self, value):
+        self._device.led = value
+
+    @property
+    def led_current(self):
+        return self._device.led_current
+
+    @led_current.setter
+    def led_current(self, value):
+        self._device.led_current = value
+
     @property
     def values_as_dict(self):
         values_dict = OrderedDict()
@@ -46,6 +77,8 @@ class LightSensor:
         values = list(self._device.all_channels)
         values.append(self._device.channel_nir)
         values.append(self._device.channel_clear)
+        if self.recorder is not None:
+            self.recorder.frame(self._gain, self._integration_time, values)
         return values
 
     def raw_channel(self, channel):
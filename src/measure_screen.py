@@ -215,8 +215,12 @@ class MeasureScreen:
     def clear_integration_time(self):
         self.set_integration_time(None)
 
-    def set_battery(self, value):
+    def set_battery(self, value, is_low=False):
         self.bat_label.text = f'battery {value:1.1f}V'
+        if is_low:
+            self.bat_label.color = constants.COLOR_TO_RGB['red']
+        else:
+            self.bat_label.color = constants.COLOR_TO_RGB['gray']
 
     def set_channel(self, channel):
         self.chan_label.text = constants.CHANNEL_TO_STR[channel]
@@ -0,0 +1,56 @@
+import ulab
+import constants
+from array import array
+
+
+class MeasurementHistory:
+
+    CAPTURED = 0x01
+
+    def __init__(self, capacity):
+        # Fixed capacity ring of measurements stored column wise in flat
+        # arrays so appending never allocates. Records are addressed by a
+        # sequence number which keeps increasing as the ring wraps.
+        self.capacity = capacity
+        self.values = ulab.numpy.zeros((capacity, constants.NUM_CHANNEL))
+        self.times = array('f', [0.0]*capacity)
+        self.names = array('H', [0]*capacity)
+        self.gains = bytearray(capacity)
+        self.flags = bytearray(capacity)
+        self.next_seq = 0
+
+    @property
+    def first_seq(self):
+        return max(0, self.next_seq - self.capacity)
+
+    @property
+    def count(self):
+        return self.next_seq - self.first_seq
+
+    def clear(self):
+        self.next_seq = 0
+
+    def append(self, t, name_index, gain, values, flags=0):
+        pos = self.next_seq % self.capacity
+        self.times[pos] = t
+        self.names[pos] = name_index
+        self.gains[pos] = gain
+        self.flags[pos] = flags
+        self.values[pos,:] = values
+        self.next_seq += 1
+
+    def has_seq(self, seq):
+        return self.first_seq <= seq < self.next_seq
+
+    def record(self, seq):
+        # Returns (time, name index, gain, flags, values) for sequence number seq
+        if not self.has_seq(seq):
+            raise IndexError(f'seq {seq} not in history')
+        pos = seq % self.capacity
+        return (
+                self.times[pos], 
+                self.names[pos], 
+                self.gains[pos], 
+                self.flags[pos], 
+                self.values[pos,:],
+                )
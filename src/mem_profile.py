@@ -0,0 +1,79 @@
+import gc
+import constants
+from collections import OrderedDict
+
+
+class MemRegion:
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+        self.alloc_start = 0
+
+    def __enter__(self):
+        gc.collect()
+        self.alloc_start = gc.mem_alloc()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Memory still allocated after the region, i.e. retained by it
+        gc.collect()
+        self.profile.regions[self.name] = gc.mem_alloc() - self.alloc_start
+        self.profile.check_low()
+        return False
+
+
+class MemProfile:
+
+    def __init__(self):
+        # Retained memory per named region (bytes), allocation high water
+        # marks per operating mode and low memory events.
+        self.regions = OrderedDict()
+        self.high_water = {}
+        self.loop_garbage = 0
+        self.loop_garbage_max = 0
+        self.min_free = None
+        self.low_count = 0
+        self.is_low = False
+        self.low_pending = False
+
+    def region(self, name):
+        return MemRegion(self, name)
+
+    def update_loop(self, mode):
+        # Called once per pass just before the garbage collection, mem_alloc
+        # is then the highest it gets during the pass.
+        alloc = gc.mem_alloc()
+        if alloc > self.high_water.get(mode, 0):
+            self.high_water[mode] = alloc
+        gc.collect()
+        self.loop_garbage = alloc - gc.mem_alloc()
+        self.loop_garbage_max = max(self.loop_garbage_max, self.loop_garbage)
+        self.check_low()
+
+    def check_low(self):
+        free = gc.mem_free()
+        if self.min_free is None or free < self.min_free:
+            self.min_free = free
+        if free < constants.MEM_LOW_FREE:
+            if not self.is_low:
+                self.is_low = True
+                self.low_pending = True
+                self.low_count += 1
+        elif free > constants.MEM_LOW_FREE + constants.MEM_LOW_HYSTERESIS:
+            self.is_low = False
+
+    def pop_low_event(self):
+        # Returns True once after memory has become low
+        low_pending = self.low_pending
+        self.low_pending = False
+        return low_pending
+
+    def reset(self):
+        self.high_water = {}
+        self.loop_garbage_max = 0
+        self.min_free = None
+        self.low_count = 0
+
+
+profile = MemProfile()
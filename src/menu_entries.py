@@ -0,0 +1,78 @@
+import constants
+
+
+class MenuEntries:
+
+    def __init__(self, items, calibrations):
+        # Menu entry text is formatted once when the items are set. The view
+        # is the list of items as shown: the most recently used measurements
+        # (when the menu is long) followed by all items.
+        self.items = items
+        self.texts = [entry_text(calibrations, item) for item in items]
+        self.mru = []
+        self.view = []
+        self.view_texts = []
+        self.group_pos = []
+        self.update_view()
+
+    def __len__(self):
+        return len(self.view)
+
+    @property
+    def show_mru(self):
+        return len(self.items) > constants.MENU_MRU_MIN_ITEMS
+
+    def item(self, pos):
+        return self.items[self.view[pos]]
+
+    def use(self, name):
+        # Move measurement to the front of the most recently used list
+        if not name in self.items:
+            return
+        if name in self.mru:
+            self.mru.remove(name)
+        self.mru.insert(0, name)
+        del self.mru[constants.MENU_MRU_SIZE:]
+        self.update_view()
+
+    def update_view(self):
+        self.view = []
+        if self.show_mru:
+            self.view.extend([self.items.index(name) for name in self.mru])
+        num_mru = len(self.view)
+        self.view.extend(range(len(self.items)))
+        self.view_texts = []
+        for pos, index in enumerate(self.view):
+            mark = '*' if pos < num_mru else ''
+            self.view_texts.append(f'{pos}{mark} {self.texts[index]}')
+
+        # Positions where the first letter changes, used for jumping
+        self.group_pos = []
+        last_letter = None
+        for pos in range(num_mru, len(self.view)):
+            letter = self.items[self.view[pos]][:1].upper()
+            if letter != last_letter:
+                self.group_pos.append(pos)
+                last_letter = letter
+
+    def next_group(self, pos):
+        # Position of the next first letter group, wrapping to the first
+        for group_pos in self.group_pos:
+            if group_pos > pos:
+                return group_pos
+        return 0
+
+
+def entry_text(calibrations, item):
+    led = calibrations.led(item)
+    chan = calibrations.channel(item)
+    if led is None and chan is None:
+        return item
+    elif chan is None:
+        return f'{item} ({led})'
+    elif led is None:
+        chan_str = constants.CHANNEL_TO_STR[chan]
+        return f'{item} ({chan_str})'
+    else:
+        chan_str = constants.CHANNEL_TO_STR[chan]
+        return f'{item[:8]} ({led},{chan_str})'
@@ -92,20 +92,27 @@ class MenuScreen:
         for item_label in self.item_labels:
             self.group.append(item_label)
 
+        self.curr_item = None
         self.set_curr_item(0)
 
     def set_menu_items(self, text_list):
-        for item_label, item_text in zip(self.item_labels, text_list):
-            item_label.text = item_text 
+        # Only labels whose text changed are updated (and redrawn)
+        for i, item_label in enumerate(self.item_labels):
+            item_text = text_list[i] if i < len(text_list) else ''
+            if item_label.text != item_text:
+                item_label.text = item_text 
 
     def set_curr_item(self, num):
-        for i, item_label in enumerate(self.item_labels):
-            if i==num:
-                item_label.color = constants.COLOR_TO_RGB['black']
-                item_label.background_color = constants.COLOR_TO_RGB['yellow']
-            else:
-                item_label.color = constants.COLOR_TO_RGB['white']
-                item_label.background_color = constants.COLOR_TO_RGB['black']
+        if num == self.curr_item:
+            return
+        if self.curr_item is not None:
+            item_label = self.item_labels[self.curr_item]
+            item_label.color = constants.COLOR_TO_RGB['white']
+            item_label.background_color = constants.COLOR_TO_RGB['black']
+        item_label = self.item_labels[num]
+        item_label.color = constants.COLOR_TO_RGB['black']
+        item_label.background_color = constants.COLOR_TO_RGB['yellow']
+        self.curr_item = num
 
     def show(self):
         board.DISPLAY.show(self.group)
@@ -2,6 +2,9 @@ import sys
 import json
 import supervisor
 
+class CommandError(Exception):
+    pass
+
 class MessageReceiver:
 
     def __init__(self):
@@ -35,5 +38,17 @@ class MessageReceiver:
         return message_dict
 
 
+# Messages go to the serial console unless a sink is set, e.g. by replay
+_message_sink = None
+
+
+def set_message_sink(sink):
+    global _message_sink
+    _message_sink = sink
+
+
 def send_message(msg):
-    print(json.dumps(msg))
+    if _message_sink is not None:
+        _message_sink(msg)
+    else:
+        print(json.dumps(msg))
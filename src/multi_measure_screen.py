@@ -3,10 +3,24 @@ import displayio
 import constants
 import fonts
 from adafruit_display_text import label
+from numeric_display import NumericDisplay
+from numeric_display import NUMERIC_CHARS
+from numeric_display import fit_number
 
 
 class MultiMeasureScreen:
 
+    # Values are in two columns of fixed width fields, 11 chars of the 7 px
+    # wide font fit side by side on the 160 px display. Values are shown as
+    # 'name value' and statistics as 'nam mean±std' with the numbers
+    # shortened (see fit_number) to fit their part of the field.
+    VALUE_NUM_CHARS = 11
+    VALUE_Y_SPACING = 17
+    NAME_NUM_CHARS = 5
+    STATS_NAME_NUM_CHARS = 3
+    NAME_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_'
+    UNSIGNED_MEASUREMENTS = ('Absorbance', 'Transmittance')
+
     def __init__(self):
 
         # Setup color palette
@@ -41,25 +55,27 @@ class MultiMeasureScreen:
         header_label_y = bbox[3] + 1 
         self.header_label.anchored_position = (header_label_x, header_label_y)
 
-        # Create absorbance value text label
+        # Create channel value displays, pre-rendered glyphs for the digits
+        # and letters (channel and component names) with '0' drawn as 'O'.
+        # The second column is right aligned so the columns can't overlap.
+        value_chars = NUMERIC_CHARS + self.NAME_CHARS
         self.value_labels = []
-        for xpos in (1, 84):
+        for column in range(2):
             for i in range(5):
-                dummy_value = 0.0
-                value_str = f'{dummy_value:1.2f}'.replace('0','O')
-                text_color = constants.COLOR_TO_RGB['white']
-                value_label = label.Label(
-                        fonts.font_8pt, 
-                        text = value_str, 
-                        color = text_color, 
-                        scale = font_scale,
-                        anchor_point = (0.0,1.0),
-                        rotation=90,
+                value_label = NumericDisplay(
+                        fonts.font_8pt,
+                        self.VALUE_NUM_CHARS,
+                        constants.COLOR_TO_RGB['white'],
+                        chars = value_chars,
+                        glyph_subs = {'0': 'O'},
                         )
-                bbox = value_label.bounding_box
-                value_label_x = xpos 
-                value_label_y = header_label_y + (i+1)*(bbox[3] + 7) + 5 
-                value_label.anchored_position = (value_label_x, value_label_y)
+                value_label_y = header_label_y + (i+1)*self.VALUE_Y_SPACING + 5
+                if column == 0:
+                    xpos = 1
+                else:
+                    xpos = board.DISPLAY.width - 1 - self.VALUE_NUM_CHARS*value_label.cell_width
+                value_label.tile_grid.x = xpos
+                value_label.tile_grid.y = value_label_y - value_label.cell_height
                 self.value_labels.append(value_label)
 
         
@@ -109,36 +125,88 @@ class MultiMeasureScreen:
         gain_label_y = board.DISPLAY.height - 15
         self.gain_label.anchored_position = (gain_label_x, gain_label_y)
         
+        self.sample_id = None
+
         # Ceate display group and add items to it
         self.group = displayio.Group()
         self.group.append(self.tile_grid)
         self.group.append(self.header_label)
         for item in self.value_labels:
-            self.group.append(item)
+            self.group.append(item.tile_grid)
         self.group.append(self.blank_label)
         self.group.append(self.bat_label)
         self.group.append(self.gain_label)
 
     def set_measurement(self, name, units, values, chans, precision):
         # NOTE: precision not used ....
-        if values is None:
-            self.values_label.color = constants.COLOR_TO_RGB['orange']
-            self.values_label.text = 'range error' 
+        self.header_label.text = self.header_text(name)
+        value_width = self.VALUE_NUM_CHARS - self.NAME_NUM_CHARS - 1
+        for label, value, chan in zip(self.value_labels, values, chans):
+            chan = chan[:self.NAME_NUM_CHARS]
+            if name == "Raw Sensor":
+                value_str = fit_number(int(value), value_width, 0)
+            else:
+                value_str = fit_number(self.signed(name, value), value_width)
+            label.text = f'{chan} {value_str}'
+            label.color = constants.COLOR_TO_RGB['white']
+        self.clear_unused(len(chans))
+
+    def set_statistics(self, name, means, stds, count, chans):
+        self.header_label.text = self.header_text(f'{name} n={count}')
+        # Split what is left of the field between the mean and the std
+        num_chars = self.VALUE_NUM_CHARS - self.STATS_NAME_NUM_CHARS - 2
+        mean_width = num_chars - num_chars//2
+        std_width = num_chars//2
+        for label, mean, std, chan in zip(self.value_labels, means, stds, chans):
+            chan = chan[:self.STATS_NAME_NUM_CHARS]
+            if name == "Raw Sensor":
+                mean_str = fit_number(int(mean), mean_width, 0)
+                std_str = fit_number(int(std), std_width, 0)
+            else:
+                mean_str = fit_number(self.signed(name, mean), mean_width)
+                std_str = fit_number(std, std_width)
+            label.text = f'{chan} {mean_str}±{std_str}'
+            label.color = constants.COLOR_TO_RGB['white']
+        self.clear_unused(len(chans))
+
+    def signed(self, name, value):
+        # Absorbance and transmittance are shown without the sign of small
+        # negative readings near the blank, calibrated and unmixed values
+        # keep their sign.
+        if name in self.UNSIGNED_MEASUREMENTS:
+            return abs(value)
+        return value
+
+    def clear_unused(self, num_used):
+        # Blank value displays past the last value, e.g. for unmixing
+        for label in self.value_labels[num_used:]:
+            label.text = ''
+
+    def set_sample(self, sample_id):
+        # Current batch sample shown before the measurement name, or None
+        self.sample_id = sample_id
+
+    def header_text(self, text):
+        if self.sample_id is None:
+            return text
+        return f'{self.sample_id} {text}'
+
+    def set_stable(self, is_stable):
+        if is_stable:
+            self.header_label.color = constants.COLOR_TO_RGB['green']
         else:
-            self.header_label.text = name
-            for label, value, chan in zip(self.value_labels, values, chans):
-                if name == "Raw Sensor":
-                    values_str = f'{chan} {int(value)}'
-                else:
-                    values_str = f'{chan} {abs(value):1.2f}'
-                values_str = values_str.replace('0','O')
-                label.text = values_str
-                label.color = constants.COLOR_TO_RGB['white']
+            self.header_label.color = constants.COLOR_TO_RGB['white']
+
+    def set_range_error(self, is_error):
+        # Calibrated value outside the calibration range
+        if is_error:
+            self.value_labels[0].color = constants.COLOR_TO_RGB['orange']
 
     def set_overflow(self, name):
-        self.header_label.text = name
-        self.value_label.text = 'overflow' 
-        self.value_label.color = constants.COLOR_TO_RGB['red']
+        self.header_label.text = self.header_text(name)
+        self.value_labels[0].text = 'overflow'
+        self.value_labels[0].color = constants.COLOR_TO_RGB['red']
+        self.clear_unused(1)
 
     def set_not_blanked(self):
         self.blank_label.text = 'NB'
@@ -149,8 +217,12 @@ class MultiMeasureScreen:
     def set_blanked(self):
         self.blank_label.text = 'BL'
 
-    def set_battery(self, value):
+    def set_battery(self, value, is_low=False):
         self.bat_label.text = f'battery {value:1.1f}V'
+        if is_low:
+            self.bat_label.color = constants.COLOR_TO_RGB['red']
+        else:
+            self.bat_label.color = constants.COLOR_TO_RGB['gray']
 
     def set_gain(self, value):
         self.gain_label.text = gain_str = constants.GAIN_TO_STR[value]
@@ -0,0 +1,117 @@
+import displayio
+
+NUMERIC_CHARS = ' 0123456789.-+±'
+
+# Sprite sheets are shared by all displays using the same font and chars
+_sprite_sheets = {}
+
+
+def fit_number(value, width, max_digits=2):
+    # Value as a string of at most width chars (if possible). Decimals are
+    # dropped first, then the leading zero of values < 1, then thousands
+    # are shown as k, e.g. width 3 gives '.52', '1.2', '123' and '12k' and
+    # width 4 '-.52' and '-12k'.
+    for digits in range(max_digits, -1, -1):
+        value_str = f'{value:1.{digits}f}'
+        if value_str[0] == '-' and float(value_str) == 0.0:
+            value_str = value_str[1:]
+        if len(value_str) > width and value_str.startswith('0.'):
+            value_str = value_str[1:]
+        elif len(value_str) > width and value_str.startswith('-0.'):
+            value_str = '-' + value_str[2:]
+        if len(value_str) <= width:
+            return value_str
+    return f'{value/1000:1.0f}k'
+
+
+def sprite_sheet(font, chars, glyph_subs):
+    # One row of fixed size cells with the glyphs of chars rendered from the
+    # font, e.g. glyph_subs={'0': 'O'} draws '0' with the glyph for 'O'.
+    key = (id(font), chars, tuple(sorted(glyph_subs.items())))
+    try:
+        return _sprite_sheets[key]
+    except KeyError:
+        pass
+    glyph_chars = ''.join([glyph_subs.get(c, c) for c in chars])
+    font.load_glyphs(glyph_chars)
+    _, font_height, _, font_dy = font.get_bounding_box()
+    cell_width = 1
+    for c in glyph_chars:
+        glyph = font.get_glyph(ord(c))
+        if glyph is not None:
+            cell_width = max(cell_width, glyph.shift_x)
+    cell_height = font_height
+    baseline = font_height + font_dy
+    bitmap = displayio.Bitmap(cell_width*len(chars), cell_height, 2)
+    for i, c in enumerate(glyph_chars):
+        glyph = font.get_glyph(ord(c))
+        if glyph is None:
+            continue
+        x0 = i*cell_width + glyph.dx
+        y0 = baseline - glyph.height - glyph.dy
+        for y in range(glyph.height):
+            for x in range(glyph.width):
+                if glyph.bitmap[x,y] and 0 <= x0 + x < (i+1)*cell_width:
+                    bitmap[x0 + x, y0 + y] = 1
+    _sprite_sheets[key] = (bitmap, cell_width, cell_height)
+    return _sprite_sheets[key]
+
+
+class NumericDisplay:
+
+    def __init__(self, font, num_chars, color, chars=NUMERIC_CHARS, glyph_subs={},
+            x=0, y=0):
+        # Fixed width text drawn as a TileGrid of pre-rendered glyphs, setting
+        # the text only changes the tile indices of characters which changed.
+        # Characters not in chars are shown as blanks. x, y is the top left.
+        if not ' ' in chars:
+            chars = ' ' + chars
+        self.chars = chars
+        self.char_to_index = {c:i for (i,c) in enumerate(chars)}
+        self.blank_index = self.char_to_index[' ']
+        bitmap, self.cell_width, self.cell_height = sprite_sheet(font, chars, glyph_subs)
+        self.palette = displayio.Palette(2)
+        self.palette[0] = 0x000000
+        self.palette.make_transparent(0)
+        self.palette[1] = color
+        self._color = color
+        self.tile_grid = displayio.TileGrid(
+                bitmap,
+                pixel_shader = self.palette,
+                width = num_chars,
+                height = 1,
+                tile_width = self.cell_width,
+                tile_height = self.cell_height,
+                default_tile = self.blank_index,
+                x = x,
+                y = y,
+                )
+        self.num_chars = num_chars
+        self._text = ''
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        if value == self._text:
+            return
+        for i in range(self.num_chars):
+            if i < len(value):
+                index = self.char_to_index.get(value[i], self.blank_index)
+            else:
+                index = self.blank_index
+            if self.tile_grid[i] != index:
+                self.tile_grid[i] = index
+        self._text = value
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, value):
+        if value != self._color:
+            self.palette[1] = value
+            self._color = value
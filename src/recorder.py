@@ -0,0 +1,216 @@
+import os
+import json
+import clock
+import struct
+import constants
+
+# Recording file format, all little endian. A header (magic, version and
+# number of channels) and a STATE record (the colorimeter's, see
+# Colorimeter.recording_state) followed by records, each a type byte then:
+#   FRAME  : time_ms (uint32), gain (uint8), atime (uint8), astep (uint16),
+#            counts (uint16 per channel)
+#   BUTTON : time_ms (uint32), button mask (uint8)
+#   SERIAL : time_ms (uint32), length (uint16), message as json
+#   STATE  : time_ms (uint32), length (uint16), colorimeter state as json
+# Times are milliseconds since the recording started.
+
+RECORD_MAGIC = b'CREC'
+RECORD_VERSION = 2
+RECORD_FRAME = 1
+RECORD_BUTTON = 2
+RECORD_SERIAL = 3
+RECORD_STATE = 4
+RECORD_HEADER_FMT = '<4sBB'
+RECORD_FRAME_FMT = f'<IBBH{constants.NUM_CHANNEL}H'
+RECORD_BUTTON_FMT = '<IB'
+RECORD_SERIAL_FMT = '<IH'
+RECORD_STATE_FMT = '<IH'
+
+
+class Recorder:
+
+    def __init__(self):
+        # Records are packed into a preallocated RAM buffer and written to
+        # flash in one block when it fills or after LOG_FLUSH_DT seconds.
+        self.buffer = bytearray(constants.RECORD_BUFFER_SIZE)
+        self.buffer_view = memoryview(self.buffer)
+        self.buffer_len = 0
+        self.frame_size = 1 + struct.calcsize(RECORD_FRAME_FMT)
+        self.button_size = 1 + struct.calcsize(RECORD_BUTTON_FMT)
+        self.serial_size = 1 + struct.calcsize(RECORD_SERIAL_FMT)
+        self.file_name = None
+        self.file_size = 0
+        self.start_t = None
+        self.last_flush_t = None
+        self.error = None
+        self.num_frames = 0
+        self.num_dropped = 0
+
+    @property
+    def recording(self):
+        return self.file_name is not None
+
+    @property
+    def file_path(self):
+        return f'{constants.LOG_DIR}/{self.file_name}'
+
+    def start(self, file_name, state=None):
+        # Raises OSError if the file can't be created (CIRCUITPY read only).
+        # The state (settings, blank, etc.) is written after the header so
+        # replay can start from it rather than blanking.
+        self.stop()
+        if not constants.LOG_DIR in os.listdir():
+            os.mkdir(constants.LOG_DIR)
+        header = struct.pack(
+                RECORD_HEADER_FMT,
+                RECORD_MAGIC,
+                RECORD_VERSION,
+                constants.NUM_CHANNEL
+                )
+        if state is not None:
+            data = json.dumps(state).encode()
+            header += bytes([RECORD_STATE])
+            header += struct.pack(RECORD_STATE_FMT, 0, len(data))
+            header += data
+        self.file_name = file_name
+        with open(self.file_path, 'wb') as f:
+            f.write(header)
+        self.file_size = len(header)
+        self.start_t = clock.monotonic()
+        self.last_flush_t = self.start_t
+        self.buffer_len = 0
+        self.error = None
+        self.num_frames = 0
+        self.num_dropped = 0
+
+    def stop(self):
+        if self.recording:
+            self.flush()
+        self.file_name = None
+
+    def time_ms(self):
+        return int(1000*(clock.monotonic() - self.start_t))
+
+    def reserve(self, size):
+        # Returns buffer offset for a record of size bytes or None if dropped
+        if self.buffer_len + size > len(self.buffer):
+            self.flush()
+        if not self.recording or size > len(self.buffer):
+            self.num_dropped += 1
+            return None
+        offset = self.buffer_len
+        self.buffer_len += size
+        return offset
+
+    def frame(self, gain, integration_time, counts):
+        if not self.recording:
+            return
+        offset = self.reserve(self.frame_size)
+        if offset is None:
+            return
+        atime, astep = integration_time
+        self.buffer[offset] = RECORD_FRAME
+        struct.pack_into(
+                RECORD_FRAME_FMT,
+                self.buffer,
+                offset + 1,
+                self.time_ms(),
+                gain,
+                atime,
+                astep,
+                *[int(v) for v in counts]
+                )
+        self.num_frames += 1
+
+    def button(self, mask):
+        if not self.recording:
+            return
+        offset = self.reserve(self.button_size)
+        if offset is None:
+            return
+        self.buffer[offset] = RECORD_BUTTON
+        struct.pack_into(RECORD_BUTTON_FMT, self.buffer, offset + 1, self.time_ms(), mask)
+
+    def serial(self, msg):
+        if not self.recording:
+            return
+        data = json.dumps(msg).encode()
+        offset = self.reserve(self.serial_size + len(data))
+        if offset is None:
+            return
+        self.buffer[offset] = RECORD_SERIAL
+        struct.pack_into(RECORD_SERIAL_FMT, self.buffer, offset + 1, self.time_ms(), len(data))
+        n0 = offset + self.serial_size
+        self.buffer_view[n0:n0+len(data)] = data
+
+    def update(self):
+        if self.buffer_len == 0:
+            return
+        if clock.monotonic() - self.last_flush_t >= constants.LOG_FLUSH_DT:
+            self.flush()
+
+    def flush(self):
+        self.last_flush_t = clock.monotonic()
+        if self.buffer_len == 0 or not self.recording:
+            return
+        try:
+            with open(self.file_path, 'ab') as f:
+                f.write(self.buffer_view[:self.buffer_len])
+            self.file_size += self.buffer_len
+        except OSError as error:
+            # Stop recording, most likely CIRCUITPY is read only or full
+            self.error = f'unable to write recording ({error})'
+            self.file_name = None
+        self.buffer_len = 0
+
+
+class RecordReader:
+
+    def __init__(self, file_name):
+        # Iterates over the records of a recording as (type, time in seconds,
+        # data) with data the tuple (gain, (atime, astep), counts) for frames,
+        # the button mask for buttons and the message or state dict for
+        # serial and state.
+        self.file = open(file_name, 'rb')
+        header = self.file.read(struct.calcsize(RECORD_HEADER_FMT))
+        try:
+            magic, version, num_channel = struct.unpack(RECORD_HEADER_FMT, header)
+        except (ValueError, RuntimeError):
+            magic = None
+        if magic != RECORD_MAGIC or version != RECORD_VERSION:
+            self.close()
+            raise ValueError(f'{file_name} is not a recording')
+        if num_channel != constants.NUM_CHANNEL:
+            self.close()
+            raise ValueError(f'{file_name} has {num_channel} channels')
+        self.frame_size = struct.calcsize(RECORD_FRAME_FMT)
+        self.button_size = struct.calcsize(RECORD_BUTTON_FMT)
+        self.serial_size = struct.calcsize(RECORD_SERIAL_FMT)
+        self.state_size = struct.calcsize(RECORD_STATE_FMT)
+
+    def close(self):
+        self.file.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        record_type = self.file.read(1)
+        if not record_type:
+            raise StopIteration
+        record_type = record_type[0]
+        if record_type == RECORD_FRAME:
+            fields = struct.unpack(RECORD_FRAME_FMT, self.file.read(self.frame_size))
+            t_ms, gain, atime, astep = fields[:4]
+            data = (gain, (atime, astep), fields[4:])
+        elif record_type == RECORD_BUTTON:
+            t_ms, data = struct.unpack(RECORD_BUTTON_FMT, self.file.read(self.button_size))
+        elif record_type == RECORD_SERIAL:
+            t_ms, length = struct.unpack(RECORD_SERIAL_FMT, self.file.read(self.serial_size))
+            data = json.loads(self.file.read(length).decode())
+        elif record_type == RECORD_STATE:
+            t_ms, length = struct.unpack(RECORD_STATE_FMT, self.file.read(self.state_size))
+            data = json.loads(self.file.read(length).decode())
+        else:
+            raise ValueError(f'unknown record type {record_type}')
+        return record_type, 0.001*t_ms, data
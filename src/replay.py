@@ -0,0 +1,343 @@
+import sys
+import json
+import time
+import ulab
+import constants
+from collections import OrderedDict
+
+from colorimeter import Mode
+from colorimeter import Colorimeter
+from light_sensor import LightSensor
+from messaging import set_message_sink
+from clock import VirtualClock
+from clock import set_clock
+from recorder import RecordReader
+from recorder import RECORD_FRAME
+from recorder import RECORD_BUTTON
+from recorder import RECORD_STATE
+
+# Replays a recording (see recorder.py) through the colorimeter's processing
+# and display code as fast as it will go, timing each stage of the main loop.
+# The firmware runs on a virtual clock following the recorded times, so
+# blanking, filters, kinetics, etc. see the same timing as when recorded, and
+# starts from the state recorded with the recording rather than blanking.
+# Runs wherever the firmware does, e.g. on the device from the REPL:
+#
+#   import replay
+#   replay.main('logs/record.bin', 'logs/replay.jsonl')
+#
+# or on a PC with the shims in sim/ (see sim/run_replay.py).
+
+
+class ReplayEnd(Exception):
+    pass
+
+
+class ReplaySource:
+
+    def __init__(self, file_name):
+        # Hands out the recorded frames in order. Button and serial records
+        # are queued as the frames after them are reached.
+        self.reader = RecordReader(file_name)
+        try:
+            record_type, t, self.state = next(self.reader)
+        except StopIteration:
+            record_type = None
+        if record_type != RECORD_STATE:
+            self.reader.close()
+            raise ValueError(f'{file_name} has no state record')
+        self.frame = None
+        self.presses = []
+        self.messages = []
+        self.t = 0.0
+        self.num_frames = 0
+        self.eof = False
+
+    def advance(self):
+        # Read up to the next frame, queuing the records before it. Raises
+        # ReplayEnd at the end of the recording once the queues are empty.
+        if self.frame is not None:
+            return
+        if not self.eof:
+            for record_type, t, data in self.reader:
+                self.t = t
+                if record_type == RECORD_FRAME:
+                    self.frame = data
+                    return
+                elif record_type == RECORD_BUTTON:
+                    self.presses.append(data)
+                else:
+                    self.messages.append(data)
+            self.eof = True
+            self.reader.close()
+        if not (self.presses or self.messages):
+            raise ReplayEnd()
+
+    def next_frame(self):
+        self.advance()
+        if self.frame is None:
+            raise ReplayEnd()
+        frame = self.frame
+        self.frame = None
+        self.num_frames += 1
+        return frame
+
+
+class ReplayLightSensor(LightSensor):
+
+    def __init__(self, source):
+        # Gain and integration time follow the recorded frames
+        self.source = source
+        self.recorder = None
+        self._gain = self.DEFAULT_GAIN
+        self._integration_time = self.DEFAULT_INTEGRATION_TIME
+        self._led = False
+        self._led_current = 4
+
+    @property
+    def gain(self):
+        return self._gain
+
+    @gain.setter
+    def gain(self, value):
+        self._gain = value
+
+    @property
+    def integration_time(self):
+        return self._integration_time
+
+    @integration_time.setter
+    def integration_time(self, value):
+        self._integration_time = value
+
+    @property
+    def led(self):
+        return self._led
+
+    @led.setter
+    def led(self, value):
+        self._led = value
+
+    @property
+    def led_current(self):
+        return self._led_current
+
+    @led_current.setter
+    def led_current(self, value):
+        self._led_current = value
+
+    @property
+    def raw_values(self):
+        self._gain, self._integration_time, counts = self.source.next_frame()
+        return list(counts)
+
+
+class ReplayButtons:
+
+    def __init__(self, source):
+        self.source = source
+        self.presses = []
+
+    def get_presses(self):
+        self.presses.clear()
+        self.presses.extend(self.source.presses)
+        self.source.presses.clear()
+        return self.presses
+
+    def clear(self):
+        pass
+
+
+class ReplayMessageReceiver:
+
+    def __init__(self, source):
+        self.source = source
+        self.error = False
+        self.error_count = 0
+
+    def update(self):
+        if self.source.messages:
+            return self.source.messages.pop(0)
+        return {}
+
+
+class ReplayBatteryMonitor:
+
+    # The battery isn't recorded, replay as full
+    voltage = 4.2
+    soc = 100
+    is_low = False
+    is_ready = True
+
+    def update(self):
+        return False
+
+
+class ReplayColorimeter(Colorimeter):
+
+    def __init__(self, source):
+        self.source = source
+        super().__init__()
+
+    def create_light_sensor(self):
+        return ReplayLightSensor(self.source)
+
+    def create_buttons(self):
+        return ReplayButtons(self.source)
+
+    def create_battery_monitor(self):
+        return ReplayBatteryMonitor()
+
+    def create_message_receiver(self):
+        return ReplayMessageReceiver(self.source)
+
+    def startup_blank(self):
+        # Restore the recorded state, the frames of a live blank aren't in
+        # the recording. Kinetics runs aren't recorded so start in measure.
+        state = self.source.state
+        self.light_sensor.gain = state['gain']
+        self.light_sensor.integration_time = tuple(state['integration_time'])
+        self.blank_values = ulab.numpy.array(state['blank_values'])
+        self.is_blanked = state['is_blanked']
+        if self.is_measurement_item(state['measurement']):
+            self.measurement_name = state['measurement']
+        if self.mode == Mode.MEASURE:
+            self.spectrum_view = state['spectrum_view']
+            if state['mode'] == 'trend':
+                self.trend_chan_pos = state['trend_channel']
+                self.mode = Mode.TREND
+            elif self.spectrum_view:
+                self.mode = Mode.MEASURE
+
+
+class StageStats:
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, dt_ns):
+        self.count += 1
+        self.total_ns += dt_ns
+        self.max_ns = max(self.max_ns, dt_ns)
+
+    def as_dict(self):
+        stats = OrderedDict()
+        stats['calls'] = self.count
+        stats['total_ms'] = 1.0e-6*self.total_ns
+        stats['mean_ms'] = 1.0e-6*self.total_ns/self.count if self.count else 0.0
+        stats['max_ms'] = 1.0e-6*self.max_ns
+        return stats
+
+
+class Replay:
+
+    # Colorimeter methods timed, times of nested stages (e.g. calculation
+    # within the measure screen update) are included in the outer stage.
+    STAGES = (
+            'handle_serial_command',
+            'handle_button_press',
+            'update_kinetics',
+            'update_reload',
+            'update_measure_screen',
+            'calc_measurement_values',
+            'update_stability',
+            'update_logging',
+            'update_history',
+            'update_kinetics_screen',
+            'update_trend',
+            'update_status_labels',
+            'show_screen',
+            'update_memory',
+            )
+
+    def __init__(self, file_name, output_name=None):
+        # Outputs, the messages sent and the values of each calculation, are
+        # written as json lines to output_name when given.
+        self.source = ReplaySource(file_name)
+        self.output = None
+        if output_name is not None:
+            self.output = open(output_name, 'w')
+        self.stats = OrderedDict()
+        self.num_messages = 0
+        self.num_steps = 0
+        self.wall_time = 0.0
+        self.clock = VirtualClock()
+        self.wall_clock = set_clock(self.clock)
+        set_message_sink(self.on_message)
+        self.colorimeter = ReplayColorimeter(self.source)
+        for name in self.STAGES:
+            self.time_stage(name)
+
+    def time_stage(self, name):
+        # Replace the colorimeter's method by a timed wrapper
+        func = getattr(self.colorimeter, name)
+        stats = self.stats[name] = StageStats()
+
+        def timed(*args):
+            t0 = time.monotonic_ns()
+            result = func(*args)
+            stats.add(time.monotonic_ns() - t0)
+            if result is not None:
+                self.write_output(name, [float(v) for v in result])
+            return result
+
+        setattr(self.colorimeter, name, timed)
+
+    def on_message(self, msg):
+        self.num_messages += 1
+        self.write_output('message', msg)
+
+    def write_output(self, stage, value):
+        if self.output is not None:
+            record = {'t': self.source.t, 'stage': stage, 'value': value}
+            self.output.write(json.dumps(record))
+            self.output.write('\n')
+
+    def run(self, max_steps=None):
+        # Steps the main loop until the recording ends, returns the report.
+        # Stage and wall times are real, not virtual.
+        t0 = time.monotonic()
+        try:
+            while max_steps is None or self.num_steps < max_steps:
+                self.source.advance()
+                self.clock.set(self.source.t)
+                self.colorimeter.step()
+                self.num_steps += 1
+        except ReplayEnd:
+            pass
+        finally:
+            set_message_sink(None)
+            set_clock(self.wall_clock)
+            if self.output is not None:
+                self.output.close()
+                self.output = None
+        self.wall_time = time.monotonic() - t0
+        return self.report()
+
+    def report(self):
+        rsp = OrderedDict()
+        rsp['steps'] = self.num_steps
+        rsp['frames'] = self.source.num_frames
+        rsp['messages'] = self.num_messages
+        rsp['recorded_time'] = self.source.t
+        rsp['virtual_time'] = self.clock.monotonic()
+        rsp['wall_time'] = self.wall_time
+        if self.wall_time > 0.0:
+            rsp['speedup'] = self.source.t/self.wall_time
+        rsp['stages'] = OrderedDict()
+        for name, stats in self.stats.items():
+            if stats.count:
+                rsp['stages'][name] = stats.as_dict()
+        return rsp
+
+
+def main(file_name=constants.LOG_DIR + '/' + constants.RECORD_FILE, output_name=None):
+    report = Replay(file_name, output_name).run()
+    print(json.dumps(report))
+    return report
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
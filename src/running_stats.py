@@ -0,0 +1,64 @@
+import ulab
+
+
+class RunningStats:
+
+    def __init__(self, num, window=None, forgetting=None, change_abs=0.0, change_rel=0.0):
+        # Streaming per channel mean and variance using Welford's update. With
+        # a window the weight of new samples stops decreasing after window
+        # samples and with a forgetting factor old samples decay as
+        # forgetting**age, both turn the average into a moving one.
+        self.window = window
+        self.forgetting = forgetting
+        self.change_abs = change_abs
+        self.change_rel = change_rel
+        self.mean = ulab.numpy.zeros((num,))
+        self.var = ulab.numpy.zeros((num,))
+        self.delta = ulab.numpy.zeros((num,))
+        self.count = 0
+
+    def reset(self):
+        self.mean[:] = 0.0
+        self.var[:] = 0.0
+        self.count = 0
+
+    @property
+    def is_windowed(self):
+        if self.forgetting is not None:
+            return True
+        return self.window is not None and self.count > self.window
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return ulab.numpy.zeros((len(self.mean),))
+        if self.is_windowed:
+            return ulab.numpy.sqrt(self.var)
+        # Unbiased estimate while all samples have equal weight
+        return ulab.numpy.sqrt(self.var*(self.count/(self.count - 1)))
+
+    def is_sample_change(self):
+        # A step larger than the change tolerances on any channel means a new
+        # sample was inserted.
+        if self.count < 2:
+            return False
+        tol = self.change_abs + self.change_rel*abs(self.mean)
+        return ulab.numpy.max(abs(self.delta) - tol) > 0.0
+
+    def update(self, values):
+        self.delta[:] = values
+        self.delta -= self.mean
+        if self.is_sample_change():
+            self.reset()
+            self.delta[:] = values
+        self.count += 1
+        weight = 1.0/self.count
+        if self.window is not None:
+            weight = max(weight, 1.0/self.window)
+        if self.forgetting is not None:
+            weight = max(weight, 1.0 - self.forgetting)
+        # Welford's update in weighted form, for weight = 1/count this gives
+        # the exact mean and (population) variance of all samples.
+        self.mean += weight*self.delta
+        self.var += weight*self.delta*self.delta
+        self.var *= 1.0 - weight
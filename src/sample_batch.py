@@ -0,0 +1,137 @@
+import constants
+from array import array
+
+
+class SampleBatchError(Exception):
+    pass
+
+
+class SampleBatch:
+
+    PENDING = 0
+    MEASURED = 1
+    SKIPPED = 2
+    STATE_TO_STR = {PENDING: 'pending', MEASURED: 'measured', SKIPPED: 'skipped'}
+
+    def __init__(self, capacity):
+        # List of samples (id and optional expected measurement) with a
+        # preallocated result table, one row of channel values per sample.
+        # Captures fill the current sample and move on to the next pending one.
+        self.capacity = capacity
+        self.results = array('f', [0.0]*(capacity*constants.NUM_CHANNEL))
+        self.times = array('f', [0.0]*capacity)
+        self.names = [None]*capacity
+        self.states = bytearray(capacity)
+        self.ids = []
+        self.measurements = []
+        self.pos = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def is_active(self):
+        return self.pos < len(self.ids)
+
+    @property
+    def sample_id(self):
+        return self.ids[self.pos] if self.is_active else None
+
+    @property
+    def measurement(self):
+        return self.measurements[self.pos] if self.is_active else None
+
+    @property
+    def num_measured(self):
+        return sum([1 for i in range(len(self)) if self.states[i] == self.MEASURED])
+
+    def load(self, samples):
+        # samples is a list of ids or of {"id": ..., "measurement": ...}
+        if type(samples) != list or not samples:
+            raise SampleBatchError('samples must be a non-empty list')
+        if len(samples) > self.capacity:
+            raise SampleBatchError(f'max {self.capacity} samples')
+        ids = []
+        measurements = []
+        for sample in samples:
+            if type(sample) == dict:
+                sample_id = sample.get('id', None)
+                measurement = sample.get('measurement', None)
+            else:
+                sample_id = sample
+                measurement = None
+            if not type(sample_id) in (str, int):
+                raise SampleBatchError('sample id must be str or int')
+            if measurement is not None and type(measurement) != str:
+                raise SampleBatchError('sample measurement must be str')
+            ids.append(str(sample_id))
+            measurements.append(measurement)
+        self.ids = ids
+        self.measurements = measurements
+        for i in range(self.capacity):
+            self.states[i] = self.PENDING
+        self.pos = 0
+
+    def clear(self):
+        self.ids = []
+        self.measurements = []
+        self.pos = 0
+
+    def record(self, t, name, values):
+        # Stores values for the current sample and advances. Returns its index.
+        if not self.is_active:
+            raise SampleBatchError('batch complete')
+        index = self.pos
+        n = constants.NUM_CHANNEL
+        for i in range(n):
+            self.results[index*n + i] = values[i]
+        self.times[index] = t
+        self.names[index] = name
+        self.states[index] = self.MEASURED
+        self.advance()
+        return index
+
+    def skip(self):
+        if not self.is_active:
+            raise SampleBatchError('batch complete')
+        self.states[self.pos] = self.SKIPPED
+        self.advance()
+
+    def goto(self, index):
+        # Select a sample, e.g. to measure a skipped one or repeat one
+        if not index in range(len(self)):
+            raise SampleBatchError(f'index must be in 0 to {len(self)-1}')
+        self.pos = index
+
+    def advance(self):
+        # Next pending sample after the current one, else the end of the batch
+        for pos in range(self.pos + 1, len(self)):
+            if self.states[pos] == self.PENDING:
+                self.pos = pos
+                return
+        self.pos = len(self)
+
+    def row(self, index):
+        n = constants.NUM_CHANNEL
+        return self.results[index*n:(index+1)*n]
+
+    def csv_rows(self, start, stop):
+        # Rows as CSV lines: id, state, measurement, time and channel values
+        for index in range(start, stop):
+            state = self.states[index]
+            if state == self.MEASURED:
+                name = self.names[index].replace(',', ';')
+                t_str = f'{self.times[index]:1.3f}'
+                values_str = ','.join([f'{v:1.6g}' for v in self.row(index)])
+            else:
+                name = ''
+                t_str = ''
+                values_str = ','*(constants.NUM_CHANNEL - 1)
+            sample_id = self.ids[index].replace(',', ';')
+            state_str = self.STATE_TO_STR[state]
+            yield f'{sample_id},{state_str},{name},{t_str},{values_str}\n'
+
+    def results_bytes(self, start, stop):
+        # Result table rows as little endian float32, row major
+        n = constants.NUM_CHANNEL
+        return bytes(memoryview(self.results)[start*n:stop*n])
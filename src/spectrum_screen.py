@@ -0,0 +1,235 @@
+import board
+import displayio
+import constants
+import fonts
+from adafruit_display_text import label
+
+try:
+    from bitmaptools import fill_region
+except ImportError:
+    def fill_region(bitmap, x1, y1, x2, y2, value):
+        for y in range(y1, y2):
+            for x in range(x1, x2):
+                bitmap[x,y] = value
+
+
+class SpectrumScreen:
+
+    # Bar colours by channel wavelength 415nm ... 910nm, clear
+    CHANNEL_RGB = (
+            0x8000ff, 0x3020ff, 0x00a0ff, 0x00ff60, 0x90ff00,
+            0xffd000, 0xff6000, 0xff0000, 0x900000, 0xc0c0c0,
+            )
+    BACKGROUND_INDEX = 0
+    REFERENCE_INDEX = 1
+    BAR_INDEX = 2
+    PLOT_Y = 16
+    PLOT_MARGIN_BOTTOM = 18
+    BAR_GAP = 2
+    SCALE_SHRINK = 0.5
+
+    def __init__(self):
+
+        # Palette: background, reference marker and a colour per channel
+        self.palette = displayio.Palette(self.BAR_INDEX + constants.NUM_CHANNEL)
+        self.palette[self.BACKGROUND_INDEX] = constants.COLOR_TO_RGB['black']
+        self.palette[self.REFERENCE_INDEX] = constants.COLOR_TO_RGB['white']
+        for i, rgb in enumerate(self.CHANNEL_RGB):
+            self.palette[self.BAR_INDEX + i] = rgb
+
+        # Plot bitmap, bars grow up from the bottom row
+        self.plot_width = board.DISPLAY.width
+        self.plot_height = board.DISPLAY.height - self.PLOT_Y - self.PLOT_MARGIN_BOTTOM
+        self.bitmap = displayio.Bitmap(
+                self.plot_width,
+                self.plot_height,
+                len(self.palette)
+                )
+        self.bitmap.fill(self.BACKGROUND_INDEX)
+        self.tile_grid = displayio.TileGrid(
+                self.bitmap,
+                pixel_shader = self.palette,
+                y = self.PLOT_Y,
+                )
+        bar_pitch = self.plot_width//constants.NUM_CHANNEL
+        self.bar_x = [i*bar_pitch + self.BAR_GAP//2 for i in range(constants.NUM_CHANNEL)]
+        self.bar_width = bar_pitch - self.BAR_GAP
+        self.bar_heights = [0]*constants.NUM_CHANNEL
+        self.reference_heights = [None]*constants.NUM_CHANNEL
+        self.scale = None
+        self.reference = None
+        font_scale = 1
+
+        # Create header text label
+        header_str = 'Spectrum'
+        text_color = constants.COLOR_TO_RGB['white']
+        self.header_label = label.Label(
+                fonts.font_8pt,
+                text = header_str,
+                color = text_color,
+                scale = font_scale,
+                anchor_point = (0.5, 1.0),
+                )
+        bbox = self.header_label.bounding_box
+        header_label_x = board.DISPLAY.width//2
+        header_label_y = bbox[3] + 1
+        self.header_label.anchored_position = (header_label_x, header_label_y)
+
+        # Create text label for blanking info
+        blank_str = '*'
+        text_color = constants.COLOR_TO_RGB['orange']
+        self.blank_label = label.Label(
+                fonts.font_8pt,
+                text=blank_str,
+                color=text_color,
+                scale=font_scale,
+                anchor_point = (0.5,0.0),
+                )
+        blank_label_x = board.DISPLAY.width - 10
+        blank_label_y = board.DISPLAY.height - 14
+        self.blank_label.anchored_position = (blank_label_x, blank_label_y)
+
+        # Create battery text label
+        bat_str = 'battery 0.0V'
+        text_color = constants.COLOR_TO_RGB['gray']
+        self.bat_label = label.Label(
+                fonts.font_8pt,
+                text = bat_str,
+                color = text_color,
+                scale = font_scale,
+                anchor_point = (0.5,0.0),
+                )
+        bat_label_x = board.DISPLAY.width//2
+        bat_label_y = board.DISPLAY.height - 15
+        self.bat_label.anchored_position = (bat_label_x, bat_label_y)
+
+        # Create gain text label
+        gain_str = 'ABCX'
+        text_color = constants.COLOR_TO_RGB['gray']
+        self.gain_label = label.Label(
+                fonts.font_8pt,
+                text = gain_str,
+                color = text_color,
+                scale = font_scale,
+                anchor_point = (0.0,0.0),
+                )
+        gain_label_x = 1
+        gain_label_y = board.DISPLAY.height - 15
+        self.gain_label.anchored_position = (gain_label_x, gain_label_y)
+
+        self.sample_id = None
+
+        # Ceate display group and add items to it
+        self.group = displayio.Group()
+        self.group.append(self.tile_grid)
+        self.group.append(self.header_label)
+        self.group.append(self.blank_label)
+        self.group.append(self.bat_label)
+        self.group.append(self.gain_label)
+
+    def update_scale(self, values, reference):
+        # Autoscale, grows at once and shrinks when the data drops well below
+        # the scale. Returns True when the scale changed.
+        max_value = max([abs(v) for v in values])
+        if reference is not None:
+            max_value = max(max_value, max(reference))
+        max_value = max(max_value, 1.0e-6)
+        if self.scale is None or max_value > self.scale or max_value < self.SCALE_SHRINK*self.scale:
+            self.scale = 1.1*max_value
+            return True
+        return False
+
+    def value_to_height(self, value):
+        height = int(self.plot_height*abs(value)/self.scale)
+        return min(max(height, 0), self.plot_height)
+
+    def set_reference(self, reference):
+        # Reference values (e.g. blank) shown as a line on each bar or None
+        self.reference = reference
+
+    def set_spectrum(self, name, values):
+        # Only the rows between the old and new top of each bar are redrawn
+        reference = self.reference
+        self.update_scale(values, reference)
+        header_str = self.header_text(f'{name} {self.scale:1.3g}')
+        if self.header_label.text != header_str:
+            self.header_label.text = header_str
+        bottom = self.plot_height
+        for i, value in enumerate(values):
+            x0 = self.bar_x[i]
+            x1 = x0 + self.bar_width
+            new_height = self.value_to_height(value)
+            old_height = self.bar_heights[i]
+            if new_height > old_height:
+                fill_region(self.bitmap, x0, bottom - new_height, x1, bottom - old_height,
+                        self.BAR_INDEX + i)
+            elif new_height < old_height:
+                fill_region(self.bitmap, x0, bottom - old_height, x1, bottom - new_height,
+                        self.BACKGROUND_INDEX)
+            self.bar_heights[i] = new_height
+
+            # Reference marker, a line over the bar at the reference value
+            ref_height = None
+            if reference is not None:
+                ref_height = max(self.value_to_height(reference[i]), 1)
+            old_ref_height = self.reference_heights[i]
+            if old_ref_height is not None and old_ref_height != ref_height:
+                y = bottom - old_ref_height
+                color = self.BAR_INDEX + i if old_ref_height <= new_height else self.BACKGROUND_INDEX
+                fill_region(self.bitmap, x0, y, x1, y + 1, color)
+            redraw_ref = ref_height != old_ref_height or new_height != old_height
+            if ref_height is not None and redraw_ref:
+                y = bottom - ref_height
+                fill_region(self.bitmap, x0, y, x1, y + 1, self.REFERENCE_INDEX)
+            self.reference_heights[i] = ref_height
+
+    def set_measurement(self, name, units, values, chans, precision):
+        self.set_spectrum(name, values)
+
+    def set_statistics(self, name, means, stds, count, chans):
+        self.set_spectrum(f'{name} n={count}', means)
+
+    def set_sample(self, sample_id):
+        # Current batch sample shown before the measurement name, or None
+        self.sample_id = sample_id
+
+    def header_text(self, text):
+        if self.sample_id is None:
+            return text
+        return f'{self.sample_id} {text}'
+
+    def set_stable(self, is_stable):
+        if is_stable:
+            self.header_label.color = constants.COLOR_TO_RGB['green']
+        else:
+            self.header_label.color = constants.COLOR_TO_RGB['white']
+
+    def set_range_error(self, is_error):
+        # Calibrated value outside the calibration range
+        if is_error:
+            self.header_label.color = constants.COLOR_TO_RGB['orange']
+
+    def set_overflow(self, name):
+        self.header_label.text = f'{name} overflow'
+
+    def set_not_blanked(self):
+        self.blank_label.text = 'NB'
+
+    def set_blanking(self):
+        self.blank_label.text = '**'
+
+    def set_blanked(self):
+        self.blank_label.text = 'BL'
+
+    def set_battery(self, value, is_low=False):
+        self.bat_label.text = f'battery {value:1.1f}V'
+        if is_low:
+            self.bat_label.color = constants.COLOR_TO_RGB['red']
+        else:
+            self.bat_label.color = constants.COLOR_TO_RGB['gray']
+
+    def set_gain(self, value):
+        self.gain_label.text = constants.GAIN_TO_STR[value]
+
+    def show(self):
+        board.DISPLAY.show(self.group)
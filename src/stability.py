@@ -0,0 +1,70 @@
+import ulab
+
+
+class StabilityDetector:
+
+    REARM_FACTOR = 2.0
+
+    def __init__(self, channels, window=10, std_max=0.002, drift_max=0.004):
+        # Rolling window of absorbances for the selected channels. A reading
+        # is stable when, on every channel, the standard deviation over the
+        # window is at most std_max and the difference between the means of
+        # the newer and older halves of the window is at most drift_max.
+        self.channels = list(channels)
+        self.window = window
+        self.std_max = std_max
+        self.drift_max = drift_max
+        self.buffer = ulab.numpy.zeros((window, len(self.channels)))
+        self.half = window//2
+        self.armed = True
+        self.reset()
+
+    def reset(self):
+        self.pos = 0
+        self.count = 0
+        self.is_stable = False
+
+    def disarm(self):
+        # No capture until the reading has been unstable, e.g. after blanking
+        # the blank itself should not be captured.
+        self.reset()
+        self.armed = False
+
+    def drift(self):
+        # Difference between the mean of the newer and older halves of the
+        # window. Positions in the ring are taken relative to the oldest.
+        older = ulab.numpy.zeros((len(self.channels),))
+        newer = ulab.numpy.zeros((len(self.channels),))
+        for i in range(self.window):
+            row = self.buffer[(self.pos + i) % self.window,:]
+            if i < self.half:
+                older += row
+            elif i >= self.window - self.half:
+                newer += row
+        return (newer - older)/self.half
+
+    def update(self, absorbances):
+        # Add reading, returns True when a stable reading should be captured
+        for i, chan in enumerate(self.channels):
+            self.buffer[self.pos,i] = absorbances[chan]
+        self.pos = (self.pos + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        if self.count < self.window:
+            self.is_stable = False
+            return False
+
+        std_ratio = ulab.numpy.max(ulab.numpy.std(self.buffer, axis=0))/self.std_max
+        drift_ratio = ulab.numpy.max(abs(self.drift()))/self.drift_max
+        was_stable = self.is_stable
+        self.is_stable = std_ratio <= 1.0 and drift_ratio <= 1.0
+
+        # Re-arm only on clear instability so that noise around the thresholds
+        # doesn't capture the same sample twice.
+        if max(std_ratio, drift_ratio) > self.REARM_FACTOR:
+            self.armed = True
+        if not self.is_stable:
+            return False
+        if self.armed and not was_stable:
+            self.armed = False
+            return True
+        return False
@@ -0,0 +1,208 @@
+import board
+import displayio
+import constants
+import fonts
+from array import array
+from adafruit_display_text import label
+
+try:
+    from bitmaptools import fill_region
+except ImportError:
+    def fill_region(bitmap, x1, y1, x2, y2, value):
+        for y in range(y1, y2):
+            for x in range(x1, x2):
+                bitmap[x,y] = value
+
+
+class TrendScreen:
+
+    BACKGROUND_INDEX = 0
+    GRID_INDEX = 1
+    TRACE_INDEX = 2
+    PLOT_Y = 16
+    PLOT_MARGIN_BOTTOM = 18
+    TILE_WIDTH = 8
+    RANGE_MARGIN = 0.1
+
+    def __init__(self, y_min=0.0, y_max=1.0):
+
+        # The plot is a ring of columns in a bitmap cut into tiles one tile
+        # wider than the display. New points are drawn into the next column
+        # and the plot scrolls by rotating the tile indices and moving the
+        # TileGrid x offset, points already drawn are never re-plotted.
+        self.palette = displayio.Palette(3)
+        self.palette[self.BACKGROUND_INDEX] = constants.COLOR_TO_RGB['black']
+        self.palette[self.GRID_INDEX] = 0x303030
+        self.palette[self.TRACE_INDEX] = constants.COLOR_TO_RGB['yellow']
+        self.num_visible = board.DISPLAY.width
+        self.num_tiles = self.num_visible//self.TILE_WIDTH + 1
+        self.num_columns = self.num_tiles*self.TILE_WIDTH
+        self.plot_height = board.DISPLAY.height - self.PLOT_Y - self.PLOT_MARGIN_BOTTOM
+        self.bitmap = displayio.Bitmap(self.num_columns, self.plot_height, len(self.palette))
+        self.bitmap.fill(self.BACKGROUND_INDEX)
+        self.plot_grid = displayio.TileGrid(
+                self.bitmap,
+                pixel_shader = self.palette,
+                width = self.num_tiles,
+                height = 1,
+                tile_width = self.TILE_WIDTH,
+                tile_height = self.plot_height,
+                y = self.PLOT_Y,
+                )
+        self.values = array('f', [0.0]*self.num_columns)
+        self.y_min = y_min
+        self.y_max = y_max
+        self.count = 0
+        self.last_y = None
+        self.scroll()
+        font_scale = 1
+
+        # Create header text label
+        header_str = 'Trend'
+        text_color = constants.COLOR_TO_RGB['white']
+        self.header_label = label.Label(
+                fonts.font_8pt,
+                text = header_str,
+                color = text_color,
+                scale = font_scale,
+                anchor_point = (0.5, 1.0),
+                )
+        bbox = self.header_label.bounding_box
+        header_label_x = board.DISPLAY.width//2
+        header_label_y = bbox[3] + 1
+        self.header_label.anchored_position = (header_label_x, header_label_y)
+
+        # Create text label for blanking info
+        blank_str = '*'
+        text_color = constants.COLOR_TO_RGB['orange']
+        self.blank_label = label.Label(
+                fonts.font_8pt,
+                text=blank_str,
+                color=text_color,
+                scale=font_scale,
+                anchor_point = (0.5,0.0),
+                )
+        blank_label_x = board.DISPLAY.width - 10
+        blank_label_y = board.DISPLAY.height - 14
+        self.blank_label.anchored_position = (blank_label_x, blank_label_y)
+
+        # Create battery text label
+        bat_str = 'battery 0.0V'
+        text_color = constants.COLOR_TO_RGB['gray']
+        self.bat_label = label.Label(
+                fonts.font_8pt,
+                text = bat_str,
+                color = text_color,
+                scale = font_scale,
+                anchor_point = (0.5,0.0),
+                )
+        bat_label_x = board.DISPLAY.width//2
+        bat_label_y = board.DISPLAY.height - 15
+        self.bat_label.anchored_position = (bat_label_x, bat_label_y)
+
+        # Create gain text label
+        gain_str = 'ABCX'
+        text_color = constants.COLOR_TO_RGB['gray']
+        self.gain_label = label.Label(
+                fonts.font_8pt,
+                text = gain_str,
+                color = text_color,
+                scale = font_scale,
+                anchor_point = (0.0,0.0),
+                )
+        gain_label_x = 1
+        gain_label_y = board.DISPLAY.height - 15
+        self.gain_label.anchored_position = (gain_label_x, gain_label_y)
+
+        # Ceate display group and add items to it
+        self.group = displayio.Group()
+        self.group.append(self.plot_grid)
+        self.group.append(self.header_label)
+        self.group.append(self.blank_label)
+        self.group.append(self.bat_label)
+        self.group.append(self.gain_label)
+
+    def clear(self):
+        self.bitmap.fill(self.BACKGROUND_INDEX)
+        self.count = 0
+        self.last_y = None
+        self.scroll()
+
+    def scroll(self):
+        # Newest column (count-1) ends up at the right edge of the display
+        first = self.count - self.num_visible
+        first_tile = first//self.TILE_WIDTH
+        for i in range(self.num_tiles):
+            self.plot_grid[i] = (first_tile + i) % self.num_tiles
+        self.plot_grid.x = -(first % self.TILE_WIDTH)
+
+    def value_to_y(self, value):
+        frac = (value - self.y_min)/(self.y_max - self.y_min)
+        y = int((1.0 - frac)*(self.plot_height - 1))
+        return min(max(y, 0), self.plot_height - 1)
+
+    def draw_column(self, num):
+        # Draws point num as a vertical segment joining it to the previous
+        # point so fast changes leave no gaps.
+        col = num % self.num_columns
+        fill_region(self.bitmap, col, 0, col + 1, self.plot_height, self.BACKGROUND_INDEX)
+        if num % (4*self.TILE_WIDTH) == 0:
+            fill_region(self.bitmap, col, 0, col + 1, self.plot_height, self.GRID_INDEX)
+        y = self.value_to_y(self.values[col])
+        y0 = y if self.last_y is None else self.last_y
+        fill_region(self.bitmap, col, min(y, y0), col + 1, max(y, y0) + 1, self.TRACE_INDEX)
+        self.last_y = y
+
+    def update_range(self, value):
+        # Returns True when the value doesn't fit and the y range was widened
+        if self.y_min <= value <= self.y_max:
+            return False
+        span = self.y_max - self.y_min
+        if value > self.y_max:
+            self.y_max = value + self.RANGE_MARGIN*span
+        else:
+            self.y_min = value - self.RANGE_MARGIN*span
+        return True
+
+    def add_point(self, value):
+        self.values[self.count % self.num_columns] = value
+        if self.update_range(value):
+            # Rare full redraw of the points in the ring
+            start = max(0, self.count + 1 - self.num_columns)
+            self.last_y = None
+            for num in range(start, self.count + 1):
+                self.draw_column(num)
+        else:
+            self.draw_column(self.count)
+        self.count += 1
+        self.scroll()
+
+    def set_value(self, chan, value):
+        header_str = f'{chan} {value:1.3f} [{self.y_min:1.2f},{self.y_max:1.2f}]'
+        if self.header_label.text != header_str:
+            self.header_label.text = header_str
+
+    def set_overflow(self):
+        self.header_label.text = 'overflow'
+
+    def set_not_blanked(self):
+        self.blank_label.text = 'NB'
+
+    def set_blanking(self):
+        self.blank_label.text = '**'
+
+    def set_blanked(self):
+        self.blank_label.text = 'BL'
+
+    def set_battery(self, value, is_low=False):
+        self.bat_label.text = f'battery {value:1.1f}V'
+        if is_low:
+            self.bat_label.color = constants.COLOR_TO_RGB['red']
+        else:
+            self.bat_label.color = constants.COLOR_TO_RGB['gray']
+
+    def set_gain(self, value):
+        self.gain_label.text = constants.GAIN_TO_STR[value]
+
+    def show(self):
+        board.DISPLAY.show(self.group)
@@ -0,0 +1,79 @@
+import ulab
+import constants
+
+
+class UnmixingError(Exception):
+    pass
+
+
+class Unmixing:
+
+    MAX_CACHED_MATRICES = 16
+
+    def __init__(self, spectra, channels, non_negative=False):
+        # Least squares unmixing of absorbances into the concentrations of
+        # components with the given reference spectra (absorbance per unit
+        # concentration for every channel). Only the listed channels are
+        # used in the fit. The unmixing matrix (pseudo-inverse) is computed
+        # here so each reading is a single matrix-vector product.
+        self.spectra = [list(spectrum) for spectrum in spectra]
+        self.channels = list(channels)
+        self.num = len(self.spectra)
+        self.non_negative = non_negative
+        if self.num > len(self.channels):
+            raise UnmixingError('more components than channels')
+        self.matrices = {}
+        self.all_components = tuple(range(self.num))
+        self.matrix = self.unmixing_matrix(self.all_components)
+        self.values = ulab.numpy.zeros((constants.NUM_CHANNEL,))
+
+    def unmixing_matrix(self, components):
+        # Pseudo-inverse inv(S^T S) S^T of the spectra S of the components,
+        # expanded to num x NUM_CHANNEL with zeros for unused channels and
+        # for components not in the fit.
+        try:
+            return self.matrices[components]
+        except KeyError:
+            pass
+        spectra = ulab.numpy.array([
+            [self.spectra[k][c] for k in components] for c in self.channels
+            ])
+        spectra_t = spectra.transpose()
+        try:
+            gram_inv = ulab.numpy.linalg.inv(ulab.numpy.dot(spectra_t, spectra))
+        except ValueError:
+            raise UnmixingError('component spectra are not independent')
+        pinv = ulab.numpy.dot(gram_inv, spectra_t)
+        matrix = ulab.numpy.zeros((self.num, constants.NUM_CHANNEL))
+        for i, k in enumerate(components):
+            for j, c in enumerate(self.channels):
+                matrix[k,c] = pinv[i,j]
+        if len(self.matrices) >= self.MAX_CACHED_MATRICES:
+            self.matrices = {}
+        self.matrices[components] = matrix
+        return matrix
+
+    def apply(self, absorbances):
+        # Returns the concentrations in the first num of the NUM_CHANNEL
+        # values so they fit the per channel history, statistics and filters.
+        concentrations = ulab.numpy.dot(self.matrix, absorbances)
+        if self.non_negative:
+            concentrations = self.clip_negative(concentrations, absorbances)
+        self.values[:self.num] = concentrations
+        return self.values
+
+    def clip_negative(self, concentrations, absorbances):
+        # Active set iterations, components with negative concentrations are
+        # set to zero and the rest refitted without them. At most one pass
+        # per component and the matrices are cached so this is cheap.
+        components = self.all_components
+        for _ in range(self.num):
+            if ulab.numpy.min(concentrations) >= 0.0:
+                break
+            components = tuple([k for k in components if concentrations[k] > 0.0])
+            if not components:
+                return ulab.numpy.zeros((self.num,))
+            matrix = self.unmixing_matrix(components)
+            concentrations = ulab.numpy.dot(matrix, absorbances)
+        concentrations[concentrations < 0.0] = 0.0
+        return concentrations
@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import pytest
+
+# Firmware tests run on CPython with the shims in sim/ (see sim/simulator.py)
+# and the libraries in sim/requirements.txt, they're skipped without them.
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, 'sim'))
+
+import simulator
+simulator.install()
+
+try:
+    import numpy
+    import displayio
+    import adafruit_display_text
+    import adafruit_as7341
+except ImportError:
+    collect_ignore_glob = ['test_*.py']
+else:
+    # Fonts are loaded from assets/ on import
+    cwd = os.getcwd()
+    os.chdir(REPO_DIR)
+    try:
+        import fonts
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def drive(tmp_path, monkeypatch):
+    # Working directory laid out as the CIRCUITPY drive
+    simulator.make_drive(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def virtual_clock():
+    import clock
+    virtual_clock = clock.VirtualClock()
+    wall_clock = clock.set_clock(virtual_clock)
+    yield virtual_clock
+    clock.set_clock(wall_clock)
+
+
+@pytest.fixture
+def messages():
+    # Messages sent by the firmware, copied as responses are reused
+    import messaging
+    sent = []
+    messaging.set_message_sink(lambda msg: sent.append(json.loads(json.dumps(msg))))
+    yield sent
+    messaging.set_message_sink(None)
@@ -0,0 +1,12 @@
+import bench
+
+
+def test_cases_run():
+    # A few seconds of each benchmark case so they keep working
+    for name, configuration in bench.CASES.items():
+        report = bench.run_case(name, configuration, None, 5.0)
+        assert report['virtual_time'] >= 5.0
+        assert report['steps'] > 0
+    for name, command in bench.COMMANDS.items():
+        report = bench.run_case(name, {}, command, 5.0)
+        assert report['steps'] > 0
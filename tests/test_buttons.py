@@ -0,0 +1,108 @@
+import pytest
+
+import clock
+import buttons
+import constants
+import digitalio
+import gamepadshift
+from buttons import Buttons
+from clock import VirtualClock
+
+UP = constants.BUTTON['up']
+BLANK = constants.BUTTON['blank']
+UP_KEY = UP.bit_length() - 1
+BLANK_KEY = BLANK.bit_length() - 1
+SCAN_DT = constants.BUTTON_SCAN_DT
+
+
+def poll(pad, virtual_clock, duration, dt=SCAN_DT):
+    # Returns [(time, mask)] of the presses seen polling every dt seconds
+    presses = []
+    end_t = virtual_clock.t + duration
+    while virtual_clock.t < end_t - 1.0e-9:
+        for mask in pad.get_presses():
+            presses.append((virtual_clock.t, mask))
+        virtual_clock.advance(dt)
+    return presses
+
+
+def held_up_presses(virtual_clock):
+    pad = Buttons(repeat_delay=0.5, repeat_dt=0.2, repeat_min_dt=0.04, repeat_accel=0.8)
+    pad.keys.press(UP_KEY)
+    presses = poll(pad, virtual_clock, 2.0)
+    pad.keys.release(UP_KEY)
+    presses.extend(poll(pad, virtual_clock, 1.0))
+    return [t for t, mask in presses if mask == UP]
+
+
+def test_press_and_release(virtual_clock):
+    pad = Buttons()
+    pad.keys.press(BLANK_KEY)
+    assert poll(pad, virtual_clock, 1.0) == [(0.0, BLANK)]
+    assert pad.held_mask == BLANK
+    pad.keys.release(BLANK_KEY)
+    assert poll(pad, virtual_clock, 1.0) == []
+    assert pad.held_mask == 0
+
+
+def test_held_key_repeats(virtual_clock):
+    times = held_up_presses(virtual_clock)
+    assert times[0] == 0.0
+    assert times[1] == pytest.approx(0.5, abs=SCAN_DT)
+    intervals = [t1 - t0 for t0, t1 in zip(times[1:], times[2:])]
+    assert intervals[0] == pytest.approx(0.2, abs=SCAN_DT)
+    assert all(i1 <= i0 + SCAN_DT for i0, i1 in zip(intervals, intervals[1:]))
+    assert min(intervals) >= 0.04 - 1.0e-9
+    assert times[-1] < 2.0
+
+
+def test_repeat_is_deterministic(virtual_clock):
+    times = held_up_presses(virtual_clock)
+    clock.set_clock(VirtualClock())
+    assert held_up_presses(clock.get_clock()) == times
+
+
+def test_keys_without_repeat_dont_repeat(virtual_clock):
+    pad = Buttons()
+    pad.keys.press(BLANK_KEY)
+    assert poll(pad, virtual_clock, 3.0) == [(0.0, BLANK)]
+
+
+@pytest.fixture
+def fallback_pad(monkeypatch):
+    # Buttons read with gamepadshift as on firmware without keypad
+    monkeypatch.setattr(buttons, 'keypad', None)
+    monkeypatch.setattr(buttons, 'digitalio', digitalio, raising=False)
+    monkeypatch.setattr(buttons, 'gamepadshift', gamepadshift, raising=False)
+    pad = Buttons()
+    assert pad.keys is None
+    return pad
+
+
+def test_fallback_debounce(virtual_clock, fallback_pad):
+    pad = fallback_pad
+    pad.pad.pressed = BLANK
+    assert pad.get_presses() == [BLANK]
+
+    # Contact bounce, released for less than BUTTON_DEBOUNCE_DT
+    virtual_clock.advance(0.02)
+    pad.pad.pressed = 0
+    assert pad.get_presses() == []
+    virtual_clock.advance(constants.BUTTON_DEBOUNCE_DT/2)
+    pad.pad.pressed = BLANK
+    assert pad.get_presses() == []
+
+    # Pressed again after a full release
+    virtual_clock.advance(0.02)
+    pad.pad.pressed = 0
+    assert pad.get_presses() == []
+    virtual_clock.advance(constants.BUTTON_DEBOUNCE_DT)
+    pad.pad.pressed = BLANK
+    assert pad.get_presses() == [BLANK]
+
+
+def test_fallback_repeat(virtual_clock, fallback_pad):
+    pad = fallback_pad
+    pad.pad.pressed = UP
+    presses = poll(pad, virtual_clock, 1.0)
+    assert [t for t, mask in presses] == pytest.approx([0.0, 0.5, 0.7, 0.86], abs=SCAN_DT)
@@ -0,0 +1,200 @@
+import math
+import time
+import base64
+import pytest
+
+import constants
+import simulator
+from colorimeter import Mode
+from idle_manager import IdleState
+from sim_devices import SimColorimeter
+
+N = constants.NUM_CHANNEL
+BLANK_TIME = (constants.NUM_BLANK_SAMPLES - 1)*constants.BLANK_DT
+
+
+class Light:
+
+    def __init__(self, counts=1000):
+        # Constant counts on all channels, the read times are kept
+        self.counts = counts
+        self.times = []
+
+    def __call__(self, t):
+        self.times.append(t)
+        return [self.counts]*N
+
+
+def responses(messages, msg_id):
+    return [msg for msg in messages if msg.get('id') == msg_id]
+
+
+def test_startup_blank(drive, virtual_clock):
+    light = Light()
+    colorimeter = SimColorimeter(light)
+    assert light.times == pytest.approx([i*constants.BLANK_DT for i in range(5)])
+    assert virtual_clock.t == pytest.approx(BLANK_TIME)
+    assert list(colorimeter.blank_values) == [1000.0]*N
+    assert not colorimeter.is_blanked
+
+
+def test_blank_command_runs_alongside_main_loop(drive, virtual_clock, messages):
+    light = Light()
+    colorimeter = SimColorimeter(light)
+    light.counts = 2000
+    colorimeter.send({'command': 'blank', 'id': 1})
+    colorimeter.step()
+    t_start = virtual_clock.t
+    assert colorimeter.is_blanking
+    assert responses(messages, 1) == [{'command': 'blank', 'id': 1, 'status': 'pending'}]
+
+    # Samples are taken by passes of the main loop, at most one per pass
+    num_passes = 0
+    while colorimeter.is_blanking:
+        colorimeter.idle_manager.sleep()
+        colorimeter.step()
+        num_passes += 1
+    assert num_passes == constants.NUM_BLANK_SAMPLES - 1
+    assert virtual_clock.t - t_start == pytest.approx(num_passes*constants.LOOP_DT)
+    assert colorimeter.is_blanked
+    assert list(colorimeter.blank_values) == [2000.0]*N
+    done = responses(messages, 1)[-1]
+    assert done['status'] == 'done'
+    assert done['response']['blanks']['clear'] == 2000.0
+
+
+def test_blank_median_rejects_spike(drive, virtual_clock):
+    spike = [1000, 1000, 9000, 1000, 1000]
+    colorimeter = SimColorimeter(lambda t: [spike.pop(0) if spike else 1000]*N)
+    assert list(colorimeter.blank_values) == [1000.0]*N
+
+
+def test_measurement_filter_timing(drive, virtual_clock):
+    # One pole filter with a 1s time constant, 1 - 1/e of a step after 1s
+    tau = 1.0
+    settings = {'type': 'one_pole', 'freq_cutoff': 1.0/(2.0*math.pi*tau)}
+    simulator.make_drive(drive, {'startup': 'Transmittance', 'filters': {'default': settings}})
+    light = Light()
+    colorimeter = SimColorimeter(light)
+    values = []
+    update_stability = colorimeter.update_stability
+
+    def record_values(raw_values, filtered_values):
+        values.append((virtual_clock.t, float(filtered_values[0])))
+        update_stability(raw_values, filtered_values)
+
+    colorimeter.update_stability = record_values
+    colorimeter.run_for(1.0)
+    light.counts = 500
+    t_step = virtual_clock.t
+    colorimeter.run_for(6.0)
+    after = [(t - t_step, v) for t, v in values if t >= t_step]
+    assert after[0][1] < 1.0
+    value_1s = [v for t, v in after if t == pytest.approx(tau)][0]
+    assert value_1s == pytest.approx(1.0 - 0.5*(1.0 - math.exp(-1.0)), abs=0.02)
+    assert after[-1][1] == pytest.approx(0.5, abs=0.005)
+
+
+def test_measurement_filter_follows_idle_period(drive, virtual_clock):
+    settings = {'type': 'two_pole', 'freq_cutoff': 1.0}
+    simulator.make_drive(drive, {'startup': 'Transmittance', 'filters': {'default': settings}})
+    colorimeter = SimColorimeter(Light())
+    colorimeter.run_for(10.0)
+    assert colorimeter.measurement_filter.dt == constants.LOOP_DT
+    # Display dims after a minute without buttons, passes slow down
+    colorimeter.run_for(120.0)
+    assert colorimeter.measurement_filter.dt == pytest.approx(constants.IDLE_DIM_LOOP_DT, rel=0.1)
+
+
+def test_record_and_log_fetch(drive, virtual_clock, messages):
+    colorimeter = SimColorimeter(Light())
+    colorimeter.send({'command': 'record', 'action': 'start', 'id': 1})
+    colorimeter.run_for(1.0)
+    colorimeter.send({'command': 'record', 'action': 'stop', 'id': 2})
+    colorimeter.run_for(1.0)
+    size = responses(messages, 2)[0]['response']['size']
+    colorimeter.send({'command': 'record', 'action': 'fetch', 'size': size + 1, 'id': 3})
+    colorimeter.send({'command': 'log', 'action': 'fetch', 'offset': 'x', 'id': 4})
+    colorimeter.step()
+    rsp = responses(messages, 3)[0]['response']
+    assert rsp['file'] == constants.RECORD_FILE
+    assert len(base64.b64decode(rsp['data'])) == size
+    assert rsp['eof']
+    assert responses(messages, 4)[0]['response']['error'] == 'offset and size must be integers'
+
+
+def test_kinetics_rate(drive, virtual_clock, messages):
+    # Absorbance rising at 0.02 per minute
+    rate = 0.02
+    colorimeter = SimColorimeter(lambda t: [40000*10**(-rate*t/60.0)]*N)
+    colorimeter.send({'command': 'kinetics', 'action': 'start', 'interval': 5.0,
+        'channels': ['415nm', 'clear'], 'id': 1})
+    colorimeter.run_for(600.0)
+    colorimeter.send({'command': 'kinetics', 'id': 2})
+    colorimeter.step()
+    rsp = responses(messages, 2)[0]['response']
+    assert rsp['running']
+    assert rsp['count'] == 120
+    assert rsp['elapsed'] == pytest.approx(600.0, abs=1.0)
+    assert rsp['rate']['415nm'] == pytest.approx(rate, rel=1.0e-3)
+    assert rsp['r_squared']['clear'] == pytest.approx(1.0, abs=1.0e-6)
+
+
+def test_blank_in_kinetics_mode(drive, virtual_clock):
+    light = Light()
+    colorimeter = SimColorimeter(light)
+    colorimeter.setup_kinetics()
+    colorimeter.mode = Mode.KINETICS
+    light.counts = 2000
+    colorimeter.handle_buttons(constants.BUTTON['blank'])
+    colorimeter.run_for(2.0)
+    assert list(colorimeter.blank_values) == [2000.0]*N
+    assert colorimeter.kinetics is not None
+    assert colorimeter.kinetics.count == 0
+
+    # Not while a run is going, the run's data is kept
+    colorimeter.handle_buttons(constants.BUTTON['right'])
+    colorimeter.run_for(20.0)
+    count = colorimeter.kinetics.count
+    assert count > 0
+    light.counts = 1000
+    colorimeter.handle_buttons(constants.BUTTON['blank'])
+    colorimeter.run_for(2.0)
+    assert not colorimeter.is_blanking
+    assert list(colorimeter.blank_values) == [2000.0]*N
+    assert colorimeter.kinetics.count > count
+
+
+def test_blank_command_refused_during_kinetics(drive, virtual_clock, messages):
+    colorimeter = SimColorimeter(Light())
+    colorimeter.send({'command': 'kinetics', 'action': 'start', 'id': 1})
+    colorimeter.run_for(10.0)
+    colorimeter.send({'command': 'blank', 'id': 2})
+    colorimeter.run_for(1.0)
+    assert 'error' in responses(messages, 2)[0]['response']
+    assert colorimeter.kinetics.running
+    assert colorimeter.kinetics.count > 0
+
+
+def test_hour_of_operation(drive, virtual_clock):
+    # An hour unattended steps down to sleep, in much less than an hour
+    colorimeter = SimColorimeter(Light())
+    t0 = time.monotonic()
+    colorimeter.run_for(3600.0)
+    assert time.monotonic() - t0 < 60.0
+    assert virtual_clock.t >= 3600.0
+    assert colorimeter.idle_manager.state == IdleState.SLEEP
+
+
+def test_extrapolated_fit_keeps_sign(drive, virtual_clock):
+    # Linear fit 10*A - 1 calibrated for A in [0.1, 1], a sample matching the
+    # blank (A = 0) extrapolates to -1
+    calibrations = {'Dye': {'fit_type': 'linear', 'fit_coef': [10.0, -1.0],
+        'channel': 6, 'units': 'mg/L', 'range': {'min': 0.1, 'max': 1.0}}}
+    simulator.make_drive(drive, {'startup': 'Dye'}, calibrations)
+    colorimeter = SimColorimeter(Light())
+    colorimeter.run_for(1.0)
+    label = colorimeter.measure_screen.value_labels[0]
+    assert label.text == '630nm -1.00'
+    assert label.color == constants.COLOR_TO_RGB['orange']
+    assert not colorimeter.fit_in_range
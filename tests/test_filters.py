@@ -0,0 +1,114 @@
+import math
+import pytest
+import numpy
+
+import constants
+from filters import create_filter
+from filters import LowpassFilter
+
+NUM = 3
+DT = constants.LOOP_DT
+
+
+def step_response(settings, num_steps, dt=DT):
+    # Filter output for a unit step from 0, starting in the steady state
+    filt = create_filter(NUM, settings, dt)
+    filt.update(numpy.zeros(NUM))
+    return [float(filt.update(numpy.ones(NUM))[0]) for i in range(num_steps)]
+
+
+def test_none():
+    assert create_filter(NUM, {}, DT) is None
+    assert create_filter(NUM, {'type': 'none'}, DT) is None
+
+
+def test_ema():
+    values = step_response({'type': 'ema', 'alpha': 0.5}, 3)
+    assert values == pytest.approx([0.5, 0.75, 0.875])
+
+
+def test_moving_average():
+    values = step_response({'type': 'moving_average', 'window': 4}, 5)
+    assert values == pytest.approx([0.5, 2/3, 0.75, 1.0, 1.0])
+
+
+def test_moving_average_wraps_without_drift():
+    filt = create_filter(NUM, {'type': 'moving_average', 'window': 5}, DT)
+    for i in range(1000):
+        value = filt.update(numpy.full(NUM, 0.1*(i % 7)))
+    expected = numpy.mean([0.1*(i % 7) for i in range(995, 1000)])
+    assert value == pytest.approx([expected]*NUM, abs=1.0e-12)
+
+
+def test_moving_median_rejects_spikes():
+    filt = create_filter(NUM, {'type': 'moving_median', 'window': 5}, DT)
+    values = [1.0, 1.0, 50.0, 1.0, 1.0, -50.0, 1.0]
+    out = [float(filt.update(numpy.full(NUM, v))[0]) for v in values]
+    assert out[3:] == [1.0]*4
+
+
+@pytest.mark.parametrize('filter_type', ['one_pole', 'two_pole'])
+def test_iir_starts_steady_with_unity_gain(filter_type):
+    filt = create_filter(NUM, {'type': filter_type, 'freq_cutoff': 0.5}, DT)
+    for i in range(3):
+        value = filt.update(numpy.full(NUM, 2.0))
+        assert value == pytest.approx([2.0]*NUM)
+    for i in range(500):
+        value = filt.update(numpy.full(NUM, 3.0))
+    assert value == pytest.approx([3.0]*NUM)
+
+
+def test_one_pole_time_constant():
+    # 1 - 1/e of a step after one time constant, 1/(2 pi freq_cutoff)
+    freq_cutoff = 0.2
+    tau = 1.0/(2.0*math.pi*freq_cutoff)
+    num_steps = round(tau/DT)
+    values = step_response({'type': 'one_pole', 'freq_cutoff': freq_cutoff}, num_steps)
+    assert values[-1] == pytest.approx(1.0 - math.exp(-num_steps*DT/tau))
+    assert values[-1] == pytest.approx(1.0 - math.exp(-1.0), abs=0.03)
+
+
+def test_two_pole_step_response():
+    values = step_response({'type': 'two_pole', 'freq_cutoff': 0.5}, 100)
+    assert max(values) < 1.06
+    assert values[-1] == pytest.approx(1.0, abs=1.0e-3)
+
+
+def test_reset_restarts_from_next_value():
+    filt = create_filter(NUM, {'type': 'one_pole', 'freq_cutoff': 0.1}, DT)
+    filt.update(numpy.zeros(NUM))
+    filt.reset()
+    assert filt.update(numpy.ones(NUM)) == pytest.approx([1.0]*NUM)
+
+
+def test_lowpass_filter():
+    lowpass = LowpassFilter(freq_cutoff=0.5, value=0.0, dt=DT)
+    assert lowpass.freq_cutoff == pytest.approx(0.5)
+    for i in range(200):
+        lowpass.update(4.0)
+    assert lowpass.value == pytest.approx(4.0)
+
+
+def test_iir_follows_measured_period():
+    # Designed for DT but sampled every 0.25s, 1 - 1/e of a step after tau
+    freq_cutoff = 0.2
+    tau = 1.0/(2.0*math.pi*freq_cutoff)
+    period = 0.25
+    filt = create_filter(NUM, {'type': 'one_pole', 'freq_cutoff': freq_cutoff}, DT)
+    for i in range(50):
+        filt.set_dt(period)
+        filt.update(numpy.zeros(NUM))
+    assert filt.dt == pytest.approx(period, rel=0.1)
+    num_steps = round(tau/period)
+    for i in range(num_steps):
+        filt.set_dt(period)
+        value = float(filt.update(numpy.ones(NUM))[0])
+    assert value == pytest.approx(1.0 - math.exp(-1.0), abs=0.05)
+
+
+def test_iir_ignores_gaps():
+    filt = create_filter(NUM, {'type': 'two_pole', 'freq_cutoff': 0.5}, DT)
+    for i in range(10):
+        filt.set_dt(DT)
+    filt.set_dt(30.0)
+    assert filt.dt == DT
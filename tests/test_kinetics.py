@@ -0,0 +1,74 @@
+import pytest
+
+from kinetics import Kinetics
+
+CHANNELS = [0, 3]
+
+
+def absorbances(t, slopes=(0.01, -0.02), offset=0.5):
+    # Absorbances of all channels changing at slopes per minute
+    values = [offset]*10
+    for chan, slope in zip(CHANNELS, slopes):
+        values[chan] = offset + slope*t/60.0
+    return values
+
+
+def run(kinetics, t_start, t_end, dt):
+    # Samples at each due time polling every dt, as the main loop does
+    t = t_start
+    kinetics.start(t)
+    times = []
+    while t < t_end:
+        if kinetics.is_due(t):
+            kinetics.update(t, absorbances(t))
+            times.append(t)
+        t += dt
+    return times
+
+
+def test_slope_and_r_squared():
+    kinetics = Kinetics(CHANNELS, 5.0, 120)
+    run(kinetics, 10.0, 310.0, 0.1)
+    assert kinetics.count == 60
+    assert list(kinetics.slope) == pytest.approx([0.01, -0.02])
+    assert list(kinetics.r_squared) == pytest.approx([1.0, 1.0])
+
+
+def test_samples_on_fixed_grid():
+    # Polled every 0.3s the samples stay on the 5s grid without drifting
+    kinetics = Kinetics(CHANNELS, 5.0, 120)
+    times = run(kinetics, 0.0, 600.0, 0.3)
+    assert len(times) == 120
+    for num, t in enumerate(times):
+        assert 5.0*num <= t < 5.0*num + 0.3
+
+
+def test_missed_slots_skipped():
+    kinetics = Kinetics(CHANNELS, 5.0, 120)
+    kinetics.start(0.0)
+    kinetics.update(0.0, absorbances(0.0))
+    kinetics.update(17.0, absorbances(17.0))
+    assert kinetics.t_next == 20.0
+    assert not kinetics.is_due(19.9)
+    assert kinetics.is_due(20.0)
+
+
+def test_ring_buffer_keeps_latest():
+    kinetics = Kinetics(CHANNELS, 1.0, 10)
+    kinetics.start(0.0)
+    for t in range(25):
+        kinetics.update(float(t), absorbances(t))
+    assert kinetics.is_full
+    assert kinetics.total == 25
+    times, values = kinetics.data()
+    assert times == pytest.approx([float(t) for t in range(15, 25)])
+    assert values[1] == pytest.approx([absorbances(t)[3] for t in range(15, 25)])
+    assert list(kinetics.slope) == pytest.approx([0.01, -0.02])
+
+
+def test_too_few_samples():
+    kinetics = Kinetics(CHANNELS, 1.0, 10)
+    kinetics.start(0.0)
+    kinetics.update(0.0, absorbances(0.0))
+    assert list(kinetics.slope) == [0.0, 0.0]
+    assert list(kinetics.r_squared) == [0.0, 0.0]
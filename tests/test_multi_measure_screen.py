@@ -0,0 +1,46 @@
+import pytest
+
+import constants
+from numeric_display import fit_number
+from multi_measure_screen import MultiMeasureScreen
+
+CHANS = ['415nm', '445nm']
+
+
+@pytest.mark.parametrize('value, width, expected', [
+    (0.523, 3, '.52'),
+    (1.234, 3, '1.2'),
+    (12345, 3, '12k'),
+    (-0.523, 4, '-.52'),
+    (-1.234, 4, '-1.2'),
+    (-12345, 4, '-12k'),
+    (-0.001, 5, '0.00'),
+    ])
+def test_fit_number(value, width, expected):
+    assert fit_number(value, width) == expected
+
+
+def test_absorbance_shown_unsigned():
+    screen = MultiMeasureScreen()
+    screen.set_measurement('Absorbance', None, [-0.02, 0.5], CHANS, 2)
+    assert screen.value_labels[0].text == '415nm 0.02'
+    assert screen.value_labels[1].text == '445nm 0.50'
+
+
+def test_calibrated_values_keep_sign():
+    screen = MultiMeasureScreen()
+    screen.set_measurement('Dye', 'mM', [-1.25, 0.5], ['dye_a', 'dye_b'], 2)
+    assert screen.value_labels[0].text == 'dye_a -1.25'
+    assert screen.value_labels[1].text == 'dye_b 0.50'
+    screen.set_statistics('Dye', [-0.52, 0.5], [0.01, 0.01], 3, ['dye_a', 'dye_b'])
+    assert screen.value_labels[0].text == 'dye -.5±.01'
+
+
+def test_overflow_shown_on_first_value():
+    screen = MultiMeasureScreen()
+    screen.set_measurement('Absorbance', None, [0.1, 0.5], CHANS, 2)
+    screen.set_overflow('Absorbance')
+    assert screen.header_label.text == 'Absorbance'
+    assert screen.value_labels[0].text == 'overflow'
+    assert screen.value_labels[0].color == constants.COLOR_TO_RGB['red']
+    assert all(label.text == '' for label in screen.value_labels[1:])
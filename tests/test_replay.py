@@ -0,0 +1,73 @@
+import json
+import pytest
+
+import constants
+from replay import Replay
+from sim_devices import SimColorimeter
+
+N = constants.NUM_CHANNEL
+
+
+def counts(t):
+    # Light through the blank until t = 2s, then a sample passing half
+    return [1000]*N if t < 2.0 else [500]*N
+
+
+def record_session(colorimeter):
+    colorimeter.send({'command': 'select_measurement', 'name': 'Transmittance', 'id': 1})
+    colorimeter.send({'command': 'blank', 'id': 2})
+    colorimeter.run_for(3.0)
+    colorimeter.send({'command': 'record', 'action': 'start', 'id': 3})
+    colorimeter.run_for(2.0)
+    colorimeter.send({'command': 'blank', 'id': 4})
+    colorimeter.run_for(2.0)
+    colorimeter.send({'command': 'read', 'id': 5})
+    colorimeter.send({'command': 'record', 'action': 'stop', 'id': 6})
+    colorimeter.run_for(1.0)
+
+
+def read_output(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_replay_matches_recording(drive, virtual_clock, messages):
+    colorimeter = SimColorimeter(counts)
+    record_session(colorimeter)
+    live = {msg['id']: msg for msg in messages}
+    assert live[4]['response']['blanks']['415nm'] == 500.0
+    num_frames = live[6]['response']['frames']
+    assert num_frames > 0
+
+    output = drive / 'replay.jsonl'
+    replay = Replay(f'{constants.LOG_DIR}/{constants.RECORD_FILE}', str(output))
+
+    # Starts from the recorded state, no frames are used blanking
+    replayed = replay.colorimeter
+    assert replay.source.num_frames == 0
+    assert replayed.measurement_name == 'Transmittance'
+    assert replayed.is_blanked
+    assert list(replayed.blank_values) == [1000.0]*N
+
+    report = replay.run()
+    assert report['frames'] == num_frames
+    assert report['recorded_time'] == pytest.approx(4.0, abs=0.3)
+
+    outputs = read_output(output)
+    values = [r['value'] for r in outputs if r['stage'] == 'calc_measurement_values']
+    assert values[0] == pytest.approx([0.5]*N)
+    assert values[-1] == pytest.approx([1.0]*N)
+
+    # Commands replayed give the responses sent when recording
+    sent = {r['value']['id']: r['value'] for r in outputs if r['stage'] == 'message'}
+    assert sent[4] == live[4]
+    assert sent[5] == live[5]
+
+
+def test_replay_needs_state(drive, virtual_clock):
+    from recorder import Recorder
+    recorder = Recorder()
+    recorder.start(constants.RECORD_FILE)
+    recorder.stop()
+    with pytest.raises(ValueError):
+        Replay(f'{constants.LOG_DIR}/{constants.RECORD_FILE}')